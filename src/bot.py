@@ -6,26 +6,37 @@ INFORMATION
 	This bot exclusively uses slash commands.
 
 """
-import database, discord, os
+import database, discord, hashlib, json, os, utility_libs.charts as charts
 from discord.ext import commands
+from pathlib import Path
 from utility_libs.scheduler import PayoutScheduler
+from utility_libs.watchdog import LoopWatchdog
+
+""" [SETUP] """
+# ==> Where we remember the signature of the last synced command tree. Delete it (or use --force-sync) to resync.
+TREE_HASH_PATH = Path(__file__).resolve().parent/"config"/"tree_signature"
 
 class CountermeasureClient(commands.Bot):
-	def __init__(self, *, admin_role:int, command_prefix:str, intents:discord.Intents, debug_guild:int):
+	def __init__(self, *, admin_role:int, command_prefix:str, intents:discord.Intents, debug_guild:int, force_sync:bool = False):
 		super().__init__(command_prefix=command_prefix, intents=intents) # To let instances build themselves
 		self.admin_role_id:int = admin_role
 		self.cmd_prefix:str = command_prefix
 		self.db = None
 		self.debug_guild:int = debug_guild
+		self.force_sync:bool = force_sync
+		self.watchdog = LoopWatchdog()
 
 	async def setup_hook(self):
-		# 0. Setup: Get channel ID(s)
+		# 0. Setup: Get channel ID(s), and start watching for anything that blocks the event loop
+		charts.start_pool() # ==> Must fork its workers before we start any threads (see utility_libs/charts.py)
+		self.watchdog.start() # ==> Logs blocking call sites (see utility_libs/watchdog.py)
 		self.announce_channel = int(os.getenv("ANNOUNCE_CHANNEL_ID"))
 
-		# 1. Open one persistent connection
+		# 1. Open one persistent connection, then bring its schema up to date
 		print("Setting up database...")
-		await database.initialize_database()
 		self.db = await database.connect_database()
+		await database.initialize_database(self.db)
+		database.write_behind_for(self.db).start() # ==> Batches low-priority writes (see database/write_behind.py)
 
 		# 2. Load cogs ==> scheduler_cog will read self.db / self.announce_channel
 		print("Loading cogs/extensions...")
@@ -45,21 +56,57 @@ class CountermeasureClient(commands.Bot):
 		# ==> print("Tree commands before sync:", [c.qualified_name for c in self.tree.get_commands()])
 
 		# Debug-Guild-Only sync for quick iteration
-		if self.debug_guild:
-			g = discord.Object(id=self.debug_guild)
-			print(f"Attempting to sync with guild {self.debug_guild}...")
+		# ==> Syncing is slow and rate-limited, so we only sync when the serialized tree has changed since last boot.
+		g = discord.Object(id=self.debug_guild) if self.debug_guild else None
+		if g:
 			self.tree.copy_global_to(guild=g)
+		signature = self.tree_signature(guild=g)
+
+		if not self.force_sync and self.read_tree_signature() == signature:
+			print(f"Command tree unchanged ({signature[:12]}...). Skipping sync. Use --force-sync to override.")
+		elif g:
+			print(f"Attempting to sync with guild {self.debug_guild}...")
 			cmds = await self.tree.sync(guild=g)
+			self.write_tree_signature(signature)
 			print(f"Synced {len(cmds)} commands to guild {self.debug_guild}: {[c.name for c in cmds]}")
 		else:
 			cmds = await self.tree.sync()
+			self.write_tree_signature(signature)
 			print(f"Synced {len(cmds)} commands to global: {[c.name for c in cmds]}")
 
+	""" [TREE SIGNATURE BLOCK] """
+	# [tree_signature]
+	# ==> A stable hash of everything we'd send to Discord on sync, plus where we'd send it.
+	def tree_signature(self, *, guild:discord.abc.Snowflake|None) -> str:
+		payload = {
+			"guild": guild.id if guild else None,
+			"commands": sorted(
+				(cmd.to_dict(self.tree) for cmd in self.tree.get_commands(guild=guild)),
+				key=lambda c: (c.get("type", 1), c["name"])
+			)
+		}
+		serialized = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+		return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+	def read_tree_signature(self) -> str|None:
+		try:
+			return TREE_HASH_PATH.read_text(encoding="utf-8").strip()
+		except OSError:
+			return None
+
+	def write_tree_signature(self, signature:str) -> None:
+		# ==> Only called after a successful sync, so a failed sync is retried on the next boot.
+		TREE_HASH_PATH.parent.mkdir(parents=True, exist_ok=True)
+		TREE_HASH_PATH.write_text(signature, encoding="utf-8")
+
 	async def on_ready(self):
 		print(f"CLIENT READY: {self.user} <{self.user.id}>")
 
 	async def close(self):
+		await self.watchdog.stop()
+		charts.stop_pool()
 		if self.db:
+			await database.write_behind_for(self.db).stop() # ==> Flushes anything still queued
 			await database.close(self.db)
 		await super().close()
 
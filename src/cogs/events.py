@@ -4,9 +4,20 @@ INFORMATION
 	This is our events library. It addresses the automatic events in our server.
 	
 """
-import discord
+import database, discord, json
+from discord import app_commands
 from discord.ext import commands
 
+""" [SETUP] """
+# ==> Completed commands under these names (or groups) get an audit_log entry.
+AUDITED_COMMANDS = {
+	"admin",
+	"market add_economy", "market add_item", "market add_tech",
+	"market edit_economy", "market edit_item", "market edit_tech",
+	"market add_recipe",
+	"market delete_object"
+}
+
 class Events(commands.Cog):
 	def __init__(self, bot:commands.Bot) -> None:
 		self.bot = bot
@@ -27,6 +38,18 @@ class Events(commands.Cog):
 		print(f"[LOG]: From {self}: {member.name} left... Removing from DB")
 		await self.bot.db_remove_user(member)
 
+	# Bookkeeping for every completed slash command. All of it goes through the write-behind queue,
+	# so none of it adds to the command's latency.
+	@commands.Cog.listener()
+	async def on_app_command_completion(self, itx:discord.Interaction, command:app_commands.Command|app_commands.ContextMenu):
+		if not self.bot.db:
+			return
+		database.record_last_seen(self.bot.db, itx.user.id)
+		database.count_command(self.bot.db, command.qualified_name)
+		if command.qualified_name in AUDITED_COMMANDS or command.qualified_name.split(" ")[0] in AUDITED_COMMANDS:
+			detail = json.dumps({k: str(v) for k, v in itx.namespace}, sort_keys=True)
+			database.record_audit(self.bot.db, itx.user.id, command.qualified_name, detail)
+
 async def setup(bot:commands.Bot):
 	await bot.add_cog(Events(bot))
 	print("[cogs.events] added... current tree: ", [c.qualified_name for c in bot.tree.get_commands()])
\ No newline at end of file
@@ -8,6 +8,7 @@ INFORMATION
 """
 
 import database, discord, os, typing, utility_libs.utilities as utilities
+from datetime import datetime, timedelta, timezone
 from math import ceil # ==> For use in pagination
 from discord import app_commands
 from discord.ext import commands
@@ -16,9 +17,13 @@ from discord.ext import commands
 DEBUG_GUILD_ID:int = int(os.getenv("DEBUG_GUILD_ID"))
 ADMIN_ROLE_ID:int = int(os.getenv("ADMIN_ROLE_ID"))
 OBJECTS_PER_PAGE:int = int(os.getenv("OBJECTS_PER_PAGE"))
+EDIT_CHUNK_SIZE:int = 5_000 # ==> Owned copies updated per transaction by a chunked edit
+MAX_AUCTION_MINUTES:int = 7 * 24 * 60
+ORDER_BOOK_LEVELS:int = 5 # ==> Price levels per side (and latest trades) shown by /market order_book
 log_utils = utilities.LoggingUtilities(True, True)
 role_utils = utilities.RoleUtilities(admin_role_id=ADMIN_ROLE_ID)
 renderer = utilities.RenderUtilities()
+parse_utils = utilities.ParsingUtilities()
 
 # For our market embeds.
 MARKET_COLORS = {
@@ -115,8 +120,8 @@ async def economies(itx:discord.Interaction):
 		embed = discord.Embed(title="Economies", color=MARKET_COLORS['economy_market'])
 		for obj in chunk:
 			embed.add_field(
-				name=f"{obj["name"]}",
-				value=f"__Income__\n*{obj["economy_income"]:,}  :coin:*",
+				name=f"{obj.name}",
+				value=f"__Income__\n*{obj.economy_income:,}  :coin:*",
 				inline=False
 				)
 		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(econs)/OBJECTS_PER_PAGE)}") # Regarding the +1: recall 0-indexing.
@@ -142,8 +147,8 @@ async def items(itx:discord.Interaction):
 		embed = discord.Embed(title="Item Market", color=MARKET_COLORS['item_market'])
 		for item in chunk:
 			embed.add_field(
-				name=f"{item["cost"]:,} :coin: — {item["name"]}",
-				value=f"\n\"{item["description"]}\"",
+				name=f"{item.cost:,} :coin: — {item.name}",
+				value=f"\n\"{item.description}\"" + (f"\nLasts {item.lifetime_minutes:,} min each" if item.lifetime_minutes else ""),
 				inline=False
 				)
 		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(items)/OBJECTS_PER_PAGE)}") # Regarding the +1: recall 0-indexing.
@@ -169,8 +174,8 @@ async def technology(itx:discord.Interaction):
 		embed = discord.Embed(title="Tech Market", color=MARKET_COLORS['tech_market'])
 		for tech in chunk:
 			embed.add_field(
-				name=f"{tech["cost"]:,} :alembic: — {tech["name"]}",
-				value=f"\n\"{tech["description"]}\"",
+				name=f"{tech.cost:,} :alembic: — {tech.name}",
+				value=f"\n\"{tech.description}\"",
 				inline=False
 				)
 		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(techs)/OBJECTS_PER_PAGE)}") # Regarding the +1: recall 0-indexing.
@@ -209,12 +214,14 @@ async def add_economy(
 		await itx.followup.send(msg)
 	
 @market.command(name="add_item")
+@app_commands.describe(lifetime_minutes="Makes the item a consumable: a stack loses one of it every this many minutes")
 async def add_item(
 	itx:discord.Interaction,
 	name:str,
 	desc:typing.Optional[str],
 	cost:int,
-	req_tech:typing.Optional[str]
+	req_tech:typing.Optional[str],
+	lifetime_minutes:typing.Optional[app_commands.Range[int, 1]] = None
 	):
 	if not role_utils.has_admin(itx.user.roles,ADMIN_ROLE_ID):
 		await itx.followup.send("Command failed.")
@@ -224,7 +231,7 @@ async def add_item(
 		await itx.response.defer()
 		bot = typing.cast(commands.Bot, itx.client)
 		try:
-			item = await database.add_item(db=bot.db,name=name,desc=desc,cost=cost,req_tech=req_tech)
+			item = await database.add_item(db=bot.db,name=name,desc=desc,cost=cost,req_tech=req_tech,lifetime_minutes=lifetime_minutes)
 			if item:
 				await itx.followup.send(f"Added item \"{name}\" to the item market.")
 			else:
@@ -277,12 +284,94 @@ async def add_tech(
 		print(msg)
 		await itx.followup.send(msg)
 
+# ==> [edit] group. For admin use only
+# ==> Income edits also update every owner's copy. chunked=True spreads that over many small transactions (huge guilds).
+@market.command(name="edit_economy", description="Change an economy's income, for the market and every owner.")
+async def edit_economy(
+	itx:discord.Interaction,
+	name:str,
+	economy_income:int,
+	chunked:typing.Optional[bool] = False
+	):
+	if not role_utils.has_admin(itx.user.roles,ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	try:
+		await itx.response.defer()
+		bot = typing.cast(commands.Bot, itx.client)
+		changed = await database.edit_economy(bot.db, name, economy_income, chunk_size=EDIT_CHUNK_SIZE if chunked else None)
+		if changed is None:
+			await itx.followup.send(f"Economy \"{name}\" doesn't exist!")
+		else:
+			await itx.followup.send(f"Economy \"{name}\" now pays {economy_income:,}. Updated {changed:,} owned copies.")
+	except Exception as e:
+		msg = f"[ERR]: <edit_obj> {type(e).__name__}: {e}"
+		print(msg)
+		await itx.followup.send(msg)
+
+@market.command(name="edit_item", description="Change an item's description, cost, required tech or lifetime.")
+async def edit_item(
+	itx:discord.Interaction,
+	name:str,
+	desc:typing.Optional[str] = None,
+	cost:typing.Optional[int] = None,
+	req_tech:typing.Optional[str] = None,
+	lifetime_minutes:typing.Optional[app_commands.Range[int, 1]] = None
+	):
+	if not role_utils.has_admin(itx.user.roles,ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	try:
+		await itx.response.defer()
+		bot = typing.cast(commands.Bot, itx.client)
+		if await database.edit_item(bot.db, name, desc=desc, cost=cost, req_tech=req_tech, lifetime_minutes=lifetime_minutes):
+			await itx.followup.send(f"Updated item \"{name}\".")
+		else:
+			await itx.followup.send(f"Item \"{name}\" doesn't exist!")
+	except Exception as e:
+		msg = f"[ERR]: <edit_obj> {type(e).__name__}: {e}"
+		print(msg)
+		await itx.followup.send(msg)
+
+@market.command(name="edit_tech", description="Change a tech. Income changes apply to every owner too.")
+async def edit_tech(
+	itx:discord.Interaction,
+	name:str,
+	desc:typing.Optional[str] = None,
+	tech_income:typing.Optional[int] = None,
+	cost:typing.Optional[int] = None,
+	req_tech:typing.Optional[str] = None,
+	chunked:typing.Optional[bool] = False
+	):
+	if not role_utils.has_admin(itx.user.roles,ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	try:
+		await itx.response.defer()
+		bot = typing.cast(commands.Bot, itx.client)
+		changed = await database.edit_tech(
+			bot.db, name,
+			desc=desc, tech_income=tech_income, cost=cost, req_tech=req_tech,
+			chunk_size=EDIT_CHUNK_SIZE if chunked else None
+		)
+		if changed is None:
+			await itx.followup.send(f"Tech \"{name}\" doesn't exist!")
+		elif tech_income is not None:
+			await itx.followup.send(f"Updated tech \"{name}\". It now pays {tech_income:,}. Updated {changed:,} owned copies.")
+		else:
+			await itx.followup.send(f"Updated tech \"{name}\".")
+	except Exception as e:
+		msg = f"[ERR]: <edit_obj> {type(e).__name__}: {e}"
+		print(msg)
+		await itx.followup.send(msg)
+
 # ==> [remove] group. For admin use only
 @market.command(name="delete_object")
 @app_commands.choices(markets=[
 	app_commands.Choice(name="Economy",		value="economy_market"),
 	app_commands.Choice(name="Items",		value="item_market"),
 	app_commands.Choice(name="Technology",	value="tech_market"),
+	app_commands.Choice(name="Recipe",		value="recipes"),
 ])
 async def delete_object(
 	itx:discord.Interaction,
@@ -338,36 +427,23 @@ async def buy_item(itx:discord.Interaction, name:str, qty:int):
 		if not itemRow:
 			await itx.followup.send("No matching item found...")
 			return
-		plrRow = await database.get_table_row(
-			db=bot.db,
-			table_name="users",
-			pk_col="user_id",	# column to look through in SQL table
-			pk_val=user.id		# the value to match
-		)
+		plrRow = await database.get_profile(bot.db, user.id) # ==> Served from the profile cache when warm
 		if not plrRow:
 			await itx.followup.send("No user found...")
 			return
-		plrTec = await database.get_user_table_asc(
-			bot.db,
-			"user_tech",
-			user.id,
-			"tech_income"
-		)
-		if not plrTec:
-			log_utils.print_debug("No user tech found...")
 
 		# Check if player has tech
-		req = itemRow.get("req_tech")
-		has_req = (not req) or any(t.get("name") == req for t in plrTec)
+		req = itemRow.req_tech
+		has_req = (not req) or plrRow.has_tech(req)
 
 		if has_req:
 			# Handle transaction
-			log_utils.print_debug(f"Item cost: {itemRow['cost']}, Plr bal: {plrRow['balance']}")
-			if itemRow['cost']*qty <= plrRow['balance']:
-				log_utils.print_debug(f"Deducting {itemRow['cost']*qty} from player...")
-				await database.add_bal(bot.db, user, -itemRow['cost']*qty)
+			log_utils.print_debug(f"Item cost: {itemRow.cost}, Plr bal: {plrRow.balance}")
+			if itemRow.cost*qty <= plrRow.balance:
+				log_utils.print_debug(f"Deducting {itemRow.cost*qty} from player...")
+				await database.add_bal(bot.db, user, -itemRow.cost*qty)
 				await database.item_to_inv(db=bot.db, item_name=name, user_id=user.id, quantity=qty)
-				await itx.followup.send(f"Bought {qty} of {name} for {itemRow['cost']*qty} :coin:!")
+				await itx.followup.send(f"Bought {qty} of {name} for {itemRow.cost*qty} :coin:!")
 			else:
 				await itx.followup.send("Not enough money!")
 		else:		
@@ -400,12 +476,7 @@ async def sell_item(itx:discord.Interaction, name:str, qty:int):
 		)
 		if not itemRow:
 			await itx.followup.send("No matching item found...")
-		plrRow = await database.get_table_row(
-			db=bot.db,
-			table_name="users",
-			pk_col="user_id",	# column to look through in SQL table
-			pk_val=user.id		# the value to match
-		)
+		plrRow = await database.get_profile(bot.db, user.id)
 		if not plrRow:
 			await itx.followup.send("No user found...")
 		invRow = await 	database.get_inventory_item(bot.db, user.id, name)
@@ -414,12 +485,12 @@ async def sell_item(itx:discord.Interaction, name:str, qty:int):
 		log_utils.print_debug(f"Attempting to remove {qty} of {name} from {user.name}'s inventory...")
 
 	# Handle transaction
-		log_utils.print_debug(f"Item cost: {itemRow['cost']}, Plr bal: {plrRow['balance']}")
-		if invRow['quantity'] >= qty:
+		log_utils.print_debug(f"Item cost: {itemRow.cost}, Plr bal: {plrRow.balance}")
+		if invRow.quantity >= qty:
 			# Using item_to_inv to subtract
 			await database.item_to_inv(db=bot.db, item_name=name, user_id=user.id, quantity=-qty)
-			await database.add_bal(bot.db, user, itemRow['cost']*qty)
-			await itx.followup.send(f"Sold {qty} of {name} for {itemRow['cost']*qty} :coin:!")
+			await database.add_bal(bot.db, user, itemRow.cost*qty)
+			await itx.followup.send(f"Sold {qty} of {name} for {itemRow.cost*qty} :coin:!")
 		else:
 			await itx.followup.send(f"Not enough {name}!")
 	
@@ -446,36 +517,23 @@ async def research_tech(itx:discord.Interaction, tech:str):
 		if not techRow:
 			await itx.followup.send("No matching item found...")
 			return
-		plrRow = await database.get_table_row(
-			db=bot.db,
-			table_name="users",
-			pk_col="user_id",	# column to look through in SQL table
-			pk_val=user.id		# the value to match
-		)
+		plrRow = await database.get_profile(bot.db, user.id)
 		if not plrRow:
 			await itx.followup.send("No user found...")
 			return
-		plrTec = await database.get_user_table_asc(
-			bot.db,
-			"user_tech",
-			user.id,
-			"tech_income"
-		)
-		if not plrTec:
-			log_utils.print_debug("No user tech found...")
 		
 		# Check if player has tech
-		req = techRow.get("req_tech")
-		has_req = (not req) or any(t.get("name") == req for t in plrTec)
+		req = techRow.req_tech
+		has_req = (not req) or plrRow.has_tech(req)
 
 		if has_req:
 			# Handle transaction
-			log_utils.print_debug(f"Tech cost: {techRow['cost']}, Plr res: {plrRow['research']}")
-			if techRow['cost'] <= plrRow['research']:
-				log_utils.print_debug(f"Deducting {techRow['cost']} from player...")
-				await database.add_res(bot.db, itx.user, -techRow['cost'])
+			log_utils.print_debug(f"Tech cost: {techRow.cost}, Plr res: {plrRow.research}")
+			if techRow.cost <= plrRow.research:
+				log_utils.print_debug(f"Deducting {techRow.cost} from player...")
+				await database.add_res(bot.db, itx.user, -techRow.cost)
 				await database.tech_to_inv(db=bot.db, tech_name=tech, user_id=user.id)
-				await itx.followup.send(f"Researched {tech} for {techRow['cost']} :alembic:!")
+				await itx.followup.send(f"Researched {tech} for {techRow.cost} :alembic:!")
 			else:
 				await itx.followup.send("Not enough RP!")
 		else:		
@@ -516,12 +574,7 @@ async def use_item(itx:discord.Interaction, user:discord.User, item_name:str, qt
 		)
 		if not itemRow:
 			await itx.followup.send("No matching item found...")
-		plrRow = await database.get_table_row(
-			db=bot.db,
-			table_name="users",
-			pk_col="user_id",	# column to look through in SQL table
-			pk_val=user.id		# the value to match
-		)
+		plrRow = await database.get_profile(bot.db, user.id)
 		if not plrRow:
 			await itx.followup.send("No user found...")
 		invRow = await 	database.get_inventory_item(bot.db, user.id, item_name)
@@ -530,8 +583,8 @@ async def use_item(itx:discord.Interaction, user:discord.User, item_name:str, qt
 		log_utils.print_debug(f"Attempting to remove {qty} of {item_name} from {user.name}'s inventory...")
 
 	# Handle transaction
-		log_utils.print_debug(f"Item cost: {itemRow['cost']}, Plr bal: {plrRow['balance']}")
-		if invRow['quantity'] >= qty:
+		log_utils.print_debug(f"Item cost: {itemRow.cost}, Plr bal: {plrRow.balance}")
+		if invRow.quantity >= qty:
 			# Using item_to_inv to subtract
 			await database.item_to_inv(db=bot.db, item_name=item_name, user_id=user.id, quantity=-qty)
 		
@@ -541,6 +594,262 @@ async def use_item(itx:discord.Interaction, user:discord.User, item_name:str, qt
 		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
 		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
 
+# ==> [order book] group. Player-to-player limit orders. See database/order_book.py.
+@market.command(name="place_order", description="Post a buy or sell order for an item at your own price.")
+@app_commands.describe(price="Coins per item. Buy orders hold price x quantity until they fill or you cancel.")
+@app_commands.choices(side=[
+	app_commands.Choice(name="Buy",		value="buy"),
+	app_commands.Choice(name="Sell",	value="sell"),
+])
+async def place_order(
+	itx:discord.Interaction,
+	side:app_commands.Choice[str],
+	item:str,
+	price:app_commands.Range[int, 1],
+	quantity:app_commands.Range[int, 1]
+	):
+	bot = typing.cast(commands.Bot, itx.client) # ==> Fetches the running client
+	user = itx.user
+	log_utils.print_log(f"place_order called by {user.name}: {side.value} {quantity} {item} @ {price}")
+	await itx.response.defer()
+
+	try:
+		itemRow = await database.get_table_row(db=bot.db, table_name="item_market", pk_col="name", pk_val=item)
+		if not itemRow:
+			await itx.followup.send("No matching item found...")
+			return
+		# ==> Same rule as /market buy_item: you need the item's tech to acquire it.
+		if side.value == "buy" and itemRow.req_tech:
+			plrRow = await database.get_profile(bot.db, user.id)
+			if not plrRow:
+				await itx.followup.send("No user found...")
+				return
+			if not plrRow.has_tech(itemRow.req_tech):
+				await itx.followup.send(f"Missing required tech <{itemRow.req_tech}>.")
+				return
+
+		result = await database.exchange_for(bot.db).place(user.id, item, side.value, price, quantity)
+		lines = []
+		if result.filled:
+			verb = "Bought" if side.value == "buy" else "Sold"
+			lines.append(f"{verb} {result.filled:,} of {item} for {result.value:,} :coin:!")
+		if result.remaining:
+			lines.append(f"Order #{result.order_id}: {result.remaining:,} of {item} @ {price:,} :coin: is on the book.")
+		await itx.followup.send("\n".join(lines))
+
+	except ValueError as e:
+		await itx.followup.send(str(e))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@market.command(name="cancel_order", description="Cancel one of your open orders and get its coins or items back.")
+async def cancel_order(itx:discord.Interaction, order_id:int):
+	bot = typing.cast(commands.Bot, itx.client)
+	log_utils.print_log(f"cancel_order called by {itx.user.name} for #{order_id}")
+	await itx.response.defer()
+	try:
+		item = await database.exchange_for(bot.db).cancel(itx.user.id, order_id)
+		await itx.followup.send(f"Cancelled order #{order_id} for {item}.")
+	except ValueError as e:
+		await itx.followup.send(str(e))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@market.command(name="order_book", description="View the best bids and asks for an item, and its latest trades.")
+async def order_book(itx:discord.Interaction, item:str):
+	bot = typing.cast(commands.Bot, itx.client)
+	await itx.response.defer()
+	try:
+		itemRow = await database.get_table_row(db=bot.db, table_name="item_market", pk_col="name", pk_val=item)
+		if not itemRow:
+			await itx.followup.send("No matching item found...")
+			return
+		bids, asks = await database.exchange_for(bot.db).depth(item, ORDER_BOOK_LEVELS)
+		fills = await database.get_recent_fills(bot.db, item, limit=ORDER_BOOK_LEVELS)
+		if not (bids or asks or fills):
+			return await itx.followup.send(f"No orders or trades for {item} yet.")
+
+		def levels(book:list[database.BookLevel]) -> str:
+			return "\n".join(f"{l.quantity:,} @ {l.price:,} :coin: ({l.orders})" for l in book) or "None"
+
+		embed = discord.Embed(title=f"{item} Order Book", color=MARKET_COLORS["item_market"])
+		embed.add_field(name="Bids (buying)", value=levels(bids))
+		embed.add_field(name="Asks (selling)", value=levels(asks))
+		if fills:
+			embed.add_field(
+				name="Latest trades",
+				value="\n".join(f"{f.quantity:,} @ {f.price:,} :coin: ({f.filled_at[:16]} UTC)" for f in fills),
+				inline=False
+			)
+		await itx.followup.send(embed=embed)
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@market.command(name="my_orders", description="View your open orders.")
+async def my_orders(itx:discord.Interaction):
+	bot = typing.cast(commands.Bot, itx.client)
+	await itx.response.defer()
+	orders = await database.get_open_orders(bot.db, itx.user.id)
+	if not orders:
+		return await itx.followup.send("You have no open orders.", ephemeral = True)
+
+	embeds = [] # ==> i.e. our pages
+	for i in range(0, len(orders), OBJECTS_PER_PAGE):
+		chunk = orders[i:i+OBJECTS_PER_PAGE]
+		embed = discord.Embed(title=f"{itx.user.name}'s Open Orders", color=MARKET_COLORS["item_market"])
+		for order in chunk:
+			embed.add_field(
+				name=f"#{order.order_id} {order.side.capitalize()} {order.item}",
+				value=f"{order.remaining:,} @ {order.price:,} :coin:",
+				inline=False
+			)
+		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(orders)/OBJECTS_PER_PAGE)}")
+		embeds.append(embed)
+
+	view = renderer.Paginator(embeds=embeds)
+	await itx.followup.send(embed=view.initial, view=view)
+
+# ==> [auction] group. Timed auctions, closed by the scheduler. See database/auctions.py.
+@market.command(name="auction", description="Auction items from your inventory. Admins can auction others'.")
+@app_commands.describe(
+	minutes="How long the auction runs",
+	min_bid="The lowest bid accepted, in coins",
+	user="Whose items to auction (admin-only if not you)"
+)
+async def auction(
+	itx:discord.Interaction,
+	item:str,
+	quantity:app_commands.Range[int, 1],
+	min_bid:app_commands.Range[int, 1],
+	minutes:app_commands.Range[int, 1, MAX_AUCTION_MINUTES],
+	user:typing.Optional[discord.User] = None
+	):
+	bot = typing.cast(commands.Bot, itx.client)
+	seller = user or itx.user
+	log_utils.print_log(f"auction called by {itx.user.name}: {quantity} {item} from {seller.name}, min {min_bid}, {minutes}m")
+	await itx.response.defer()
+
+	if seller.id != itx.user.id:
+		if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+			await role_utils.err_not_admin(itx=itx)
+			return
+	try:
+		auction_id, closes_at = await database.auctions_for(bot.db).create(seller.id, item, quantity, min_bid, timedelta(minutes=minutes))
+		await itx.followup.send(
+			f"Auction #{auction_id}: {quantity:,} {item} from {seller.name}, bids from {min_bid:,} :coin:. "
+			f"Closes <t:{int(closes_at.timestamp())}:R>."
+		)
+	except ValueError as e:
+		await itx.followup.send(str(e))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@market.command(name="bid", description="Bid on an auction. Your bid is held until you're outbid or it closes.")
+async def bid(itx:discord.Interaction, auction_id:int, amount:app_commands.Range[int, 1]):
+	bot = typing.cast(commands.Bot, itx.client)
+	log_utils.print_log(f"bid called by {itx.user.name}: {amount} on #{auction_id}")
+	await itx.response.defer()
+	try:
+		await database.auctions_for(bot.db).bid(auction_id, itx.user.id, amount)
+		await itx.followup.send(f"You're the top bidder on auction #{auction_id} with {amount:,} :coin:!")
+	except ValueError as e:
+		await itx.followup.send(str(e))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@market.command(name="auctions", description="View open auctions, closing soonest first.")
+async def auctions(itx:discord.Interaction):
+	bot = typing.cast(commands.Bot, itx.client)
+	await itx.response.defer()
+	open_auctions = await database.get_open_auctions(bot.db)
+	if not open_auctions:
+		return await itx.followup.send("No open auctions.", ephemeral = True)
+
+	embeds = [] # ==> i.e. our pages
+	for i in range(0, len(open_auctions), OBJECTS_PER_PAGE):
+		chunk = open_auctions[i:i+OBJECTS_PER_PAGE]
+		embed = discord.Embed(title="Auctions", color=MARKET_COLORS["item_market"])
+		for a in chunk:
+			closes = int(datetime.strptime(a.closes_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp())
+			top = f"Top bid {a.top_bid:,} :coin:" if a.top_bid is not None else f"No bids (min {a.min_bid:,} :coin:)"
+			embed.add_field(
+				name=f"#{a.auction_id} {a.quantity:,} {a.item}",
+				value=f"{top}\nCloses <t:{closes}:R>",
+				inline=False
+			)
+		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(open_auctions)/OBJECTS_PER_PAGE)}")
+		embeds.append(embed)
+
+	view = renderer.Paginator(embeds=embeds)
+	await itx.followup.send(embed=view.initial, view=view)
+
+# ==> [recipe] group. Crafting itself is /player craft. See database/recipes.py.
+@market.command(name="add_recipe", description="Add or replace the recipe for an item.")
+@app_commands.describe(
+	name="The item the recipe makes",
+	inputs="What one craft uses, e.g. 'Plank=4, Nail=2'. Names without =N use 1.",
+	output_quantity="How many of the item one craft makes",
+	req_tech="Tech needed to craft it"
+)
+async def add_recipe(
+	itx:discord.Interaction,
+	name:str,
+	inputs:str,
+	output_quantity:app_commands.Range[int, 1] = 1,
+	req_tech:typing.Optional[str] = None
+	):
+	if not role_utils.has_admin(itx.user.roles,ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	bot = typing.cast(commands.Bot, itx.client)
+	log_utils.print_log(f"add_recipe called by {itx.user.name}: {name} x{output_quantity} <- {inputs}")
+	await itx.response.defer()
+	try:
+		# ==> The whole recipe graph is recompiled before the recipe is saved, so a cycle is refused without a write.
+		recipe = await database.recipes_for(bot.db).set_recipe(
+			name, parse_utils.parse_items(inputs), output_quantity=output_quantity, req_tech=req_tech
+		)
+		scratch = ", ".join(f"{qty:,} {item}" for item, qty in recipe.from_scratch.items())
+		await itx.followup.send(f"Saved the recipe for {name}. From base items, one craft takes {scratch}.")
+	except ValueError as e:
+		await itx.followup.send(str(e))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@market.command(name="recipes", description="View crafting recipes.")
+async def recipes(itx:discord.Interaction):
+	bot = typing.cast(commands.Bot, itx.client)
+	await itx.response.defer()
+	compiled = sorted((await database.recipes_for(bot.db).compiled()).values())
+	if not compiled:
+		return await itx.followup.send("No recipes yet.", ephemeral = True)
+
+	def amounts(vector:dict[str, int]) -> str:
+		return ", ".join(f"{qty:,} {item}" for item, qty in vector.items())
+
+	embeds = [] # ==> i.e. our pages
+	for i in range(0, len(compiled), OBJECTS_PER_PAGE):
+		chunk = compiled[i:i+OBJECTS_PER_PAGE]
+		embed = discord.Embed(title="Recipes", color=MARKET_COLORS["item_market"])
+		for r in chunk:
+			value = f"Uses {amounts(r.direct)}"
+			if r.steps > 1:
+				value += f"\nFrom base items: {amounts(r.from_scratch)}"
+			if r.techs:
+				value += f"\nNeeds {', '.join(f'<{tech}>' for tech in sorted(r.techs))}"
+			embed.add_field(name=f"{r.output_quantity:,} {r.name}", value=value, inline=False)
+		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(compiled)/OBJECTS_PER_PAGE)}")
+		embeds.append(embed)
+
+	view = renderer.Paginator(embeds=embeds)
+	await itx.followup.send(embed=view.initial, view=view)
+
 async def setup(bot:commands.Bot):
 	await bot.add_cog(Debug(bot))		# Add debug cog
 	bot.tree.add_command(market)	# Register group
@@ -4,19 +4,22 @@ INFORMATION
 	This is our player interaction library. It addresses the automatic events in our server.
 	
 """
-import database, discord, os, typing, utility_libs.utilities as utilities
+import database, discord, io, os, typing, utility_libs.analytics as analytics, utility_libs.charts as charts, utility_libs.forecast as forecast, utility_libs.profiling as profiling, utility_libs.utilities as utilities, utility_libs.watchdog as watchdog
 from discord import app_commands
 from discord.ext import commands
 from utility_libs.utilities import LoggingUtilities, RenderUtilities as renderer
 from math import ceil
+from datetime import datetime, timedelta, timezone
 
 """ [SETUP] """
 DEBUG_GUILD_ID:int = int(os.getenv("DEBUG_GUILD_ID"))
 ADMIN_ROLE_ID:int = int(os.getenv("ADMIN_ROLE_ID"))
+CHART_POINTS:int = 200 # ==> History points per chart, after downsampling
 OBJECTS_PER_PAGE:int = int(os.getenv("OBJECTS_PER_PAGE"))
 PAYOUT_STEP:int = int(os.getenv("PAYOUT_STEP"))
 role_utils = utilities.RoleUtilities(admin_role_id=ADMIN_ROLE_ID)
 log_utils = LoggingUtilities(True,True)
+parse_utils = utilities.ParsingUtilities()
 
 # For our embeds.
 PLAYER_COLORS = {
@@ -165,6 +168,263 @@ async def add_research_to_user(itx:discord.Interaction, user:discord.Member, qty
 	except Exception as e:
 		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
 
+@admin.command(name="economy_chart", description="Chart the money supply over time, or how income is spread across players.")
+@app_commands.choices(kind=[
+	app_commands.Choice(name="Money supply",		value="money_supply"),
+	app_commands.Choice(name="Income distribution",	value="income_distribution"),
+])
+async def economy_chart(
+	itx:discord.Interaction,
+	kind:app_commands.Choice[str],
+	days:typing.Optional[app_commands.Range[int, 1, 3650]] = None
+	):
+	await itx.response.defer()
+	if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	if not charts.is_available():
+		await itx.followup.send("Charts need matplotlib installed on the bot's host.")
+		return
+	try:
+		bot = typing.cast(commands.Bot, itx.client)
+		if kind.value == "money_supply":
+			since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S") if days else None
+			snapshots = await database.get_economy_history(bot.db, since=since, points=CHART_POINTS)
+			if len(snapshots) < 2:
+				return await itx.followup.send("Not enough payouts recorded yet to draw a curve.")
+			png = await charts.render(
+				("money_supply", since and since[:10], snapshots[-1].snapshot_id, len(snapshots)), # ==> Data version
+				charts.render_series,
+				"Money supply" + (f" (last {days}d)" if days else ""),
+				[s.recorded_at for s in snapshots],
+				{"Balance": [s.money_supply for s in snapshots], "Research": [s.research_supply for s in snapshots]}
+			)
+		else:
+			incomes = await database.get_income_distribution(bot.db)
+			if not incomes:
+				return await itx.followup.send("No players registered yet.")
+			png = await charts.render(
+				("income_distribution", hash(tuple(incomes))), # ==> Data version
+				charts.render_distribution,
+				"Economy income per payout",
+				incomes,
+				f":coin: / {PAYOUT_STEP}d"
+			)
+		await itx.followup.send(file=discord.File(io.BytesIO(png), filename=f"{kind.value}.png"))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@admin.command(name="economy_report", description="Summarize the whole economy: supply, inequality, income and inventory value.")
+async def economy_report(itx:discord.Interaction):
+	await itx.response.defer()
+	if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	try:
+		bot = typing.cast(commands.Bot, itx.client)
+		log_utils.print_log(f"economy_report called by {itx.user.name}")
+		report = await analytics.build_report(bot.db)
+
+		def describe(d:analytics.Distribution) -> str:
+			pcts = " | ".join(f"p{p}: {v:,}" for p, v in d.percentiles.items())
+			return f"Total {d.total:,} | Mean {d.mean:,.1f}\nGini {d.gini:.3f} | Top 1% hold {d.top_share:.1%}\n{pcts}"
+
+		emb = discord.Embed(title=f"Economy Report ({report.players:,} players)", color=PLAYER_COLORS["statistics"])
+		emb.add_field(name="Balance :coin:", value=describe(report.balance), inline=False)
+		emb.add_field(name="Research :alembic:", value=describe(report.research), inline=False)
+		emb.add_field(name=f"Economy income per player / {PAYOUT_STEP}d", value=describe(report.income), inline=False)
+		emb.add_field(name="Paid per payout", value=f"{report.income_per_payout:,} :coin: | {report.research_per_payout:,} :alembic:")
+		emb.add_field(name="Inventories", value=f"{report.items_held:,} items worth {report.inventory_value:,} :coin:")
+		await itx.followup.send(embed=emb)
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@admin.command(name="simulate_payouts", description="Forecast the economy a number of payouts ahead. Nothing is written.")
+@app_commands.describe(
+	economy_changes="Hypothetical economy incomes, e.g. 'Small Economy=12, Mine=40'",
+	tech_changes="Hypothetical tech incomes, e.g. 'Lab=3'",
+	economy_scale="Multiply every economy income",
+	tech_scale="Multiply every tech income"
+)
+async def simulate_payouts(
+	itx:discord.Interaction,
+	steps:app_commands.Range[int, 1, forecast.MAX_FORECAST_STEPS],
+	economy_changes:typing.Optional[str] = None,
+	tech_changes:typing.Optional[str] = None,
+	economy_scale:typing.Optional[float] = None,
+	tech_scale:typing.Optional[float] = None
+	):
+	await itx.response.defer()
+	if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	try:
+		bot = typing.cast(commands.Bot, itx.client)
+		log_utils.print_log(f"simulate_payouts called by {itx.user.name} for {steps} steps")
+		result = await forecast.forecast(
+			bot.db,
+			steps,
+			economy_changes=forecast.parse_changes(economy_changes),
+			tech_changes=forecast.parse_changes(tech_changes),
+			economy_scale=economy_scale if economy_scale is not None else 1.0,
+			tech_scale=tech_scale if tech_scale is not None else 1.0
+		)
+		await itx.followup.send(forecast.format_forecast(result))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+# ==> [modifiers] Income boosts applied by the payout. Stacking rules are in database/data_handler.py ([PAYOUT]).
+@admin.command(name="add_modifier", description="Boost economy income or research for a tech's owners, an item's holders, or everyone.")
+@app_commands.describe(
+	source="The tech or item that gives the boost. Leave empty for Everyone.",
+	value="A percent (10 is +10%, -10 is -10%) or a multiplier (2 is x2)",
+	days="How long it lasts. Leave empty for no end."
+)
+@app_commands.choices(
+	source_kind=[
+		app_commands.Choice(name="Tech",		value="tech"),
+		app_commands.Choice(name="Item",		value="item"),
+		app_commands.Choice(name="Everyone",	value="global"),
+	],
+	target=[
+		app_commands.Choice(name="Economy income",	value="economy"),
+		app_commands.Choice(name="Research",		value="research"),
+	],
+	kind=[
+		app_commands.Choice(name="Percent (adds up)",				value="percent"),
+		app_commands.Choice(name="Multiplier (strongest applies)",	value="multiplier"),
+	]
+)
+async def add_modifier(
+	itx:discord.Interaction,
+	source_kind:app_commands.Choice[str],
+	target:app_commands.Choice[str],
+	kind:app_commands.Choice[str],
+	value:float,
+	source:typing.Optional[str] = None,
+	days:typing.Optional[app_commands.Range[int, 1, 3650]] = None
+	):
+	await itx.response.defer()
+	if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	try:
+		bot = typing.cast(commands.Bot, itx.client)
+		ends_at = datetime.now(timezone.utc) + timedelta(days=days) if days else None
+		modifier_id = await database.add_modifier(
+			bot.db, source_kind.value, source, target.value, kind.value, value, ends_at=ends_at
+		)
+		await itx.followup.send(f"Added modifier #{modifier_id}. It applies from the next payout.")
+	except ValueError as e:
+		await itx.followup.send(str(e))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@admin.command(name="remove_modifier", description="Remove an income modifier.")
+async def remove_modifier(itx:discord.Interaction, modifier_id:int):
+	await itx.response.defer()
+	if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	try:
+		bot = typing.cast(commands.Bot, itx.client)
+		if await database.remove_modifier(bot.db, modifier_id):
+			await itx.followup.send(f"Removed modifier #{modifier_id}.")
+		else:
+			await itx.followup.send(f"Modifier #{modifier_id} doesn't exist!")
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@admin.command(name="modifiers", description="View every income modifier that hasn't ended.")
+async def modifiers(itx:discord.Interaction):
+	await itx.response.defer()
+	if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	bot = typing.cast(commands.Bot, itx.client)
+	mods = await database.get_modifiers(bot.db)
+	if not mods:
+		return await itx.followup.send("No income modifiers.", ephemeral = True)
+
+	embeds = [] # ==> i.e. our pages
+	for i in range(0, len(mods), OBJECTS_PER_PAGE):
+		chunk = mods[i:i+OBJECTS_PER_PAGE]
+		embed = discord.Embed(title="Income Modifiers", color=PLAYER_COLORS["statistics"])
+		for m in chunk:
+			effect = f"{m.value:+g}%" if m.kind == "percent" else f"x{m.value:g}"
+			ends = ""
+			if m.ends_at:
+				stamp = int(datetime.strptime(m.ends_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp())
+				ends = f"\nEnds <t:{stamp}:R>"
+			embed.add_field(
+				name=f"#{m.modifier_id} {effect} {m.target}",
+				value=f"From {m.source_kind} {m.source}{ends}" if m.source else f"For everyone{ends}",
+				inline=False
+			)
+		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(mods)/OBJECTS_PER_PAGE)}")
+		embeds.append(embed)
+
+	view = renderer.Paginator(embeds=embeds)
+	await itx.followup.send(embed=view.initial, view=view)
+
+# ==> [diagnostics] Live checks on a running bot.
+@admin.command(name="profile", description="Profile the bot for a few seconds and report the hottest functions.")
+async def profile(itx:discord.Interaction, seconds:app_commands.Range[int, 1, profiling.MAX_PROFILE_SECONDS]):
+	await itx.response.defer()
+	if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	if profiling.is_capturing():
+		await itx.followup.send("A profile is already being captured. Try again once it's done.")
+		return
+	try:
+		log_utils.print_log(f"profile called by {itx.user.name} for {seconds}s")
+		report = await profiling.capture_profile(seconds)
+		await itx.followup.send(
+			f"Top functions by cumulative time over {report.seconds:.0f}s:\n{profiling.format_report(report)}",
+			file=discord.File(report.stats_path)
+		)
+		report.stats_path.unlink(missing_ok=True) # ==> Discord has our copy now.
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@admin.command(name="loop_lag", description="Report event-loop lag percentiles and the latest blocking call sites.")
+async def loop_lag(itx:discord.Interaction):
+	await itx.response.defer()
+	if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+		await role_utils.err_not_admin(itx=itx)
+		return
+	try:
+		dog = typing.cast(watchdog.LoopWatchdog, getattr(itx.client, "watchdog", None))
+		if dog is None:
+			await itx.followup.send("The event-loop watchdog isn't running.")
+			return
+		lag = dog.percentiles()
+		embed = discord.Embed(title="Event-loop lag", color=discord.Color.dark_teal())
+		embed.add_field(
+			name=f"Last {len(dog.lags)} heartbeats",
+			value=" | ".join(f"{k}: {v:.1f} ms" for k, v in lag.items()) if lag else "No samples yet.",
+			inline=False
+		)
+		stalls = list(dog.stalls)[-5:]
+		embed.add_field(
+			name=f"Latest stalls over {dog.threshold*1000:.0f} ms",
+			value="\n".join(
+				f"<t:{int(s.at.timestamp())}:R> {s.stalled_ms:.0f}+ ms at `{s.location}`" for s in reversed(stalls)
+			) if stalls else "None.",
+			inline=False
+		)
+		await itx.followup.send(embed=embed)
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
 # ~~ [view FAMILY] ~~
 # Used to browse through player information
 player = app_commands.Group(
@@ -188,13 +448,13 @@ async def statistics(
 
 	try:
 		bot = typing.cast(commands.Bot, itx.client)
-		user_stats = await database.get_table_row(bot.db, "users", "user_id", user.id)
+		user_stats = await database.get_profile(bot.db, user.id)
 
 		if not user_stats:
 			return await itx.followup.send(f"ERR: {user.name} has no user_stats... Contact an admin!")
 		emb = discord.Embed(title="Statistics", color=PLAYER_COLORS["statistics"])
-		emb.add_field(name="Balance", value=f"{user_stats['balance']:,} :coin:", inline=False)
-		emb.add_field(name="Research", value=f"{user_stats['research']:,} :alembic:", inline=False)
+		emb.add_field(name="Balance", value=f"{user_stats.balance:,} :coin:", inline=False)
+		emb.add_field(name="Research", value=f"{user_stats.research:,} :alembic:", inline=False)
 		await itx.followup.send(embed=emb)
 	except Exception as e:
 		log_utils.print_log(f"ERROR: {e}")
@@ -222,8 +482,8 @@ async def economy(
 		embed = discord.Embed(title=f"{user.name}'s Economy", color=discord.Color.dark_grey())
 		for item in chunk:
 			embed.add_field(
-				name=item['name'],
-				value=f"{item['economy_income']:,} :coin: / {PAYOUT_STEP}d",
+				name=item.name,
+				value=f"{item.economy_income:,} :coin: / {PAYOUT_STEP}d",
 				inline=False
 				)
 		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(inv)/OBJECTS_PER_PAGE)}") # Regarding the +1: recall 0-indexing.
@@ -252,9 +512,14 @@ async def inventory(
 		# ==> We'll need to manually chunk things here before displaying data.
 		embed = discord.Embed(title=f"{user.name}'s Inventory", color=discord.Color.dark_grey())
 		for item in chunk:
+			expires = ""
+			if item.expires_at:
+				# ==> Discord renders <t:...:R> as "in 5 minutes" in the reader's own time zone.
+				stamp = int(datetime.strptime(item.expires_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp())
+				expires = f" (next one expires <t:{stamp}:R>)"
 			embed.add_field(
-				name=item['name'],
-				value=f"{item['quantity']:,}",
+				name=item.name,
+				value=f"{item.quantity:,}{expires}",
 				inline=False
 				)
 		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(inv)/OBJECTS_PER_PAGE)}") # Regarding the +1: recall 0-indexing.
@@ -284,8 +549,8 @@ async def technology(
 		embed = discord.Embed(title=f"{user.name}'s Technology", color=discord.Color.dark_grey())
 		for item in chunk:
 			embed.add_field(
-				name=item['name'],
-				value=f"{item['tech_income']:,} :alembic: / {PAYOUT_STEP}d",
+				name=item.name,
+				value=f"{item.tech_income:,} :alembic: / {PAYOUT_STEP}d",
 				inline=False
 				)
 		embed.set_footer(text=f"Page {i//OBJECTS_PER_PAGE+1} of {ceil(len(inv)/OBJECTS_PER_PAGE)}") # Regarding the +1: recall 0-indexing.
@@ -294,13 +559,88 @@ async def technology(
 	view = renderer.Paginator(embeds=embeds)
 	await itx.followup.send(embed=view.initial, view=view)
 
+@player.command(name="history", description="View a player's balance and research over time. Other players are admin-only.")
+async def history(
+	itx:discord.Interaction,
+	user:discord.User,
+	days:typing.Optional[app_commands.Range[int, 1, 3650]] = None
+	):
+	await itx.response.defer()
+
+	if user != itx.user:
+		if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+			await role_utils.err_not_admin(itx=itx)
+			return
+
+	try:
+		bot = typing.cast(commands.Bot, itx.client)
+		since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S") if days else None
+		points = await database.get_history(bot.db, user.id, since=since)
+
+		if not points:
+			return await itx.followup.send(f"No history for {user.name} yet. It starts with the next payout.")
+		lines = [f"{'UTC':<16} {'balance':>14} {'research':>14}"]
+		for p in points:
+			lines.append(f"{p.recorded_at[:16]:<16} {p.balance:>14,} {p.research:>14,}")
+		first, last = points[0], points[-1]
+		emb = discord.Embed(
+			title=f"{user.name}'s History" + (f" (last {days}d)" if days else ""),
+			description="```\n" + "\n".join(lines) + "\n```",
+			color=PLAYER_COLORS["statistics"]
+		)
+		emb.add_field(name="Balance change", value=f"{last.balance - first.balance:+,} :coin:")
+		emb.add_field(name="Research change", value=f"{last.research - first.research:+,} :alembic:")
+		await itx.followup.send(embed=emb)
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+@player.command(name="chart", description="Chart a player's balance and research over time. Other players are admin-only.")
+async def chart(
+	itx:discord.Interaction,
+	user:discord.User,
+	days:typing.Optional[app_commands.Range[int, 1, 3650]] = None
+	):
+	await itx.response.defer()
+
+	if user != itx.user:
+		if not role_utils.has_admin(itx.user.roles, ADMIN_ROLE_ID):
+			await role_utils.err_not_admin(itx=itx)
+			return
+	if not charts.is_available():
+		return await itx.followup.send("Charts need matplotlib installed on the bot's host.")
+
+	try:
+		bot = typing.cast(commands.Bot, itx.client)
+		since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S") if days else None
+		points = await database.get_history(bot.db, user.id, since=since, points=CHART_POINTS)
+
+		if len(points) < 2:
+			return await itx.followup.send(f"Not enough history for {user.name} yet to draw a chart.")
+		png = await charts.render(
+			("player", user.id, since and since[:10], points[-1].seq, len(points)), # ==> Data version
+			charts.render_series,
+			f"{user.name}'s History" + (f" (last {days}d)" if days else ""),
+			[p.recorded_at for p in points],
+			{"Balance": [p.balance for p in points], "Research": [p.research for p in points]}
+		)
+		await itx.followup.send(file=discord.File(io.BytesIO(png), filename="history.png"))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
 # ~~ [P2P FAMILY] ~~
 # Used to interact with another player's information
 
 @player.command(name="transact", description="Transact with another player.")
+@app_commands.describe(
+	item="Items to give, e.g. 'Iron' or 'Iron=3, Wood=10'. Names without =N use quantity.",
+	quantity="Coins or RP to send, or how many of each item"
+)
 @app_commands.choices(options=[
-	app_commands.Choice(name="Give", value="give"),
-	app_commands.Choice(name="Pay",  value="pay")
+	app_commands.Choice(name="Give",			value="give"),
+	app_commands.Choice(name="Pay",				value="pay"),
+	app_commands.Choice(name="Send research",	value="research")
 ])
 async def transact(
 	itx:discord.Interaction,
@@ -316,50 +656,77 @@ async def transact(
 	if quantity <= 0:
 		await itx.followup.send("You can't transact nothing!")
 		return
-
-	if options.value == "give":
-		# Use /use logic, but we must also add item to recipient
-		# Get item, plr info
-		try:
-			itemRow = await database.get_table_row(
-				db=bot.db,
-				table_name="item_market",
-				pk_col="name",	# column to look through in SQL table
-				pk_val=item		# the value to match
-			)
-			if not itemRow:
-				await itx.followup.send("No matching item found...")
-			recRow = await database.get_table_row(
-				db=bot.db,
-				table_name="users",
-				pk_col="user_id",	# column to look through in SQL table
-				pk_val=recipient.id	# the value to match
-			)
-			if not recRow:
-				await itx.followup.send("No recipient found...")
-			invRow = await 	database.get_inventory_item(bot.db, itx.user.id, item)
-			if not invRow:
-				await itx.followup.send(f"No item in inventory found. Do you have {item}?")
-			log_utils.print_debug(f"Attempting to remove {quantity} of {item} from {itx.user.name}'s inventory...")
-
-		# Handle transaction
-			if invRow['quantity'] >= quantity:
-				# Using item_to_inv to subtract
-				log_utils.print_debug(f"Subtracting from {itx.user.name}'s inventory:")
-				await database.item_to_inv(db=bot.db, item_name=item, user_id=itx.user.id, quantity=-quantity)
-				log_utils.print_debug(f"Passing to {recipient.name}'s inventory:")
-				await database.item_to_inv(db=bot.db, item_name=item, user_id=recipient.id, quantity=quantity)
-			
-			await itx.followup.send(f"Gave {quantity} of {item} to {recipient.name}!")
-		
-		except Exception as e:
-			log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
-			await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
-
-	if options.value == "pay":
-		# use /buy balance aspect, but we must also add curr. to recipient
+	if recipient.id == itx.user.id:
+		await itx.followup.send("You can't transact with yourself!")
 		return
 
+	# ==> Each branch is a single transaction: the sender is debited and the recipient credited together, or not at all.
+	try:
+		if options.value == "give":
+			if not item:
+				await itx.followup.send("Name the item(s) to give!")
+				return
+			items = parse_utils.parse_items(item, quantity)
+			await database.transfer_items(bot.db, itx.user.id, recipient.id, items)
+			given = ", ".join(f"{qty:,} of {name}" for name, qty in items.items())
+			await itx.followup.send(f"Gave {given} to {recipient.name}!")
+
+		if options.value == "pay":
+			balance = await database.transfer_stat(bot.db, "balance", itx.user.id, recipient.id, quantity)
+			await itx.followup.send(f"Paid {quantity:,} :coin: to {recipient.name}! You have {balance:,} :coin: left.")
+
+		if options.value == "research":
+			research = await database.transfer_stat(bot.db, "research", itx.user.id, recipient.id, quantity)
+			await itx.followup.send(f"Sent {quantity:,} :alembic: to {recipient.name}! You have {research:,} :alembic: left.")
+
+	except ValueError as e:
+		# ==> Our own checks (not enough money, unknown player...). Nothing was written.
+		await itx.followup.send(str(e))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
+# ~~ [crafting FAMILY] ~~
+# Turns items into other items. Recipes are added with /market add_recipe.
+
+@player.command(name="craft", description="Craft an item from its recipe.")
+@app_commands.describe(
+	item="The item to craft",
+	times="How many times to run the recipe",
+	from_scratch="Also craft any intermediate items from base items (off: use the ones you hold)"
+)
+async def craft(itx:discord.Interaction, item:str, times:int = 1, from_scratch:bool = True):
+	log_utils.print_log(f"craft called: {itx.user.name} wants to craft {item} x{times}")
+	await itx.response.defer()
+	bot = typing.cast(commands.Bot, itx.client)
+	try:
+		book = database.recipes_for(bot.db)
+		recipe = await book.get(item)
+		if recipe is None:
+			await itx.followup.send(f"No recipe makes {item}.")
+			return
+		plrRow = await database.get_profile(bot.db, itx.user.id)
+		if not plrRow:
+			await itx.followup.send("Player doesn't exist...")
+			return
+		missing = sorted(tech for tech in (recipe.techs if from_scratch else recipe.direct_techs) if not plrRow.has_tech(tech))
+		if missing:
+			await itx.followup.send(f"Missing required tech {', '.join(f'<{tech}>' for tech in missing)}.")
+			return
+
+		# ==> One transaction: every input is checked and taken, and every output handed out, or nothing is.
+		result = await book.craft(itx.user.id, item, times=times, from_scratch=from_scratch)
+		used = ", ".join(f"{qty:,} {name}" for name, qty in result.consumed.items())
+		made = ", ".join(f"{qty:,} {name}" for name, qty in result.produced.items())
+		await itx.followup.send(f"Crafted {made} from {used}!")
+
+	except ValueError as e:
+		# ==> Unknown recipe, missing inputs... Nothing was written.
+		await itx.followup.send(str(e))
+	except Exception as e:
+		log_utils.print_log(f"[ERR]: {type(e).__name__}: {e}")
+		await itx.followup.send(f"[ERR]: {type(e).__name__}: {e}")
+
 
 
 async def setup(bot:commands.Bot):	# Add debug cog
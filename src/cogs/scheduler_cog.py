@@ -5,6 +5,7 @@ INFORMATION
 	
 """
 import aiosqlite, utility_libs.scheduler as scheduler
+from utility_libs.outbox import AnnouncementOutbox
 from discord.ext import commands
 from datetime import datetime, timezone
 
@@ -14,15 +15,24 @@ class SchedulerCog(commands.Cog):
 		self.db = db
 		self.announce_channel = announce_channel
 
-		async def announce(msg:str):
-			channel = await self.bot.fetch_channel(self.announce_channel)
-			await channel.send(msg)
-
-		self.PaySch = scheduler.PayoutScheduler(db, announce)
+		# ==> Announcements are persisted, batched and paced by the outbox, so the scheduler never waits on Discord.
+		self.outbox = AnnouncementOutbox(bot, db, announce_channel)
+		self.PaySch = scheduler.PayoutScheduler(db, self.outbox.announce)
+		self.AucSch = scheduler.AuctionScheduler(db, self.outbox.announce)
+		self.ExpSch = scheduler.ExpiryScheduler(db, self.outbox.announce_many)
 
 	async def cog_load(self):
 		self.PaySch.is_ready()
+		self.outbox.start()
 		await self.PaySch.start()
+		await self.AucSch.start()
+		await self.ExpSch.start()
+
+	async def cog_unload(self):
+		await self.ExpSch.stop()
+		await self.AucSch.stop()
+		await self.PaySch.stop()
+		await self.outbox.stop()
 
 async def setup(bot:commands.Bot):
 	await bot.add_cog(SchedulerCog(bot, bot.db, bot.announce_channel))
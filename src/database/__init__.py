@@ -2,57 +2,277 @@
 INFORMATION
 
 	The database folder is where all of our data-related content exists.
-	__init__ shows us the initialization and indexing functions.
+	__init__ shows us the initialization function. The schema itself lives in migrations.py.
 	Importing database does not create or modify our database; we should call the functions explicitly.
 	
 """
 
+import aiosqlite
+
 from .data_handler import(
+	PAYOUT_SQL,
+	CLEAR_MULTIPLIERS_SQL,
+	REFRESH_MULTIPLIERS_SQL,
+	PRUNE_MODIFIERS_SQL,
+	CLAIM_RUN_SQL,
+	RUN_STATUS_SQL,
+	COMPLETE_RUN_SQL,
+	FAIL_RUN_SQL,
+	LAST_COMPLETE_RUN_SQL,
 	connect_database,
 	close,
-	create_database,
-	create_indices,
 	add_user,
 	remove_user,
 	get_table_asc,
 	add_bal,
 	add_res,
 	remove_user_object,
+	transfer_stat,
+	transfer_items,
 	add_economy,
 	add_item,
 	add_tech,
+	edit_economy,
+	edit_item,
+	edit_tech,
 	get_table_row,
 	get_user_table_asc,
+	stream_table_asc,
+	stream_user_table_asc,
+	stream_user_stats,
 	get_inventory_item,
+	get_profile,
+	refresh_profiles,
+	get_history,
+	get_economy_history,
+	get_income_distribution,
+	get_economy_totals,
+	get_forecast_inputs,
+	get_open_orders,
+	get_recent_fills,
+	get_open_auctions,
+	sweep_expired,
+	SweepInterrupted,
+	add_modifier,
+	remove_modifier,
+	get_modifiers,
 	remove_object,
+	refresh_username,
+	record_last_seen,
+	count_command,
+	record_audit,
+	queue_announcement,
+	queue_announcements,
+	pending_announcements,
+	delete_announcements,
 	item_to_inv,
 	econ_to_inv,
 	tech_to_inv
 )
 
-async def initialize_database():
-	await create_database()
-	await create_indices()
+from .backends import(
+	StorageBackend,
+	SQLiteBackend,
+	MemoryBackend,
+	make_backend,
+	backend_for
+)
+
+from .history import(
+	RECORD_HISTORY_SQL,
+	ADVANCE_HISTORY_HEADS_SQL,
+	RECORD_ECONOMY_SQL,
+	HISTORY_SNAPSHOT_EVERY,
+	EconomySnapshot,
+	HistoryPoint
+)
+
+from .order_book import(
+	Exchange,
+	OrderResult,
+	BookLevel,
+	exchange_for
+)
+
+from .auctions import(
+	AuctionHouse,
+	AuctionResult,
+	auctions_for
+)
+
+from .recipes import(
+	RecipeBook,
+	CompiledRecipe,
+	CraftResult,
+	recipes_for
+)
+
+from .unit_of_work import(
+	run_unit,
+	run_read,
+	on_connection_thread,
+	wrap_connection_thread
+)
+
+from .profile_cache import(
+	PlayerProfile,
+	ProfileCache,
+	profiles_for
+)
+
+from .write_behind import(
+	WriteBehindQueue,
+	write_behind_for
+)
+
+from .single_flight import(
+	coalesce,
+	invalidate_reads
+)
+
+from .rows import(
+	User,
+	Item,
+	Tech,
+	Economy,
+	InventoryEntry,
+	OwnedEconomy,
+	OwnedTech,
+	ScheduleRun,
+	OutboxMessage,
+	OpenOrder,
+	MarketFill,
+	Auction,
+	Recipe,
+	RecipeInput,
+	IncomeModifier,
+	UserMultiplier,
+	EconomyTotals,
+	ForecastInputs
+)
+
+from .migrations import(
+	LATEST_VERSION,
+	get_schema_version,
+	migrate
+)
+
+# [initialize_database]
+# ==> Brings our open connection's schema up to date. A current database only costs one PRAGMA read.
+async def initialize_database(db:aiosqlite.Connection) -> int:
+	return await migrate(db)
 
 __all__ = [
+	"PAYOUT_SQL",
+	"CLEAR_MULTIPLIERS_SQL",
+	"REFRESH_MULTIPLIERS_SQL",
+	"PRUNE_MODIFIERS_SQL",
+	"CLAIM_RUN_SQL",
+	"RUN_STATUS_SQL",
+	"COMPLETE_RUN_SQL",
+	"FAIL_RUN_SQL",
+	"LAST_COMPLETE_RUN_SQL",
 	"connect_database",
 	"close",
-	"create_database",
-	"create_indices",
 	"initialize_database",
+	"StorageBackend",
+	"SQLiteBackend",
+	"MemoryBackend",
+	"make_backend",
+	"backend_for",
+	"LATEST_VERSION",
+	"get_schema_version",
+	"migrate",
+	"run_unit",
+	"run_read",
+	"on_connection_thread",
+	"wrap_connection_thread",
+	"coalesce",
+	"invalidate_reads",
+	"User",
+	"Item",
+	"Tech",
+	"Economy",
+	"InventoryEntry",
+	"OwnedEconomy",
+	"OwnedTech",
+	"ScheduleRun",
+	"OutboxMessage",
 	"add_user",
 	"remove_user",
 	"get_table_asc",
 	"get_user_table_asc",
+	"stream_table_asc",
+	"stream_user_table_asc",
+	"stream_user_stats",
 	"add_bal",
 	"add_res",
 	"remove_user_object",
+	"transfer_stat",
+	"transfer_items",
 	"add_economy",
 	"add_item",
 	"add_tech",
+	"edit_economy",
+	"edit_item",
+	"edit_tech",
 	"get_table_row",
 	"get_inventory_item",
+	"get_profile",
+	"refresh_profiles",
+	"get_history",
+	"get_economy_history",
+	"get_income_distribution",
+	"get_economy_totals",
+	"get_forecast_inputs",
+	"get_open_orders",
+	"get_recent_fills",
+	"Exchange",
+	"OrderResult",
+	"BookLevel",
+	"exchange_for",
+	"OpenOrder",
+	"MarketFill",
+	"get_open_auctions",
+	"sweep_expired",
+	"SweepInterrupted",
+	"add_modifier",
+	"remove_modifier",
+	"get_modifiers",
+	"AuctionHouse",
+	"AuctionResult",
+	"auctions_for",
+	"Auction",
+	"RecipeBook",
+	"CompiledRecipe",
+	"CraftResult",
+	"recipes_for",
+	"Recipe",
+	"RecipeInput",
+	"IncomeModifier",
+	"UserMultiplier",
+	"EconomyTotals",
+	"ForecastInputs",
+	"RECORD_HISTORY_SQL",
+	"ADVANCE_HISTORY_HEADS_SQL",
+	"RECORD_ECONOMY_SQL",
+	"EconomySnapshot",
+	"HISTORY_SNAPSHOT_EVERY",
+	"HistoryPoint",
+	"PlayerProfile",
+	"ProfileCache",
+	"profiles_for",
 	"remove_object",
+	"refresh_username",
+	"record_last_seen",
+	"count_command",
+	"record_audit",
+	"queue_announcement",
+	"queue_announcements",
+	"pending_announcements",
+	"delete_announcements",
+	"WriteBehindQueue",
+	"write_behind_for",
 	"item_to_inv",
 	"econ_to_inv",
 	"tech_to_inv"
@@ -0,0 +1,177 @@
+"""
+INFORMATION
+
+	This is our auction house: timed auctions of user_inventories items, for /market auction and /market bid.
+	Listing an auction takes the items out of the seller's inventory right away (escrow), and a bid takes its coins out
+	of the bidder's balance. Being outbid hands those coins straight back, so only the top bid of each auction is held.
+
+	Bids don't take a lock. Every bid's check-and-write is one unit of work, and units run one at a time on the
+	connection thread, so the database is the only referee: a bid that lost a race is refused there, never half-applied.
+	In memory, we keep each auction's highest bid seen so far (it only ever rises), to refuse bids that are already too low
+	without a trip to the database.
+
+	Closing is driven by the scheduler (utility_libs/scheduler.py, AuctionScheduler), which wakes at each deadline.
+	settle_due() then closes every auction due by that second in one transaction, with a handful of set-based statements,
+	however many there are: winners get the items, sellers get the top bid, unsold items go back to the seller.
+	Escrowed items keep their expiry clock (see ledger.py), so an auction never gives a consumable more time.
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, sqlite3, typing, weakref
+from datetime import datetime, timedelta, timezone
+from .ledger import CREDIT_BALANCE_SQL, DEBIT_BALANCE_SQL, JOIN_CLOCK, TAKE_ITEMS_SQL
+from .profile_cache import profiles_for
+from .unit_of_work import run_read, run_unit
+
+""" [SETUP] """
+class AuctionResult(typing.NamedTuple):
+	auction_id:int
+	item:str
+	quantity:int
+	seller_id:int
+	winner_id:int|None		# ==> None if nobody bid
+	price:int|None
+
+def _utc(dt:datetime) -> str:
+	return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+""" [AUCTION SQL] """
+CREATE_AUCTION_SQL = "INSERT INTO auctions(item, quantity, seller_id, min_bid, created_at, closes_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+BID_CHECK_SQL = "SELECT seller_id, min_bid, top_bid, top_bidder_id FROM auctions WHERE auction_id = ? AND status = 'open' AND closes_at > ?"
+TOP_BID_SQL = "UPDATE auctions SET top_bid = ?, top_bidder_id = ? WHERE auction_id = ?"
+DEADLINES_SQL = "SELECT auction_id, closes_at FROM auctions WHERE status = 'open'"
+
+""" [SETTLEMENT SQL] """
+# ==> All take :now and must run in this order, inside one transaction. Each one covers every auction due by :now
+#	(status = 'open' AND closes_at <= :now), which is a range on idx_auctions_open.
+_DUE = "status = 'open' AND closes_at <= :now"
+_DUE_A = "a.status = 'open' AND a.closes_at <= :now"
+
+# ==> Sellers get their top bids. A seller who has since left the server simply isn't paid.
+PAY_SELLERS_SQL = f"""
+	UPDATE users
+	SET balance = balance + (
+		SELECT SUM(a.top_bid) FROM auctions AS a
+		WHERE {_DUE_A} AND a.seller_id = users.user_id AND a.top_bidder_id IS NOT NULL
+	)
+	WHERE user_id IN (SELECT seller_id FROM auctions WHERE {_DUE} AND top_bidder_id IS NOT NULL)
+	RETURNING user_id, balance, research
+"""
+
+# ==> Items go to the winner, or back to the seller if nobody bid, with the clock they were listed with.
+DELIVER_ITEMS_SQL = f"""
+	INSERT INTO user_inventories(user_id, name, quantity, expires_at)
+	SELECT COALESCE(a.top_bidder_id, a.seller_id), a.item, a.quantity, a.expires_at FROM auctions AS a
+	WHERE {_DUE_A}
+		AND EXISTS (SELECT 1 FROM users AS u WHERE u.user_id = COALESCE(a.top_bidder_id, a.seller_id))
+	ON CONFLICT(user_id, name) DO UPDATE SET quantity = quantity + excluded.quantity, expires_at = {JOIN_CLOCK}
+"""
+
+CLOSE_AUCTIONS_SQL = f"""
+	UPDATE auctions
+	SET status = CASE WHEN top_bidder_id IS NULL THEN 'unsold' ELSE 'sold' END
+	WHERE {_DUE}
+	RETURNING auction_id, item, quantity, seller_id, top_bidder_id, top_bid
+"""
+
+""" [UNITS OF WORK] """
+def _create_work(conn:sqlite3.Connection, seller_id:int, item:str, quantity:int, min_bid:int, now:str, closes_at:str) -> int:
+	row = conn.execute(TAKE_ITEMS_SQL, (quantity, seller_id, item, quantity)).fetchone()
+	if not row:
+		raise ValueError(f"Not enough {item}! Do you have {quantity}?")
+	return conn.execute(CREATE_AUCTION_SQL, (item, quantity, seller_id, min_bid, now, closes_at, row[0])).lastrowid
+
+# ==> Returns {user_id: (balance, research)} for the bidder and whoever we refunded.
+def _bid_work(conn:sqlite3.Connection, auction_id:int, bidder_id:int, amount:int, now:str) -> dict[int, tuple[int, int]]:
+	row = conn.execute(BID_CHECK_SQL, (auction_id, now)).fetchone()
+	if not row:
+		raise ValueError(f"Auction #{auction_id} is closed or doesn't exist.")
+	seller_id, min_bid, top_bid, top_bidder_id = row
+	if bidder_id == seller_id:
+		raise ValueError("You can't bid on your own auction.")
+	if amount < min_bid or (top_bid is not None and amount <= top_bid):
+		raise ValueError(f"Bid more than {top_bid:,} :coin:!" if top_bid is not None else f"The minimum bid is {min_bid:,} :coin:.")
+
+	# ==> Raising your own top bid only holds the difference.
+	held = top_bid if top_bidder_id == bidder_id else 0
+	stats = {}
+	bidder = conn.execute(DEBIT_BALANCE_SQL, (amount - held, bidder_id, amount - held)).fetchone()
+	if not bidder:
+		raise ValueError("Not enough balance! Your bid is held until you're outbid or the auction ends.")
+	stats[bidder_id] = bidder
+	if top_bidder_id is not None and top_bidder_id != bidder_id:
+		refunded = conn.execute(CREDIT_BALANCE_SQL, (top_bid, top_bidder_id)).fetchone()
+		if refunded:
+			stats[top_bidder_id] = refunded
+	conn.execute(TOP_BID_SQL, (amount, bidder_id, auction_id))
+	return stats
+
+def _settle_work(conn:sqlite3.Connection, now:str) -> tuple[list[AuctionResult], list[tuple[int, int, int]]]:
+	params = {"now": now}
+	sellers = conn.execute(PAY_SELLERS_SQL, params).fetchall()
+	conn.execute(DELIVER_ITEMS_SQL, params)
+	closed = [AuctionResult(*row) for row in conn.execute(CLOSE_AUCTIONS_SQL, params).fetchall()]
+	return closed, sellers
+
+""" [AUCTION HOUSE] """
+class AuctionHouse:
+	def __init__(self, db:aiosqlite.Connection) -> None:
+		self.db:aiosqlite.Connection = db
+		self._top_bids:dict[int, int] = {} # ==> auction_id -> highest bid committed so far. Only ever rises.
+		# ==> Told about every new auction's deadline, so it can wake up for it. Set by the scheduler.
+		self.on_open:typing.Callable[[int, datetime], None]|None = None
+
+	# [create]
+	# ==> Puts `quantity` of the seller's item up for auction. Returns (auction_id, closes_at).
+	async def create(self, seller_id:int, item:str, quantity:int, min_bid:int, duration:timedelta) -> tuple[int, datetime]:
+		if quantity <= 0 or min_bid <= 0:
+			raise ValueError("Quantity and minimum bid must be positive.")
+		now = datetime.now(timezone.utc).replace(microsecond=0)
+		closes_at = now + duration
+		auction_id = await run_unit(self.db, _create_work, seller_id, item, quantity, min_bid, _utc(now), _utc(closes_at))
+		if self.on_open is not None:
+			self.on_open(auction_id, closes_at)
+		return auction_id, closes_at
+
+	# [bid]
+	async def bid(self, auction_id:int, bidder_id:int, amount:int) -> None:
+		top = self._top_bids.get(auction_id)
+		if top is not None and amount <= top:
+			raise ValueError(f"Bid more than {top:,} :coin:!") # ==> Already beaten. No need to ask the database.
+		stats = await run_unit(self.db, _bid_work, auction_id, bidder_id, amount, _utc(datetime.now(timezone.utc)))
+		if amount > self._top_bids.get(auction_id, 0):
+			self._top_bids[auction_id] = amount
+		cache = profiles_for(self.db)
+		for user_id, (balance, research) in stats.items():
+			cache.set_stats(user_id, balance, research)
+
+	# [settle_due]
+	# ==> Closes every auction whose deadline is at or before `now`, in one transaction. Returns what closed.
+	async def settle_due(self, now:datetime|None = None) -> list[AuctionResult]:
+		closed, sellers = await run_unit(self.db, _settle_work, _utc(now or datetime.now(timezone.utc)))
+		cache = profiles_for(self.db)
+		for user_id, balance, research in sellers:
+			cache.set_stats(user_id, balance, research)
+		for result in closed:
+			self._top_bids.pop(result.auction_id, None)
+		return closed
+
+	# [deadlines]
+	# ==> Every open auction's deadline, for the scheduler to pick back up after a restart.
+	async def deadlines(self) -> list[tuple[int, datetime]]:
+		def work(conn:sqlite3.Connection) -> list[tuple[int, str]]:
+			return conn.execute(DEADLINES_SQL).fetchall()
+		return [
+			(auction_id, datetime.strptime(closes_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc))
+			for auction_id, closes_at in await run_read(self.db, work)
+		]
+
+""" [PER-CONNECTION REGISTRY] """
+_houses:"weakref.WeakKeyDictionary[aiosqlite.Connection, AuctionHouse]" = weakref.WeakKeyDictionary()
+
+def auctions_for(db:aiosqlite.Connection) -> AuctionHouse:
+	house = _houses.get(db)
+	if house is None:
+		house = _houses[db] = AuctionHouse(db)
+	return house
@@ -0,0 +1,140 @@
+"""
+INFORMATION
+
+	These are our storage backends: where the one connection we hand to every cog and the scheduler actually keeps its data.
+	Pick one with STORAGE_BACKEND in .env:
+		sqlite	==> (default) The database file at DB_PATH. Every commit is durable.
+		memory	==> The whole database lives in RAM, so nothing waits on the disk or on fsync. Good for short event games and
+					test runs. If SNAPSHOT_PATH is set, we restore from it on startup, copy the database there every
+					SNAPSHOT_INTERVAL seconds (only if something changed), and once more on close.
+					Anything after the last snapshot is lost on a crash!
+	Both hand back a normal aiosqlite connection, so data_handler, migrations and the scheduler don't know which one they got.
+
+"""
+
+""" [IMPORTS] """
+import abc, aiosqlite, asyncio, contextlib, os, sqlite3, typing, weakref
+from utility_libs.utilities import LoggingUtilities
+from .unit_of_work import on_connection_thread
+
+""" [SETUP] """
+LogUtil = LoggingUtilities(True,True)
+STORAGE_BACKEND:str = (os.getenv("STORAGE_BACKEND") or "sqlite").lower()
+SNAPSHOT_PATH:str|None = os.getenv("SNAPSHOT_PATH") or None
+SNAPSHOT_INTERVAL:float = float(os.getenv("SNAPSHOT_INTERVAL") or 60)
+
+class StorageBackend(abc.ABC):
+	name:str = "base"
+
+	# [open]
+	# ==> Returns a fresh connection. connect_database sets our pragmas and row factory on it afterwards.
+	@abc.abstractmethod
+	async def open(self) -> aiosqlite.Connection:
+		...
+
+	def start(self, db:aiosqlite.Connection) -> None:
+		return
+
+	async def close(self, db:aiosqlite.Connection) -> None:
+		await db.close()
+
+class SQLiteBackend(StorageBackend):
+	name = "sqlite"
+
+	def __init__(self, path:str) -> None:
+		self.path:str = path
+
+	async def open(self) -> aiosqlite.Connection:
+		return await aiosqlite.connect(self.path)
+
+class MemoryBackend(StorageBackend):
+	name = "memory"
+
+	def __init__(self, snapshot_path:str|None = SNAPSHOT_PATH, *, snapshot_interval:float = SNAPSHOT_INTERVAL) -> None:
+		self.snapshot_path:str|None = snapshot_path
+		self.snapshot_interval:float = snapshot_interval
+		self._task:typing.Optional[asyncio.Task] = None
+		self._snapshot_changes:int = -1 # ==> conn.total_changes at our last snapshot
+
+	async def open(self) -> aiosqlite.Connection:
+		db = await aiosqlite.connect(":memory:")
+		if self.snapshot_path and os.path.exists(self.snapshot_path):
+			await on_connection_thread(db, _restore, self.snapshot_path)
+			LogUtil.print_log(f"Restored in-memory database from {self.snapshot_path}")
+		return db
+
+	""" [SNAPSHOT BLOCK] """
+	def start(self, db:aiosqlite.Connection) -> None:
+		if self.snapshot_path and self._task is None:
+			self._task = asyncio.create_task(self._snapshot_forever(db))
+
+	async def close(self, db:aiosqlite.Connection) -> None:
+		if self._task:
+			self._task.cancel()
+			with contextlib.suppress(asyncio.CancelledError):
+				await self._task
+			self._task = None
+		if self.snapshot_path:
+			await self.snapshot(db)
+		await db.close()
+
+	# [snapshot]
+	# ==> Copies the database to snapshot_path. Returns False if we skipped it (nothing changed, or a transaction is open).
+	async def snapshot(self, db:aiosqlite.Connection) -> bool:
+		if not self.snapshot_path:
+			return False
+		changes = await on_connection_thread(db, _snapshot, self.snapshot_path, self._snapshot_changes)
+		if changes is None:
+			return False
+		self._snapshot_changes = changes
+		LogUtil.print_debug(f"Snapshotted in-memory database to {self.snapshot_path}")
+		return True
+
+	async def _snapshot_forever(self, db:aiosqlite.Connection) -> None:
+		while True:
+			await asyncio.sleep(self.snapshot_interval)
+			try:
+				await self.snapshot(db)
+			except Exception as e:
+				LogUtil.print_log(f"[ERR]: Snapshot failed: {type(e).__name__}: {e}")
+
+""" [CONNECTION THREAD] """
+# ==> These run on aiosqlite's thread, between other units of work, so nobody writes while we copy.
+def _restore(conn:sqlite3.Connection, path:str) -> None:
+	source = sqlite3.connect(path)
+	try:
+		source.backup(conn)
+	finally:
+		source.close()
+
+def _snapshot(conn:sqlite3.Connection, path:str, last_changes:int) -> int|None:
+	# ==> Someone (e.g. a migration) holds a transaction open across awaits. Don't copy their half-finished work; try next time.
+	if conn.in_transaction or conn.total_changes == last_changes:
+		return None
+	tmp_path = f"{path}.tmp"
+	target = sqlite3.connect(tmp_path)
+	try:
+		conn.backup(target)
+	finally:
+		target.close()
+	os.replace(tmp_path, path) # ==> Atomic, so a crash mid-copy never leaves us with half a snapshot.
+	return conn.total_changes
+
+# [make_backend]
+# ==> Builds the backend named by STORAGE_BACKEND (or kind). db_path is only used by the sqlite backend.
+def make_backend(kind:str = STORAGE_BACKEND, *, db_path:str) -> StorageBackend:
+	if kind == "sqlite":
+		return SQLiteBackend(db_path)
+	if kind == "memory":
+		return MemoryBackend()
+	raise ValueError(f"Unknown STORAGE_BACKEND {kind!r}. Use 'sqlite' or 'memory'.")
+
+""" [PER-CONNECTION REGISTRY] """
+_backends:"weakref.WeakKeyDictionary[aiosqlite.Connection, StorageBackend]" = weakref.WeakKeyDictionary()
+
+def register_backend(db:aiosqlite.Connection, backend:StorageBackend) -> None:
+	_backends[db] = backend
+
+# ==> None for a connection that didn't come from connect_database.
+def backend_for(db:aiosqlite.Connection) -> StorageBackend|None:
+	return _backends.get(db)
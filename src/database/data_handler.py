@@ -7,8 +7,20 @@ INFORMATION
 """
 
 """ [IMPORTS] """
-import aiosqlite, discord, typing
+import aiosqlite, discord, sqlite3, typing
+from array import array
+from datetime import datetime, timezone
 from utility_libs.utilities import LoggingUtilities
+from .backends import StorageBackend, backend_for, make_backend, register_backend
+from .history import HISTORY_MAX_POINTS, EconomySnapshot, HistoryPoint, downsample, read_history, record_user_point, trades_for
+from .ledger import CREDIT_ITEMS_SQL, TAKE_ITEMS_SQL, credit_stat_sql, debit_stat_sql
+from .order_book import exchange_for
+from .rows import SELECT_COLUMNS, Auction, Economy, EconomyTotals, ForecastInputs, IncomeModifier, InventoryEntry, MarketFill, OpenOrder, OutboxMessage, Row, Tech, check_column, row_type
+from .profile_cache import PlayerProfile, profiles_for
+from .recipes import recipes_for
+from .single_flight import coalesce
+from .unit_of_work import run_read, run_unit
+from .write_behind import write_behind_for
 
 """ [TABLE NAMES] - For our convenience.
 users
@@ -19,11 +31,27 @@ economy_market
 item_market
 tech_market
 schedule
+announcement_outbox
+balance_history
+history_heads
+economy_snapshots
+open_orders
+market_fills
+auctions
 """
 
 """ [SETUP] """
 DB_PATH = "database/Countermeasure.db"
 LogUtil = LoggingUtilities(True,True)
+STREAM_CHUNK_SIZE:int = 500 # ==> Default rows per fetchmany for our stream_ family.
+EXPIRY_BATCH_SIZE:int = 500 # ==> Inventory stacks expired per transaction by sweep_expired
+
+# ==> A sweep_expired batch failed after earlier batches committed. `expired` is what those batches took, in the
+#	same shape sweep_expired returns, so those players still hear about it. The failure is chained as __cause__.
+class SweepInterrupted(Exception):
+	def __init__(self, expired:dict[int, dict[str, int]]) -> None:
+		super().__init__(f"Expiry sweep stopped after {sum(map(len, expired.values()))} stack(s)")
+		self.expired:dict[int, dict[str, int]] = expired
 
 WHITELISTED_TABLES = {
 	"users",
@@ -36,133 +64,314 @@ WHITELISTED_TABLES = {
 	"schedule"
 }
 
-""" [INITIALIZATION FUNCTIONS] """
-# [database connect & close ] --> a wrapper used to connect to/close our database. Saves need to import aiosqlite
-async def connect_database():
-	db = await aiosqlite.connect(DB_PATH)
-	await db.execute("PRAGMA foreign_keys = ON;")
-	db.row_factory = aiosqlite.Row
-	return db
+# ==> Tables whose rows end up in a cached player profile, directly or through ON DELETE CASCADE.
+PROFILE_TABLES = {"users", "user_tech", "user_economy", "tech_market", "economy_market"}
 
-async def close(db:aiosqlite.Connection):
-	await db.close()
-
-async def create_database() -> None:
-	async with aiosqlite.connect(DB_PATH) as db:
-		# users Table
-		await db.execute("""
-			CREATE TABLE IF NOT EXISTS users(
-				user_id INTEGER PRIMARY KEY,
-				username TEXT,
-				balance INTEGER DEFAULT 0,
-				research INTEGER DEFAULT 0
-			)
-		""")
-
-	# user economy table. Contains the economies that our user has unlocked.
-		await db.execute("""
-			CREATE TABLE IF NOT EXISTS user_economy(
-				user_id INTEGER NOT NULL,
-				name TEXT NOT NULL,
-				economy_income INTEGER,
-				PRIMARY KEY (user_id, name),
-				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-				FOREIGN KEY (name) REFERENCES economy_market(name) ON DELETE CASCADE
-			)
-		""")
-
-	# user inventories table. Independent from users since inventories can get large!
-		await db.execute("""
-			CREATE TABLE IF NOT EXISTS user_inventories(
-				user_id INTEGER NOT NULL,
-				name TEXT NOT NULL,
-				quantity INTEGER DEFAULT 0 CHECK(quantity >= 0),
-				PRIMARY KEY (user_id, name),
-				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-				FOREIGN KEY (name) REFERENCES item_market(name) ON DELETE CASCADE
-			)
-		""")
-
-	# user tech table. Contains the tech that the user has unlocked.
-	# Tech may have an income assigned to it. This contributes to a player's research during payouts.
-		await db.execute("""
-			CREATE TABLE IF NOT EXISTS user_tech(
-				user_id INTEGER NOT NULL,
-				name TEXT NOT NULL,
-				tech_income INTEGER,
-				PRIMARY KEY (user_id, name),
-				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
-				FOREIGN KEY (name) REFERENCES tech_market(name) ON DELETE CASCADE
-			)
-		""")
+""" [PAYOUT] """
+# ==> Income modifiers stack like this, separately for economy income and research:
+#	1. Percent bonuses add up, from every tech, item and global modifier that applies: +10% and +15% make +25%.
+#		The total can't go below -100%.
+#	2. Multipliers don't stack: the strongest one that applies is used. x2 and x3 make x3.
+#	3. Effective income = income * (1 + total percent / 100) * multiplier, rounded to a whole number once per payout.
+# ==> A player's tech and item modifiers are combined ahead of time into user_multipliers (see REFRESH_MULTIPLIERS_SQL),
+#	and kept up to date as they gain or lose a source (migration v14). Global modifiers are few, so the payout combines
+#	them itself, once per statement.
+# ==> A modifier counts until it's pruned. The payout prunes against its own run time first (see PRUNE_MODIFIERS_SQL),
+#	so a backfilled date still gets the modifiers that were live on it.
 
-	# economy_market Table. We store the levels of economy here. These are to be assigned by mods.
-		await db.execute("""
-			CREATE TABLE IF NOT EXISTS economy_market(
-				name TEXT PRIMARY KEY NOT NULL,
-				economy_income INTEGER
-			)
-		""")
-
-	# item_market Table. where items for sale exist.
-	# Many items will require unlockable "Tech" roles to buy. 
-	# ==> Uses currency. NOT same as research
-	# --> I plan to make a check where if not req_role, then we can go ahead and try to buy. If req_role, then check if player has role, then try to buy, etc etc...
-	# --> No duplicate names allowed!
-	# ==> Cost CAN be negative. This adds credit to a player.
-		await db.execute("""
-			CREATE TABLE IF NOT EXISTS item_market(
-				name TEXT PRIMARY KEY NOT NULL,
-				description TEXT,
-				cost INTEGER,
-				req_tech TEXT
-			)
-		""")
+# [GLOBAL_MODIFIERS_SQL]
+# ==> One row: the global modifiers, combined per the rules above.
+GLOBAL_MODIFIERS_SQL = """
+	SELECT
+		COALESCE(SUM(CASE WHEN target = 'economy' AND kind = 'percent' THEN value END), 0) AS economy_bonus,
+		COALESCE(MAX(CASE WHEN target = 'economy' AND kind = 'multiplier' THEN value END), 1) AS economy_factor,
+		COALESCE(SUM(CASE WHEN target = 'research' AND kind = 'percent' THEN value END), 0) AS research_bonus,
+		COALESCE(MAX(CASE WHEN target = 'research' AND kind = 'multiplier' THEN value END), 1) AS research_factor
+	FROM income_modifiers
+	WHERE source_kind = 'global' AND source IS NULL
+"""
 
-	
-	# tech_market Table. where techs for unlocking exist.
-	# Similar to item market, but no supply attributes. Retains required roles for "tech tree" style gameplay.
-	# ==> tech cost is like "research pts"
-		await db.execute("""
-			CREATE TABLE IF NOT EXISTS tech_market(
-				name TEXT PRIMARY KEY NOT NULL,
-				description TEXT,
-				tech_income INTEGER,
-				cost INTEGER,
-				req_tech TEXT
-			)
-		""")
-
-	# schedule Table. Where scheduler data lives. Follows YYYY-MM-DD UTC format
-		await db.execute("""
-			CREATE TABLE IF NOT EXISTS schedule(
-				run_date TEXT PRIMARY KEY,
-				status TEXT NOT NULL CHECK(status IN ('started','complete','failed')),
-				started_at TEXT NOT NULL, -- datetime('now')
-				finished_at TEXT, -- set when completed OR failed
-				error_msg TEXT -- Optional failure note				
-			)
-		""")
+# [_multiplier]
+# ==> A player's effective multiplier for one target: m, their user_multipliers row (LEFT JOINed, so NULL if they have none),
+#	combined with g, the global row.
+def _multiplier(target:str) -> str:
+	return (
+		f"MAX(0.0, 1 + (COALESCE(m.{target}_bonus, 0) + g.{target}_bonus) / 100.0)"
+		f" * MAX(COALESCE(m.{target}_factor, 1), g.{target}_factor)"
+	)
+
+# [PAYOUT_SQL]
+# ==> Credits every user with the sum of their economy incomes (balance) and tech incomes (research), times their multipliers.
+# ==> Each correlated SUM is a SEARCH on the (user_id, <income>, name) covering indexes, so we never build a temp B-tree
+#	or an automatic index, and never touch the rows of user_economy or user_tech themselves.
+# ==> Multipliers are one LEFT JOIN on user_multipliers' PK, plus the one-row g. Modifiers never add a per-user pass of their own.
+#	SQLite won't let a FROM join reference the UPDATE's own table, so p works out each player's pay and we match it on PK.
+# ==> The WHERE EXISTS pair is a safeguard, so we're only writing users who actually own something that pays.
+# ==> Since we have a scalar subquery, a user with only one kind of income gets NULL for the other. We coalesce to avoid NULLs.
+# ==> Run PRUNE_MODIFIERS_SQL first, in the same transaction, and rebuild user_multipliers if it removed anything.
+PAYOUT_SQL = f"""
+	UPDATE users AS u
+	SET balance = u.balance + p.economy_pay, research = u.research + p.research_pay
+	FROM (
+		SELECT x.user_id,
+			CAST(ROUND(COALESCE((SELECT SUM(e.economy_income) FROM user_economy AS e WHERE e.user_id = x.user_id), 0)
+				* {_multiplier('economy')}) AS INTEGER) AS economy_pay,
+			CAST(ROUND(COALESCE((SELECT SUM(t.tech_income) FROM user_tech AS t WHERE t.user_id = x.user_id), 0)
+				* {_multiplier('research')}) AS INTEGER) AS research_pay
+		FROM users AS x
+		LEFT JOIN user_multipliers AS m ON m.user_id = x.user_id
+		CROSS JOIN ({GLOBAL_MODIFIERS_SQL}) AS g
+		WHERE EXISTS (SELECT 1 FROM user_economy AS e WHERE e.user_id = x.user_id)
+			OR EXISTS (SELECT 1 FROM user_tech AS t WHERE t.user_id = x.user_id)
+	) AS p
+	WHERE p.user_id = u.user_id
+"""
+
+# [REFRESH_MULTIPLIERS_SQL]
+# ==> Rebuilds user_multipliers: clear it, then fold in every (owner, modifier) pair. Two set-based statements.
+# ==> Only needed when modifiers change. Ownership changes keep each player's row up to date themselves (migration v14).
+# ==> We start from the modifiers and find their owners through idx_tech_name / idx_inv_name, so the cost follows how many
+#	players hold a modifier source, not how many players there are. The upsert does the summing and the MAX,
+#	so there's no GROUP BY to sort.
+CLEAR_MULTIPLIERS_SQL = "DELETE FROM user_multipliers"
+REFRESH_MULTIPLIERS_SQL = """
+	INSERT INTO user_multipliers(user_id, economy_bonus, economy_factor, research_bonus, research_factor)
+	SELECT user_id,
+		CASE WHEN target = 'economy' AND kind = 'percent' THEN value ELSE 0 END,
+		CASE WHEN target = 'economy' AND kind = 'multiplier' THEN value ELSE 1 END,
+		CASE WHEN target = 'research' AND kind = 'percent' THEN value ELSE 0 END,
+		CASE WHEN target = 'research' AND kind = 'multiplier' THEN value ELSE 1 END
+	FROM (
+		SELECT t.user_id, m.target, m.kind, m.value FROM income_modifiers AS m
+		JOIN user_tech AS t ON t.name = m.source
+		WHERE m.source_kind = 'tech'
+		UNION ALL
+		SELECT i.user_id, m.target, m.kind, m.value FROM income_modifiers AS m
+		JOIN user_inventories AS i ON i.name = m.source AND i.quantity > 0
+		WHERE m.source_kind = 'item'
+	)
+	WHERE true -- ==> Tells SQLite the ON CONFLICT below belongs to the INSERT, not to a join.
+	ON CONFLICT(user_id) DO UPDATE SET
+		economy_bonus = economy_bonus + excluded.economy_bonus,
+		economy_factor = MAX(economy_factor, excluded.economy_factor),
+		research_bonus = research_bonus + excluded.research_bonus,
+		research_factor = MAX(research_factor, excluded.research_factor)
+"""
+
+# [forecast_inputs_sql]
+# ==> What each user has and what the payout would pay them, for the forecaster (see utility_libs/forecast.py).
+# ==> Read-only. Hypothetical incomes are applied per owned object, exactly like a market edit would, via a CASE on name.
+# ==> Multipliers are the ones user_multipliers holds now, with every global modifier that hasn't been pruned yet.
+# ==> Params, in order: (name, income) pairs for economy overrides, the economy scale, then the same for tech.
+def forecast_inputs_sql(economy_overrides:int, tech_overrides:int) -> str:
+	def income(alias:str, col:str, overrides:int) -> str:
+		expr = f"{alias}.{col}"
+		if overrides:
+			expr = f"CASE {alias}.name {' '.join(['WHEN ? THEN ?'] * overrides)} ELSE {expr} END"
+		return f"CAST(ROUND(COALESCE({expr}, 0) * ?) AS INTEGER)"
+	return f"""
+		SELECT COALESCE(u.balance, 0), COALESCE(u.research, 0),
+			CAST(ROUND(COALESCE((SELECT SUM({income('e', 'economy_income', economy_overrides)}) FROM user_economy AS e WHERE e.user_id = u.user_id), 0)
+				* {_multiplier('economy')}) AS INTEGER),
+			CAST(ROUND(COALESCE((SELECT SUM({income('t', 'tech_income', tech_overrides)}) FROM user_tech AS t WHERE t.user_id = u.user_id), 0)
+				* {_multiplier('research')}) AS INTEGER)
+		FROM users AS u
+		LEFT JOIN user_multipliers AS m ON m.user_id = u.user_id
+		CROSS JOIN ({GLOBAL_MODIFIERS_SQL}) AS g
+	"""
+
+""" [ANALYTICS] """
+# [ECONOMY_TOTALS_SQL]
+# ==> Income & research paid per payout, and every held item valued at its current item_market cost.
+ECONOMY_TOTALS_SQL = """
+	SELECT
+		(SELECT COALESCE(SUM(economy_income), 0) FROM user_economy),
+		(SELECT COALESCE(SUM(tech_income), 0) FROM user_tech),
+		(SELECT COALESCE(SUM(i.quantity * m.cost), 0) FROM user_inventories AS i JOIN item_market AS m ON m.name = i.name),
+		(SELECT COALESCE(SUM(quantity), 0) FROM user_inventories)
+"""
+
+""" [ORDER BOOK] """
+# ==> Hands back the coins held by every open buy order for one item (?1). Each buyer's row is updated once. See order_book.py.
+REFUND_BUY_ORDERS_SQL = """
+	UPDATE users
+	SET balance = balance + (
+		SELECT SUM(o.price * o.remaining) FROM open_orders AS o
+		WHERE o.item = ?1 AND o.side = 'buy' AND o.user_id = users.user_id
+	)
+	WHERE user_id IN (SELECT user_id FROM open_orders WHERE item = ?1 AND side = 'buy')
+"""
+
+""" [AUCTIONS] """
+# ==> Hands back the top bids held by one item's (?1) open auctions. See auctions.py.
+REFUND_AUCTION_BIDS_SQL = """
+	UPDATE users
+	SET balance = balance + (
+		SELECT SUM(a.top_bid) FROM auctions AS a
+		WHERE a.item = ?1 AND a.status = 'open' AND a.top_bidder_id = users.user_id
+	)
+	WHERE user_id IN (SELECT top_bidder_id FROM auctions WHERE item = ?1 AND status = 'open')
+"""
+
+""" [RECIPES] """
+# ==> Deletes every recipe that takes one item (?1) as an input. Their recipe_inputs rows cascade. See recipes.py.
+DROP_RECIPES_USING_SQL = "DELETE FROM recipes WHERE name IN (SELECT recipe FROM recipe_inputs WHERE input = ?1)"
+
+""" [EXPIRY] """
+# ==> Consumables are used up one unit at a time (see migration v11). A due stack's current unit ran out at expires_at,
+#	and every lifetime_minutes after that used up one more, so after downtime one pass catches a stack up in full.
+# ==> All take the sweep's time as ?1 and walk idx_inv_expiry from its start, so they never look at permanent stacks.
+_LIFETIME = "(SELECT m.lifetime_minutes FROM item_market AS m WHERE m.name = user_inventories.name)"
+_UNITS_SPENT = f"(1 + CAST((julianday(?1) - julianday(expires_at)) * 1440 / {_LIFETIME} AS INTEGER))"
+
+# ==> Deletes up to ?2 stacks that have run out. An item that has since lost its lifetime goes all at once.
+EXPIRE_STACKS_SQL = f"""
+	DELETE FROM user_inventories
+	WHERE rowid IN (
+		SELECT rowid FROM user_inventories
+		WHERE expires_at <= ?1 AND quantity <= COALESCE({_UNITS_SPENT}, quantity)
+		LIMIT ?2
+	)
+	RETURNING user_id, name, quantity
+"""
+
+# ==> Up to ?2 stacks that lose some units but not all, and how many.
+DUE_DECAYS_SQL = f"""
+	SELECT rowid, user_id, name, {_UNITS_SPENT} FROM user_inventories
+	WHERE expires_at <= ?1 AND quantity > {_UNITS_SPENT}
+	LIMIT ?2
+"""
+
+# [decay_stacks_sql]
+# ==> Takes the spent units off `stacks` stacks (rowids from DUE_DECAYS_SQL, as ?2 onwards) and restarts their clocks.
+def decay_stacks_sql(stacks:int) -> str:
+	return f"""
+		UPDATE user_inventories
+		SET quantity = quantity - {_UNITS_SPENT},
+			expires_at = datetime(expires_at, '+' || ({_UNITS_SPENT} * {_LIFETIME}) || ' minutes')
+		WHERE rowid IN ({', '.join(['?'] * stacks)})
+	"""
+
+# ==> Not part of the sweep. Starts the clock on held stacks of one item (?1) that don't have one yet, once it has a
+#	lifetime of ?2 minutes. Stacks that already have a clock keep it. See edit_item.
+START_EXPIRY_SQL = """
+	UPDATE user_inventories SET expires_at = datetime('now', '+' || ?2 || ' minutes')
+	WHERE name = ?1 AND expires_at IS NULL AND quantity > 0
+"""
+
+""" [SCHEDULE] """
+# ==> The scheduler's bookkeeping for each payout date (see utility_libs/scheduler.py).
+CLAIM_RUN_SQL = "INSERT OR IGNORE INTO schedule(run_date, status, started_at) VALUES (?, 'started', datetime('now'))"
+RUN_STATUS_SQL = "SELECT status FROM schedule WHERE run_date = ?"
+COMPLETE_RUN_SQL = "UPDATE schedule SET status='complete', finished_at=datetime('now') WHERE run_date=?"
+FAIL_RUN_SQL = "UPDATE schedule SET status='failed', finished_at=datetime('now'), error_msg=? WHERE run_date = ?"
+LAST_COMPLETE_RUN_SQL = "SELECT MAX(run_date) FROM schedule WHERE status='complete'"
+
+""" [LOOKUPS] """
+# ==> Table and column names can't be ? params. Callers check them against WHITELISTED_TABLES / check_column first.
+def table_asc_sql(table:str, col:str) -> str:
+	return f"SELECT {SELECT_COLUMNS[table]} FROM {table} ORDER BY {col} ASC"
 
-		await db.commit()
-		LogUtil.print_log("DB Tables Created")
+def user_table_asc_sql(table:str, col:str) -> str:
+	return f"SELECT {SELECT_COLUMNS[table]} FROM {table} WHERE user_id = ? ORDER BY {col} ASC"
 
-async def create_indices() -> None:
-	async with aiosqlite.connect(DB_PATH) as db:
-		await db.execute("PRAGMA foreign_keys=ON;")
+def table_row_sql(table:str, pk_col:str) -> str:
+	return f"SELECT {SELECT_COLUMNS[table]} FROM {table} WHERE {pk_col} = ?"
 
-		# Item possession i.e. "who owns this item?"
-		# ==> REMOVED. PK IN ITEM INVENTORY IS ALREADY (user_id, name)
+def name_exists_sql(table:str) -> str:
+	return f"SELECT 1 FROM {table} WHERE name = ?"
 
-		# Foreign Key indexes for frequent per-user fetching
-		await db.execute("CREATE INDEX IF NOT EXISTS idx_econ_user ON user_economy(user_id);") # user in econ
-		await db.execute("CREATE INDEX IF NOT EXISTS idx_inv_user ON user_inventories(user_id);") # user in inventory
-		await db.execute("CREATE INDEX IF NOT EXISTS idx_tech_user ON user_tech(user_id);") # user in tech
+USER_EXISTS_SQL = "SELECT 1 FROM users WHERE user_id = ?"
+INVENTORY_ROW_SQL = f"SELECT {SELECT_COLUMNS['user_inventories']} FROM user_inventories WHERE user_id = ? AND name = ?"
 
-		await db.commit()
+# ==> get_profile reads these three together. refresh_profiles re-reads stats for a chunk of ids at a time.
+PROFILE_STATS_SQL = "SELECT balance, research FROM users WHERE user_id = ?"
+PROFILE_TECH_SQL = "SELECT name, tech_income FROM user_tech WHERE user_id = ?"
+PROFILE_ECONOMIES_SQL = "SELECT name, economy_income FROM user_economy WHERE user_id = ?"
 
+def profile_refresh_sql(users:int) -> str:
+	return f"SELECT user_id, balance, research FROM users WHERE user_id IN ({', '.join('?' * users)})"
+
+USER_STATS_STREAM_SQL = "SELECT COALESCE(balance, 0), COALESCE(research, 0) FROM users"
+ECONOMY_HISTORY_SQL = """
+	SELECT snapshot_id, recorded_at, players, money_supply, research_supply FROM economy_snapshots
+	WHERE recorded_at >= ? ORDER BY recorded_at ASC
+"""
+INCOME_DISTRIBUTION_SQL = """
+	SELECT COALESCE((SELECT SUM(e.economy_income) FROM user_economy AS e WHERE e.user_id = u.user_id), 0)
+	FROM users AS u
+"""
+PLAYER_OPEN_ORDERS_SQL = f"SELECT {SELECT_COLUMNS['open_orders']} FROM open_orders WHERE user_id = ? ORDER BY order_id ASC"
+RECENT_FILLS_SQL = f"SELECT {SELECT_COLUMNS['market_fills']} FROM market_fills WHERE item = ? ORDER BY fill_id DESC LIMIT ?"
+OPEN_AUCTIONS_SQL = f"SELECT {SELECT_COLUMNS['auctions']} FROM auctions WHERE status = 'open' ORDER BY closes_at ASC LIMIT ?"
+LIVE_MODIFIERS_SQL = f"""
+	SELECT {SELECT_COLUMNS['income_modifiers']} FROM income_modifiers
+	WHERE ends_at IS NULL OR ends_at > datetime('now')
+	ORDER BY source_kind, source
+"""
+PENDING_ANNOUNCEMENTS_SQL = f"SELECT {SELECT_COLUMNS['announcement_outbox']} FROM announcement_outbox WHERE channel_id = ? ORDER BY message_id ASC LIMIT ?"
+
+""" [EDITS] """
+# ==> Same rule as [LOOKUPS]: table and column names are checked by the caller.
+# [edit_catalog_sql]
+# ==> Params: one value per column, then the name.
+def edit_catalog_sql(table:str, columns:typing.Iterable[str]) -> str:
+	return f"UPDATE {table} SET {', '.join(f'{col} = ?' for col in columns)} WHERE name = ?"
+
+# [propagate_income_sql]
+# ==> Brings owned copies of one catalog entry up to a new income. Params: (income, name, income).
+#	IS NOT, so NULL incomes compare properly too. The chunked form takes a LIMIT as a fourth param.
+def propagate_income_sql(owned:str, income_col:str) -> str:
+	return f"UPDATE {owned} SET {income_col} = ? WHERE name = ? AND {income_col} IS NOT ?"
+
+def propagate_income_chunk_sql(owned:str, income_col:str) -> str:
+	return f"UPDATE {owned} SET {income_col} = ? WHERE rowid IN (SELECT rowid FROM {owned} WHERE name = ? AND {income_col} IS NOT ? LIMIT ?)"
+
+ADD_TO_STACK_SQL = "UPDATE user_inventories SET quantity = quantity + ? WHERE user_id = ? AND name = ?"
+REMOVE_USER_SQL = "DELETE FROM users WHERE user_id = ?"
+
+def remove_user_object_sql(table:str, pk_col:str) -> str:
+	return f"DELETE FROM {table} WHERE {pk_col} = ? AND user_id = ?"
+
+def remove_object_sql(table:str, pk_col:str) -> str:
+	return f"DELETE FROM {table} WHERE {pk_col} = ?"
+
+""" [MODIFIERS] """
+ADD_MODIFIER_SQL = "INSERT INTO income_modifiers(source_kind, source, target, kind, value, ends_at) VALUES (?, ?, ?, ?, ?, ?)"
+# ==> Params: (time,). Drops every modifier that ended by then, in the datetime('now') format.
+PRUNE_MODIFIERS_SQL = "DELETE FROM income_modifiers WHERE ends_at <= ?"
+REMOVE_MODIFIER_SQL = "DELETE FROM income_modifiers WHERE modifier_id = ?"
+REMOVE_SOURCE_MODIFIERS_SQL = "DELETE FROM income_modifiers WHERE source_kind = ? AND source = ?"
+
+""" [WRITE-BEHIND & ANNOUNCEMENTS] """
+REFRESH_USERNAME_SQL = "UPDATE users SET username = ? WHERE user_id = ?"
+LAST_SEEN_SQL = "UPDATE users SET last_seen = ? WHERE user_id = ?"
+QUEUE_ANNOUNCEMENT_SQL = "INSERT INTO announcement_outbox(channel_id, created_at, content) VALUES (?, ?, ?)"
+DELETE_ANNOUNCEMENT_SQL = "DELETE FROM announcement_outbox WHERE message_id = ?"
+
+""" [INITIALIZATION FUNCTIONS] """
+# [database connect & close ] --> a wrapper used to connect to/close our database. Saves need to import aiosqlite
+# ==> The backend (file or in-memory) comes from STORAGE_BACKEND unless one is passed in. See backends.py.
+async def connect_database(backend:StorageBackend|None = None):
+	backend = backend or make_backend(db_path=DB_PATH)
+	db = await backend.open()
+	await db.execute("PRAGMA foreign_keys = ON;")
+	# ==> Fixed for the connection's lifetime: rows come back as plain tuples, and the get family wraps them in rows.py types.
+	db.row_factory = None
+	register_backend(db, backend)
+	backend.start(db)
+	return db
+
+async def close(db:aiosqlite.Connection):
+	backend = backend_for(db)
+	if backend is None:
+		await db.close()
+	else:
+		await backend.close(db)
 
 """ [UTILITY FUNCTIONS] """
+# ==> Each helper below builds one synchronous work(conn) and ships it to aiosqlite's thread in a single hop
+#	via run_unit (writes, one transaction) or run_read (reads). See unit_of_work.py.
 
 """ ~~ [add_<object> FAMILY] ~~
 	This is where our add_<object>-type functions are written.
@@ -170,101 +379,353 @@ async def create_indices() -> None:
 # [add_economy]
 # ==> Adds an item to the item market.
 async def add_economy(db:aiosqlite.Connection, name:str, economy_income:str) -> bool:
-	c = await db.execute(
-		"INSERT OR IGNORE INTO economy_market(name, economy_income) VALUES (?, ?)",
-		(name,economy_income),
-	)
-	await db.commit()
-	    # rowcount = 1 means we successfully inserted; 0 means the user already existed
-	return c.rowcount == 1
+	def work(conn:sqlite3.Connection) -> bool:
+		c = conn.execute(
+			"INSERT OR IGNORE INTO economy_market(name, economy_income) VALUES (?, ?)",
+			(name,economy_income),
+		)
+		# rowcount = 1 means we successfully inserted; 0 means the economy already existed
+		return c.rowcount == 1
+	return await run_unit(db, work)
 
 # [add_item]
 # ==> Adds an item to the item market.
-async def add_item(db:aiosqlite.Connection, name:str, desc:str, cost:int, req_tech:str) -> bool:
-	c = await db.execute(
-		"INSERT OR IGNORE INTO item_market(name, description, cost, req_tech) VALUES (?, ?, ?, ?)",
-		(name,desc,cost,req_tech),
-	)
-	await db.commit()
-	    # rowcount = 1 means we successfully inserted; 0 means the user already existed
-	return c.rowcount == 1
+async def add_item(db:aiosqlite.Connection, name:str, desc:str, cost:int, req_tech:str, lifetime_minutes:int|None = None) -> bool:
+	def work(conn:sqlite3.Connection) -> bool:
+		c = conn.execute(
+			"INSERT OR IGNORE INTO item_market(name, description, cost, req_tech, lifetime_minutes) VALUES (?, ?, ?, ?, ?)",
+			(name,desc,cost,req_tech,lifetime_minutes),
+		)
+		# rowcount = 1 means we successfully inserted; 0 means the item already existed
+		return c.rowcount == 1
+	return await run_unit(db, work)
 
 # [add_tech]
 # ==> Adds a tech to the technology market.
 async def add_tech(db:aiosqlite.Connection, name:str, desc:str, tech_income:int, cost:int, req_tech:str) -> bool:
-	c = await db.execute(
-		"INSERT OR IGNORE INTO tech_market(name, description, tech_income, cost, req_tech) VALUES (?, ?, ?, ?, ?)",
-		(name, desc, tech_income, cost, req_tech),
+	def work(conn:sqlite3.Connection) -> bool:
+		c = conn.execute(
+			"INSERT OR IGNORE INTO tech_market(name, description, tech_income, cost, req_tech) VALUES (?, ?, ?, ?, ?)",
+			(name, desc, tech_income, cost, req_tech),
+		)
+		# rowcount = 1 means we successfully inserted; 0 means the tech already existed
+		return c.rowcount == 1
+	return await run_unit(db, work)
+
+""" ~~ [edit_<object> FAMILY] ~~
+	Edits a market entry. Owned copies of an income (user_economy, user_tech) are updated to match, using the
+	idx_*_name indexes, in the same transaction as the catalog edit. Items aren't copied, so nothing to propagate.
+	Pass chunk_size for huge guilds: owners are then updated chunk_size rows per transaction, so other commands
+	can run in between. Until the last chunk lands, some owners still have the old income. Re-running finishes the job.
+"""
+# [_edit_catalog]
+# ==> Runs inside a unit of work. Returns False if there's no such entry. None values are left unchanged.
+def _edit_catalog(conn:sqlite3.Connection, table:str, name:str, changes:dict[str, typing.Any]) -> bool:
+	changes = {check_column(table, col): val for col, val in changes.items() if val is not None}
+	if not changes:
+		return conn.execute(name_exists_sql(table), (name,)).fetchone() is not None
+	return conn.execute(edit_catalog_sql(table, changes), (*changes.values(), name)).rowcount > 0
+
+# [_propagate_income]
+# ==> Brings every owned copy of `name` up to `income`. Returns how many rows changed.
+async def _propagate_income(
+		db:aiosqlite.Connection,
+		catalog:str,
+		owned:str,
+		income_col:str,
+		name:str,
+		income:int|None,
+		catalog_changes:dict[str, typing.Any],
+		chunk_size:int|None
+	) -> int|None:
+	def work(conn:sqlite3.Connection) -> int|None:
+		if not _edit_catalog(conn, catalog, name, catalog_changes):
+			return None
+		if income is None:
+			return 0
+		if chunk_size is None:
+			return conn.execute(propagate_income_sql(owned, income_col), (income, name, income)).rowcount
+		return _propagate_chunk(conn)
+
+	def _propagate_chunk(conn:sqlite3.Connection) -> int:
+		return conn.execute(propagate_income_chunk_sql(owned, income_col), (income, name, income, chunk_size)).rowcount
+
+	changed = await run_unit(db, work)
+	if changed is None or income is None:
+		return changed
+	if chunk_size is not None:
+		last = changed
+		while last == chunk_size: # ==> A short chunk means nothing stale is left.
+			last = await run_unit(db, _propagate_chunk)
+			changed += last
+	return changed
+
+# [edit_economy]
+# ==> Returns how many owners' copies changed, or None if the economy doesn't exist.
+async def edit_economy(db:aiosqlite.Connection, name:str, economy_income:int, *, chunk_size:int|None = None) -> int|None:
+	LogUtil.print_log(f"Editing economy {name}: economy_income = {economy_income}")
+	changed = await _propagate_income(
+		db, "economy_market", "user_economy", "economy_income", name, economy_income,
+		{"economy_income": economy_income}, chunk_size
 	)
-	await db.commit()
-	    # rowcount = 1 means we successfully inserted; 0 means the user already existed
-	return c.rowcount == 1
+	if changed is not None:
+		profiles_for(db).reprice_economy(name, economy_income)
+	return changed
+
+# [edit_tech]
+# ==> Only the fields we're given change. Returns how many owners' copies changed, or None if the tech doesn't exist.
+async def edit_tech(
+		db:aiosqlite.Connection,
+		name:str,
+		*,
+		desc:str|None = None,
+		tech_income:int|None = None,
+		cost:int|None = None,
+		req_tech:str|None = None,
+		chunk_size:int|None = None
+	) -> int|None:
+	LogUtil.print_log(f"Editing tech {name}")
+	changed = await _propagate_income(
+		db, "tech_market", "user_tech", "tech_income", name, tech_income,
+		{"description": desc, "tech_income": tech_income, "cost": cost, "req_tech": req_tech}, chunk_size
+	)
+	if changed is not None and tech_income is not None:
+		profiles_for(db).reprice_tech(name, tech_income)
+	return changed
+
+# [edit_item]
+# ==> Only the fields we're given change. Returns False if the item doesn't exist.
+# ==> A new lifetime applies from each stack's next unit; units already running keep their clock.
+#	Stacks held before the item had any lifetime start their clock now, in the same transaction.
+async def edit_item(
+		db:aiosqlite.Connection,
+		name:str,
+		*,
+		desc:str|None = None,
+		cost:int|None = None,
+		req_tech:str|None = None,
+		lifetime_minutes:int|None = None
+	) -> bool:
+	LogUtil.print_log(f"Editing item {name}")
+	def work(conn:sqlite3.Connection) -> bool:
+		if not _edit_catalog(
+			conn, "item_market", name,
+			{"description": desc, "cost": cost, "req_tech": req_tech, "lifetime_minutes": lifetime_minutes}
+		):
+			return False
+		if lifetime_minutes is not None:
+			conn.execute(START_EXPIRY_SQL, (name, lifetime_minutes))
+		return True
+	return await run_unit(db, work)
 
 """ ~~ [get FAMILY] ~~
 	This is our family of functions that return information. Commonly tables...
+	Identical concurrent calls share one read (see single_flight.py), so treat what they return as read-only.
 """
 # [get_table_asc]
-# ==> Returns a whitelisted table. Receives a name and the column to ascend.
-async def get_table_asc(db:aiosqlite.Connection, table:str, col:str):
+# ==> Returns a whitelisted table as typed rows (see rows.py). Receives a name and the column to ascend.
+async def get_table_asc(db:aiosqlite.Connection, table:str, col:str) -> list[Row]:
 	if table not in WHITELISTED_TABLES:
 		raise ValueError("Disallowed table...")
-	
-	db.row_factory = aiosqlite.Row # "row_factory" lets our rows behave like dicts. Using .Row to avoid manual indexing like row[0]
-	async with db.execute(f"SELECT * FROM {table} ORDER BY {col} ASC") as c:
-		rows = await c.fetchall()
-		return [dict(row) for row in rows] # list[dict]
+	make = row_type(table)._make
+	check_column(table, col)
+
+	def work(conn:sqlite3.Connection) -> list[Row]:
+		c = conn.execute(table_asc_sql(table, col))
+		return [make(row) for row in c.fetchall()]
+	return await coalesce(db, ("get_table_asc", table, col), lambda: run_read(db, work))
 	
 # [get_user_table_asc]
 # ==> Returns an ascending table with only one user's objects.
-async def get_user_table_asc(db:aiosqlite.Connection, table:str, user_id:int, col:str):
+async def get_user_table_asc(db:aiosqlite.Connection, table:str, user_id:int, col:str) -> list[Row]:
 	LogUtil.print_debug("get_user_table_asc called")
 	if table not in WHITELISTED_TABLES:
 		raise ValueError("Disallowed table...")
-	
-	db.row_factory = aiosqlite.Row # "row_factory" lets our rows behave like dicts. Using .Row to avoid manual indexing like row[0]
-	async with db.execute(f"SELECT * FROM {table} WHERE user_id = ? ORDER BY {col} ASC", (user_id,)) as c:
-		rows = await c.fetchall()
-		return [dict(row) for row in rows] # list of dictionaries, i.e. list[dict]
+	make = row_type(table)._make
+	check_column(table, col)
+
+	def work(conn:sqlite3.Connection) -> list[Row]:
+		c = conn.execute(user_table_asc_sql(table, col), (user_id,))
+		return [make(row) for row in c.fetchall()]
+	return await coalesce(db, ("get_user_table_asc", table, user_id, col), lambda: run_read(db, work))
+
+# [stream_table_asc]
+# ==> Like get_table_asc, but yields the table in lists of up to chunk_size rows instead of loading it all at once.
+# ==> Memory stays flat no matter how large the table is. Use for exports, audits, analytics and pagers.
+# ==> The cursor stays open on our shared connection between chunks, so don't sit on the generator for long.
+async def stream_table_asc(db:aiosqlite.Connection, table:str, col:str, *, chunk_size:int = STREAM_CHUNK_SIZE) -> typing.AsyncIterator[list[Row]]:
+	if table not in WHITELISTED_TABLES:
+		raise ValueError("Disallowed table...")
+	make = row_type(table)._make
+	check_column(table, col)
+
+	async with db.execute(table_asc_sql(table, col)) as c:
+		while rows := await c.fetchmany(chunk_size):
+			yield [make(row) for row in rows]
+
+# [stream_user_table_asc]
+# ==> Like get_user_table_asc, but yields one user's objects in lists of up to chunk_size rows.
+async def stream_user_table_asc(db:aiosqlite.Connection, table:str, user_id:int, col:str, *, chunk_size:int = STREAM_CHUNK_SIZE) -> typing.AsyncIterator[list[Row]]:
+	if table not in WHITELISTED_TABLES:
+		raise ValueError("Disallowed table...")
+	make = row_type(table)._make
+	check_column(table, col)
+
+	async with db.execute(user_table_asc_sql(table, col), (user_id,)) as c:
+		while rows := await c.fetchmany(chunk_size):
+			yield [make(row) for row in rows]
+
+# [stream_user_stats]
+# ==> Yields (balance, research) pairs for every user in chunks, as plain tuples. The analytics fast path.
+async def stream_user_stats(db:aiosqlite.Connection, *, chunk_size:int = STREAM_CHUNK_SIZE) -> typing.AsyncIterator[list[tuple[int, int]]]:
+	async with db.execute(USER_STATS_STREAM_SQL) as c:
+		while rows := await c.fetchmany(chunk_size):
+			yield rows
 
 # [get_table_row]
-# ==> Returns a dictionary of the row.. We search by primary key.
-async def get_table_row(db:aiosqlite.Connection, table_name:str, pk_col:str, pk_val:typing.Any) -> dict|None:
+# ==> Returns the typed row (see rows.py). We search by primary key.
+async def get_table_row(db:aiosqlite.Connection, table_name:str, pk_col:str, pk_val:typing.Any) -> Row|None:
 	LogUtil.print_debug("Called get_table_row")
 	if table_name not in WHITELISTED_TABLES:
 		LogUtil.print_debug(f"{table_name} NOT WHITELISTED")
 		raise ValueError("Disallowed table...")
-	
-	db.row_factory = aiosqlite.Row 
-	# "row_factory" lets our rows behave like dicts. Using .Row to avoid manual indexing like row[0]
-	query = f"SELECT * FROM {table_name} WHERE {pk_col} = ?"
-	# ==> The asertisk means "all columns" in the row.
+	make = row_type(table_name)._make
+	check_column(table_name, pk_col)
+
+	query = table_row_sql(table_name, pk_col)
 	# ==> Using ? param to avoid sql injection attacks.
 
-	async with db.execute(query, (pk_val,)) as c: # recall we want a tuple type...
-		LogUtil.print_debug(f"Selecting from {table_name} where {pk_col} = {pk_val!r}")
+	def work(conn:sqlite3.Connection) -> Row|None:
 		# So in this case, we want pk_col to match the value (e.g. 'superpower', 'small economy')
-		row = await c.fetchone()
+		row = conn.execute(query, (pk_val,)).fetchone() # recall we want a tuple type...
+		return make(row) if row else None
 
-	if row:
-		row_dict = dict(row)
-		LogUtil.print_debug(f"Fetched row -> dict {row_dict}")
-		return row_dict
-	return None
+	LogUtil.print_debug(f"Selecting from {table_name} where {pk_col} = {pk_val!r}")
+	typed_row = await coalesce(db, ("get_table_row", table_name, pk_col, pk_val), lambda: run_read(db, work))
+	if typed_row:
+		LogUtil.print_debug(f"Fetched row {typed_row}")
+	return typed_row
 
-async def get_inventory_item(db:aiosqlite.Connection, user_id:int, item_name:str) -> dict|None:
+async def get_inventory_item(db:aiosqlite.Connection, user_id:int, item_name:str) -> InventoryEntry|None:
 	LogUtil.print_debug("Called get_inventory_item")
-	db.row_factory = aiosqlite.Row 
 
-	query = f"SELECT * FROM user_inventories WHERE user_id = ? AND name = ?"
-	args = (user_id, item_name)
-	async with db.execute(query, args) as c:
-		item_row = await c.fetchone()
+	def work(conn:sqlite3.Connection) -> InventoryEntry|None:
+		item_row = conn.execute(INVENTORY_ROW_SQL, (user_id, item_name)).fetchone()
+		return InventoryEntry._make(item_row) if item_row else None
+
+	item = await coalesce(db, ("get_inventory_item", user_id, item_name), lambda: run_read(db, work))
+	if item:
+		LogUtil.print_debug(f"Fetched row {item}")			
+	return item
+
+# [get_profile]
+# ==> Returns a player's balance, research, tech and economies. Served from the profile cache when we can
+#	(see profile_cache.py); otherwise read in one hop and cached. None if the user isn't registered.
+async def get_profile(db:aiosqlite.Connection, user_id:int) -> PlayerProfile|None:
+	cache = profiles_for(db)
+	profile = cache.get(user_id)
+	if profile is not None:
+		return profile
+
+	def work(conn:sqlite3.Connection) -> PlayerProfile|None:
+		row = conn.execute(PROFILE_STATS_SQL, (user_id,)).fetchone()
+		if not row:
+			return None
+		return PlayerProfile(
+			user_id=user_id,
+			balance=row[0],
+			research=row[1],
+			tech=dict(conn.execute(PROFILE_TECH_SQL, (user_id,)).fetchall()),
+			economies=dict(conn.execute(PROFILE_ECONOMIES_SQL, (user_id,)).fetchall())
+		)
+
+	read_epoch = cache.epoch
+	profile = await coalesce(db, ("get_profile", user_id), lambda: run_read(db, work))
+	if profile is not None:
+		cache.put(profile, read_epoch)
+	return profile
+
+# [refresh_profiles]
+# ==> Re-reads balance & research for every cached profile. The scheduler calls this after a payout.
+async def refresh_profiles(db:aiosqlite.Connection, *, chunk_size:int = STREAM_CHUNK_SIZE) -> None:
+	cache = profiles_for(db)
+	user_ids = cache.cached_ids()
+
+	def work(conn:sqlite3.Connection) -> list[tuple[int, int, int]]:
+		rows = []
+		for i in range(0, len(user_ids), chunk_size): # ==> Chunked to stay under SQLite's bound-parameter limit.
+			chunk = user_ids[i:i+chunk_size]
+			rows += conn.execute(profile_refresh_sql(len(chunk)), chunk).fetchall()
+		return rows
+
+	if user_ids:
+		for user_id, balance, research in await run_read(db, work):
+			cache.set_stats(user_id, balance, research)
+
+# [get_history]
+# ==> A player's balance & research over time (see history.py), oldest first, downsampled to at most `points`.
+#	since/until are UTC strings in datetime('now') format; None means unbounded.
+async def get_history(
+		db:aiosqlite.Connection,
+		user_id:int,
+		*,
+		since:str|None = None,
+		until:str|None = None,
+		points:int = HISTORY_MAX_POINTS
+	) -> list[HistoryPoint]:
+	history = await coalesce(db, ("get_history", user_id, since, until), lambda: run_read(db, read_history, user_id, since, until))
+	return downsample(history, points)
+
+# [get_economy_history]
+# ==> Server-wide totals after each payout, oldest first, downsampled to at most `points`.
+async def get_economy_history(db:aiosqlite.Connection, *, since:str|None = None, points:int = HISTORY_MAX_POINTS) -> list[EconomySnapshot]:
+	def work(conn:sqlite3.Connection) -> list[EconomySnapshot]:
+		c = conn.execute(ECONOMY_HISTORY_SQL, (since or "",))
+		return [EconomySnapshot._make(row) for row in c.fetchall()]
+	return downsample(await coalesce(db, ("get_economy_history", since), lambda: run_read(db, work)), points)
 
-	if item_row:
-		item_dict = dict(item_row)
-		LogUtil.print_debug(f"Fetched row -> dict {item_dict}")			
-		return item_dict
-	return None
+# [get_income_distribution]
+# ==> Every registered player's total economy income per payout (0 if they own none), ascending.
+async def get_income_distribution(db:aiosqlite.Connection) -> list[int]:
+	def work(conn:sqlite3.Connection) -> list[int]:
+		c = conn.execute(INCOME_DISTRIBUTION_SQL)
+		return sorted(row[0] for row in c.fetchall())
+	return await coalesce(db, ("get_income_distribution",), lambda: run_read(db, work))
+
+# [get_economy_totals]
+# ==> Server-wide sums in one hop: one pass over each user table, all inside SQLite.
+async def get_economy_totals(db:aiosqlite.Connection) -> EconomyTotals:
+	def work(conn:sqlite3.Connection) -> EconomyTotals:
+		return EconomyTotals._make(conn.execute(ECONOMY_TOTALS_SQL).fetchone())
+	return await coalesce(db, ("get_economy_totals",), lambda: run_read(db, work))
+
+# [get_forecast_inputs]
+# ==> Every user's balance, research and per-payout incomes as int64 arrays, in one hop. Nothing is written.
+# ==> economy_changes / tech_changes map a market object's name to a hypothetical income. Scales multiply every income.
+async def get_forecast_inputs(
+		db:aiosqlite.Connection,
+		*,
+		economy_changes:dict[str, int]|None = None,
+		tech_changes:dict[str, int]|None = None,
+		economy_scale:float = 1.0,
+		tech_scale:float = 1.0,
+		chunk_size:int = STREAM_CHUNK_SIZE
+	) -> ForecastInputs:
+	economy_changes, tech_changes = economy_changes or {}, tech_changes or {}
+	query = forecast_inputs_sql(len(economy_changes), len(tech_changes))
+	params = (
+		*(v for pair in economy_changes.items() for v in pair), economy_scale,
+		*(v for pair in tech_changes.items() for v in pair), tech_scale
+	)
+
+	def work(conn:sqlite3.Connection) -> ForecastInputs:
+		inputs = ForecastInputs(array("q"), array("q"), array("q"), array("q"))
+		c = conn.execute(query, params)
+		while rows := c.fetchmany(chunk_size):
+			for column, values in zip(inputs, zip(*rows)): # ==> Rows -> columns, in C.
+				column.extend(values)
+		return inputs
+	return await run_read(db, work)
 
 """ ~~ [user FAMILY] ~~
 	These functions handle user information in the database.
@@ -279,203 +740,438 @@ async def add_user(db:aiosqlite.Connection, user:discord.User):
 		("INSERT OR IGNORE INTO user_inventories(user_id) VALUES (?)", (user.id,)),
 		("INSERT OR IGNORE INTO user_tech(user_id) VALUES (?)", (user.id,))
 	]	
+	# ==> Existing users keep the name they registered with, so we refresh it in the background.
+	refresh_username(db, user)
 
-	sum_rows = 0
-	for query, param in queries:
-		c = await db.execute(query, param)
-		sum_rows += c.rowcount
-		# ==> row_ct tracks how many rows we've added. c.rowcount would only get our last insert's info.
-
-	if sum_rows > 0:
-		await db.commit()
+	def work(conn:sqlite3.Connection) -> int:
+		sum_rows = 0
+		for query, param in queries:
+			sum_rows += conn.execute(query, param).rowcount
+			# ==> sum_rows tracks how many rows we've added. rowcount would only get our last insert's info.
+		# rowcount > 0 means we successfully inserted at least 1 row; 0 means the user is already in all tables
+		if sum_rows == 0:
+			raise ValueError(f"User {user.id} already exists in all tables!")
 		return sum_rows
-	    # rowcount > 0 means we successfully inserted at least 1 row; 0 means the user is already in all tables
-	else:
-		raise ValueError(f"User {user.id} already exists in all tables!")
+	return await run_unit(db, work)
 
 # [remove_user]
 # ==> To be used in bot.py to remove a user from the DB
 async def remove_user(db:aiosqlite.Connection, user:discord.User):
-	async with aiosqlite.connect(DB_PATH) as db:
-		LogUtil.print_log(f"Received db & user to remove... {db.name}, {user.name} <{user.id}>")
-		
-		c = await db.execute("DELETE FROM users WHERE user_id = ?", (user.id))
-		await db.commit()
-		return c.rowcount > 0 
+	LogUtil.print_log(f"Received user to remove... {user.name} <{user.id}>")
+	def work(conn:sqlite3.Connection) -> bool:
+		return conn.execute(REMOVE_USER_SQL, (user.id,)).rowcount > 0
+	removed = await run_unit(db, work)
+	profiles_for(db).evict(user.id)
+	return removed
 
 # [add_bal]
 # ==> Used to add a number to the user balance (we can add negatives)
 async def add_bal(db:aiosqlite.Connection, user:discord.User, qty:int):
 	LogUtil.print_debug(f"Adding {qty} to {user}'s balance...")
-	try:
-		await db.execute(
-			f"""
-				UPDATE users
-				SET balance = balance + ? WHERE user_id = ?
-			""",
-			(qty, user.id)
-		)
-		await db.commit()
-	except Exception:
-		raise
+	record_point = trades_for(db).tick(user.id) # ==> Every HISTORY_TRADE_EVERY changes also lands in the history.
+	def work(conn:sqlite3.Connection) -> list[tuple[int, int]]:
+		rows = conn.execute(credit_stat_sql("balance"), (qty, user.id)).fetchall()
+		if rows and record_point:
+			record_user_point(conn, user.id, "trade", _utc_now())
+		return rows
+	for balance, research in await run_unit(db, work):
+		profiles_for(db).set_stats(user.id, balance, research) # ==> Exact values, straight from the UPDATE.
 
 # [add_res]
 # ==> Used to add research to the user balance
 async def add_res(db:aiosqlite.Connection, user:discord.Member, qty:int):
 	LogUtil.print_debug(f"Adding {qty} to {user.name}'s research...")
-	try:
-		await db.execute(
-			f"""
-				UPDATE users
-				SET research = research + ? WHERE user_id = ?
-			""",
-			(qty, user.id)
-		)
-		await db.commit()
-	except Exception:
-		raise
+	record_point = trades_for(db).tick(user.id) # ==> Every HISTORY_TRADE_EVERY changes also lands in the history.
+	def work(conn:sqlite3.Connection) -> list[tuple[int, int]]:
+		rows = conn.execute(credit_stat_sql("research"), (qty, user.id)).fetchall()
+		if rows and record_point:
+			record_user_point(conn, user.id, "trade", _utc_now())
+		return rows
+	for balance, research in await run_unit(db, work):
+		profiles_for(db).set_stats(user.id, balance, research) # ==> Exact values, straight from the UPDATE.
 
 # [remove_user_object]
 # ==> Removes an object from a user object table.
 async def remove_user_object(db:aiosqlite.Connection, table_name:str, user:discord.Member, pk_col:str, pk_val:typing.Any) -> bool:
-	query = f"DELETE FROM {table_name} WHERE {pk_col} = ? AND user_id = ?"
-	c = await db.execute(query, (pk_val, user.id))
-	await db.commit()
-	return c.rowcount > 0
+	query = remove_user_object_sql(table_name, pk_col)
+	def work(conn:sqlite3.Connection) -> bool:
+		return conn.execute(query, (pk_val, user.id)).rowcount > 0
+	removed = await run_unit(db, work)
+
+	cache = profiles_for(db)
+	if table_name == "user_tech" and pk_col == "name":
+		cache.remove_tech(user.id, pk_val)
+	elif table_name == "user_economy" and pk_col == "name":
+		cache.remove_economy(user.id, pk_val)
+	elif table_name in ("user_tech", "user_economy"):
+		cache.evict(user.id)
+	return removed
+
+""" ~~ [transfer FAMILY] ~~
+	Player-to-player transfers (/player transact). Each one debits the sender and credits the recipient in one
+	unit of work, with one commit: either both sides happen or neither does.
+	The sender's debit is a conditional UPDATE (... AND balance >= ?), so the funds check and the write are one
+	statement, and two transfers racing for the same coins can't both pass.
+"""
+TRANSFER_COLUMNS = {"balance", "research"}
+
+# [transfer_stat]
+# ==> Moves `amount` balance or research from sender to recipient. Returns the sender's new value.
+async def transfer_stat(db:aiosqlite.Connection, column:str, sender_id:int, recipient_id:int, amount:int) -> int:
+	if column not in TRANSFER_COLUMNS:
+		raise ValueError(f"Can't transfer {column!r}.")
+	if amount <= 0:
+		raise ValueError("Transfers must be positive.")
+	if sender_id == recipient_id:
+		raise ValueError("You can't transfer to yourself.")
+	# ==> Only peek at the counter here. A transfer that fails shouldn't count, so we tick once it has committed.
+	record_points = [user_id for user_id in (sender_id, recipient_id) if trades_for(db).due(user_id)]
+
+	def work(conn:sqlite3.Connection) -> tuple[tuple[int, int], tuple[int, int]]:
+		sender = conn.execute(debit_stat_sql(column), (amount, sender_id, amount)).fetchone()
+		if not sender:
+			if not conn.execute(USER_EXISTS_SQL, (sender_id,)).fetchone():
+				raise ValueError(f"User ID {sender_id} does not exist in users table.")
+			raise ValueError(f"Not enough {column}!")
+		recipient = conn.execute(credit_stat_sql(column), (amount, recipient_id)).fetchone()
+		if not recipient:
+			raise ValueError(f"User ID {recipient_id} does not exist in users table.") # ==> Rolls back the debit.
+		now = _utc_now()
+		for user_id in record_points:
+			record_user_point(conn, user_id, "trade", now)
+		return sender, recipient
+
+	sender, recipient = await run_unit(db, work)
+	for user_id in (sender_id, recipient_id):
+		trades_for(db).tick(user_id)
+	cache = profiles_for(db)
+	cache.set_stats(sender_id, *sender)
+	cache.set_stats(recipient_id, *recipient)
+	return sender[0] if column == "balance" else sender[1]
+
+# [transfer_items]
+# ==> Moves every {item name: quantity} from sender's inventory to recipient's, all or nothing.
+async def transfer_items(db:aiosqlite.Connection, sender_id:int, recipient_id:int, items:dict[str, int]) -> None:
+	if not items:
+		raise ValueError("Nothing to give!")
+	if any(quantity <= 0 for quantity in items.values()):
+		raise ValueError("Item quantities must be positive.")
+	if sender_id == recipient_id:
+		raise ValueError("You can't transfer to yourself.")
+
+	def work(conn:sqlite3.Connection) -> None:
+		if not conn.execute(USER_EXISTS_SQL, (recipient_id,)).fetchone():
+			raise ValueError(f"User ID {recipient_id} does not exist in users table.")
+		credits = []
+		for name, quantity in items.items():
+			# ==> Only lands if the stack is big enough. Earlier debits are rolled back with everything else.
+			row = conn.execute(TAKE_ITEMS_SQL, (quantity, sender_id, name, quantity)).fetchone()
+			if not row:
+				raise ValueError(f"Not enough {name}! Do you have {quantity}?")
+			credits.append((recipient_id, name, quantity, row[0])) # ==> The units keep the sender's clock.
+		conn.executemany(CREDIT_ITEMS_SQL, credits)
+
+	await run_unit(db, work)
+	LogUtil.print_log(f"Transferred {len(items)} item stack(s) from <{sender_id}> to <{recipient_id}>")
+
+
+
+""" ~~ [order book FAMILY] ~~
+	Reads for the player order book. Placing and cancelling orders goes through order_book.exchange_for(db),
+	which keeps the in-memory books in step with open_orders.
+"""
+# [get_open_orders]
+# ==> A player's open orders, oldest first.
+async def get_open_orders(db:aiosqlite.Connection, user_id:int) -> list[OpenOrder]:
+	def work(conn:sqlite3.Connection) -> list[OpenOrder]:
+		c = conn.execute(PLAYER_OPEN_ORDERS_SQL, (user_id,))
+		return [OpenOrder._make(row) for row in c.fetchall()]
+	return await run_read(db, work)
+
+# [get_recent_fills]
+# ==> An item's latest trades, newest first.
+async def get_recent_fills(db:aiosqlite.Connection, item:str, *, limit:int = 10) -> list[MarketFill]:
+	def work(conn:sqlite3.Connection) -> list[MarketFill]:
+		c = conn.execute(RECENT_FILLS_SQL, (item, limit))
+		return [MarketFill._make(row) for row in c.fetchall()]
+	return await run_read(db, work)
+
+""" ~~ [auction FAMILY] ~~
+	Reads for auctions. Listing, bidding and settling go through auctions.auctions_for(db).
+"""
+# [get_open_auctions]
+# ==> Open auctions, closing soonest first.
+async def get_open_auctions(db:aiosqlite.Connection, *, limit:int = 100) -> list[Auction]:
+	def work(conn:sqlite3.Connection) -> list[Auction]:
+		c = conn.execute(OPEN_AUCTIONS_SQL, (limit,))
+		return [Auction._make(row) for row in c.fetchall()]
+	return await run_read(db, work)
+
+""" ~~ [expiry FAMILY] ~~
+	Used up consumables. The scheduler calls sweep_expired every EXPIRY_SWEEP_SECONDS (see utility_libs/scheduler.py).
+"""
+# [sweep_expired]
+# ==> Takes every expired unit out of every inventory. Returns {user_id: {item: units expired}}.
+# ==> Runs batch_size stacks per transaction, so a big sweep never holds up other commands for long.
+# ==> If a batch fails, the batches before it stay committed; raises SweepInterrupted with what they took.
+async def sweep_expired(db:aiosqlite.Connection, *, now:datetime|None = None, batch_size:int = EXPIRY_BATCH_SIZE) -> dict[int, dict[str, int]]:
+	stamp = (now or datetime.now(timezone.utc)).strftime("%Y-%m-%d %H:%M:%S")
+	expired:dict[int, dict[str, int]] = {}
 
+	def work(conn:sqlite3.Connection) -> tuple[list[tuple[int, str, int]], bool]:
+		gone = conn.execute(EXPIRE_STACKS_SQL, (stamp, batch_size)).fetchall()
+		decays = conn.execute(DUE_DECAYS_SQL, (stamp, batch_size)).fetchall()
+		if decays:
+			conn.execute(decay_stacks_sql(len(decays)), (stamp, *(rowid for rowid, *_ in decays)))
+		more = len(gone) == batch_size or len(decays) == batch_size # ==> A full batch means there may be more.
+		return [*gone, *(row[1:] for row in decays)], more
 
+	more = True
+	while more:
+		try:
+			batch, more = await run_unit(db, work)
+		except Exception as e:
+			if not expired:
+				raise
+			raise SweepInterrupted(expired) from e
+		# ==> Only counted once the batch has committed.
+		for user_id, name, units in batch:
+			if units: # ==> Stacks that were already empty just get cleaned up.
+				items = expired.setdefault(user_id, {})
+				items[name] = items.get(name, 0) + units
+	if expired:
+		LogUtil.print_log(f"Expired {sum(map(len, expired.values()))} stack(s) across {len(expired)} player(s)")
+	return expired
+
+""" ~~ [modifier FAMILY] ~~
+	Income modifiers. See [PAYOUT] at the top of this file for how they stack.
+	user_multipliers follows ownership by itself (migration v14), so buying a tech or picking up an item counts from the
+	next payout on. We rebuild it here whenever a modifier is added or removed, and the payout rebuilds it when it prunes.
+"""
+MODIFIER_SOURCES = {"tech": "tech_market", "item": "item_market"}
+
+# [_refresh_multipliers]
+# ==> Runs inside a unit of work. Also drops modifiers that have ended.
+def _refresh_multipliers(conn:sqlite3.Connection) -> None:
+	conn.execute(PRUNE_MODIFIERS_SQL, (_utc_now(),))
+	conn.execute(CLEAR_MULTIPLIERS_SQL)
+	conn.execute(REFRESH_MULTIPLIERS_SQL)
+
+# [add_modifier]
+# ==> Returns the new modifier's id. source is the tech or item's name, and must be None for a global modifier.
+async def add_modifier(
+		db:aiosqlite.Connection,
+		source_kind:str,
+		source:str|None,
+		target:str,
+		kind:str,
+		value:float,
+		*,
+		ends_at:datetime|None = None
+	) -> int:
+	if (source_kind == "global") != (source is None):
+		raise ValueError("Global modifiers have no source; tech and item modifiers need one.")
+	if kind == "multiplier" and value < 1:
+		raise ValueError("Multipliers must be at least 1. Use a negative percent to reduce income.")
+	ends = ends_at.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S") if ends_at else None
+
+	def work(conn:sqlite3.Connection) -> int:
+		if source_kind in MODIFIER_SOURCES:
+			table = MODIFIER_SOURCES[source_kind]
+			if not conn.execute(name_exists_sql(table), (source,)).fetchone():
+				raise ValueError(f"{source} isn't in the {table}.")
+		modifier_id = conn.execute(ADD_MODIFIER_SQL, (source_kind, source, target, kind, value, ends)).lastrowid
+		_refresh_multipliers(conn)
+		return modifier_id
+
+	modifier_id = await run_unit(db, work)
+	LogUtil.print_log(f"Added modifier #{modifier_id}: {source_kind} {source} {target} {kind} {value}")
+	return modifier_id
+
+# [remove_modifier]
+async def remove_modifier(db:aiosqlite.Connection, modifier_id:int) -> bool:
+	def work(conn:sqlite3.Connection) -> bool:
+		removed = conn.execute(REMOVE_MODIFIER_SQL, (modifier_id,)).rowcount > 0
+		if removed:
+			_refresh_multipliers(conn)
+		return removed
+	return await run_unit(db, work)
+
+# [get_modifiers]
+# ==> Every modifier that hasn't ended, by source.
+async def get_modifiers(db:aiosqlite.Connection) -> list[IncomeModifier]:
+	def work(conn:sqlite3.Connection) -> list[IncomeModifier]:
+		c = conn.execute(LIVE_MODIFIERS_SQL)
+		return [IncomeModifier._make(row) for row in c.fetchall()]
+	return await run_read(db, work)
+
+""" ~~ [write-behind FAMILY] ~~
+	Low-priority writes. These return immediately; the write-behind queue batches them (see write_behind.py).
+"""
+# [refresh_username]
+def refresh_username(db:aiosqlite.Connection, user:discord.abc.User) -> None:
+	write_behind_for(db).set(
+		("username", user.id),
+		REFRESH_USERNAME_SQL,
+		(user.name, user.id)
+	)
+
+# ==> Timestamps are taken when we queue, not when we flush. Same format as SQLite's datetime('now').
+def _utc_now() -> str:
+	return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+# [record_last_seen]
+def record_last_seen(db:aiosqlite.Connection, user_id:int) -> None:
+	write_behind_for(db).set(
+		("last_seen", user_id),
+		LAST_SEEN_SQL,
+		(_utc_now(), user_id)
+	)
+
+# [count_command]
+def count_command(db:aiosqlite.Connection, name:str) -> None:
+	write_behind_for(db).increment(
+		("command_stats", name),
+		"""
+			INSERT INTO command_stats(name, last_used, uses) VALUES (?, ?, ?)
+			ON CONFLICT(name) DO UPDATE SET uses = uses + excluded.uses, last_used = excluded.last_used
+		""",
+		(name, _utc_now())
+	)
+
+# [record_audit]
+def record_audit(db:aiosqlite.Connection, user_id:int|None, action:str, detail:str|None) -> None:
+	write_behind_for(db).append(
+		"INSERT INTO audit_log(created_at, user_id, action, detail) VALUES (?, ?, ?, ?)",
+		(_utc_now(), user_id, action, detail)
+	)
+
+""" ~~ [announcement FAMILY] ~~
+	The announcement outbox's storage (see utility_libs/outbox.py). Unlike the write-behind family, these are written
+	right away: an announcement we've accepted must survive a restart.
+"""
+# [queue_announcement]
+# ==> Persists one message for a channel. Returns its message_id.
+async def queue_announcement(db:aiosqlite.Connection, channel_id:int, content:str) -> int:
+	def work(conn:sqlite3.Connection) -> int:
+		c = conn.execute(QUEUE_ANNOUNCEMENT_SQL, (channel_id, _utc_now(), content))
+		return c.lastrowid
+	return await run_unit(db, work)
+
+# [queue_announcements]
+# ==> Persists several messages for a channel in one transaction, in order.
+async def queue_announcements(db:aiosqlite.Connection, channel_id:int, contents:typing.Iterable[str]) -> None:
+	now = _utc_now()
+	rows = [(channel_id, now, content) for content in contents]
+	def work(conn:sqlite3.Connection) -> None:
+		conn.executemany(QUEUE_ANNOUNCEMENT_SQL, rows)
+	await run_unit(db, work)
+
+# [pending_announcements]
+# ==> The oldest unsent messages for a channel, in the order they were queued.
+async def pending_announcements(db:aiosqlite.Connection, channel_id:int, *, limit:int = 100) -> list[OutboxMessage]:
+	def work(conn:sqlite3.Connection) -> list[OutboxMessage]:
+		c = conn.execute(PENDING_ANNOUNCEMENTS_SQL, (channel_id, limit))
+		return [OutboxMessage._make(row) for row in c.fetchall()]
+	return await run_read(db, work)
+
+# [delete_announcements]
+# ==> Called once Discord has accepted the messages.
+async def delete_announcements(db:aiosqlite.Connection, message_ids:typing.Iterable[int]) -> None:
+	def work(conn:sqlite3.Connection) -> None:
+		conn.executemany(DELETE_ANNOUNCEMENT_SQL, [(i,) for i in message_ids])
+	await run_unit(db, work)
 
 """ ~~ [OBJ-TO FAMILY] ~~
 	These are used whenever we want to move an object from one table to another table that has matching columns.
 	Some receive a user_id, like item_market -> user_inventories
 	When creating OBJ-TO's: Be careful to match attributes (columns)!
+	Each one runs its checks and its write as one unit of work, so nothing can slip in between them.
 """
 # [item_to_inv]
 # ==> Copies an object from the item market to a user inventory.
 async def item_to_inv(*, db:aiosqlite.Connection, item_name:str, user_id:int, quantity:int):
 	LogUtil.print_log("Called item_to_inv")
-	# ==> Check if User is registered:
-	user_check = await db.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
-	if not await user_check.fetchone():
-		raise ValueError(f"User ID {user_id} does not exist in users table.")
-	# ==> Check if item exists
-	item_market_check = await db.execute("SELECT 1 FROM item_market WHERE name = ?", (item_name,))
-	if not await item_market_check.fetchone():
-		raise ValueError(f"Item '{item_name}' does not exist in item_market.")
-	item_inv_check = await db.execute("SELECT user_id, name FROM user_inventories WHERE user_id = ? AND name = ?", (user_id, item_name))
-	
 	if not quantity:
 		raise ValueError("Missing quantity!")
-	elif not await item_inv_check.fetchone():
-		LogUtil.print_debug("User did not have item before. Inserting...")
-		c = await db.execute(
-			"INSERT OR IGNORE INTO user_inventories(user_id, name, quantity) VALUES (?, ?, ?)",
-			(user_id, item_name, quantity)
-		)
-	else:
-		c = await db.execute("""
-			UPDATE user_inventories
-			SET quantity = quantity + ? WHERE user_id = ? AND name = ?
-		""", (quantity, user_id, item_name))
-	if c.rowcount > 0:
-		LogUtil.print_log(f"Copied {quantity} of {item_name} to user <{user_id}>")
-		await db.commit()
-	else:
-		raise ValueError("Item not copied!")
+
+	def work(conn:sqlite3.Connection) -> None:
+		# ==> Check if User is registered:
+		if not conn.execute(USER_EXISTS_SQL, (user_id,)).fetchone():
+			raise ValueError(f"User ID {user_id} does not exist in users table.")
+		# ==> Check if item exists
+		if not conn.execute(name_exists_sql("item_market"), (item_name,)).fetchone():
+			raise ValueError(f"Item '{item_name}' does not exist in item_market.")
+
+		# ==> Try adding to an existing stack first; if there's none, insert a new one.
+		c = conn.execute(ADD_TO_STACK_SQL, (quantity, user_id, item_name))
+		if c.rowcount == 0:
+			LogUtil.print_debug("User did not have item before. Inserting...")
+			c = conn.execute(
+				"INSERT OR IGNORE INTO user_inventories(user_id, name, quantity) VALUES (?, ?, ?)",
+				(user_id, item_name, quantity)
+			)
+		if c.rowcount == 0:
+			raise ValueError("Item not copied!")
+
+	await run_unit(db, work)
+	LogUtil.print_log(f"Copied {quantity} of {item_name} to user <{user_id}>")
 	
 # [econ_to_inv]
 # ==> Copies an econ from economy_market to a user econ inventory.
 async def econ_to_inv(*, db:aiosqlite.Connection, econ_name:str, user_id:int):
 	LogUtil.print_log("Called econ_to_inv")
-	db.row_factory = aiosqlite.Row # ==> To let our rows behave like dicts
 
-	# ==> Check if User is registered:
-	LogUtil.print_debug("Checking if user registered")
-	user_check = await db.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
-	if not await user_check.fetchone():
-		raise ValueError(f"User ID {user_id} does not exist in users table.")
-	
-	# ==> Check if econ exists by trying to select economy_income
-	LogUtil.print_debug(f"SELECT * FROM economy_market WHERE name = {econ_name}")
-	econ_income = await db.execute("SELECT * FROM economy_market WHERE name = ?", (econ_name,))
-	income_row = await econ_income.fetchone()
-	try:
-		income_dict = dict(income_row)
-		LogUtil.print_debug(f"Fetched {income_dict}")
-	except:
-		pass
-
-	LogUtil.print_debug(f"SELECT * FROM user_economy WHERE user_id = {user_id} AND name = {econ_name}")
-	econ_inv_check = await db.execute("SELECT * FROM user_economy WHERE user_id = ? AND name = ?", (user_id, econ_name))
-	inv_row = await econ_inv_check.fetchone()
-	try:
-		inv_dict = dict(inv_row)
-		LogUtil.print_debug(f"Fetched {inv_dict}")
-	except:
-		pass
-
-	if not income_row:
-		raise ValueError(f"Economy '{econ_name}' does not exist in economy_market.")
-
-	LogUtil.print_log(f"We want to move {income_dict['name']} with magnitude {income_dict['economy_income']} to {user_id}'s economies.")
-	
-	if not inv_row:
-		LogUtil.print_debug("User did not have econ before. Inserting...")
-		await db.execute(
+	def work(conn:sqlite3.Connection) -> Economy:
+		# ==> Check if User is registered:
+		if not conn.execute(USER_EXISTS_SQL, (user_id,)).fetchone():
+			raise ValueError(f"User ID {user_id} does not exist in users table.")
+		# ==> Check if econ exists by trying to select it
+		econ_row = conn.execute(table_row_sql("economy_market", "name"), (econ_name,)).fetchone()
+		if not econ_row:
+			raise ValueError(f"Economy '{econ_name}' does not exist in economy_market.")
+		econ = Economy._make(econ_row)
+
+		# ==> INSERT OR IGNORE doubles as our "does the user already have it?" check.
+		c = conn.execute(
 			"INSERT OR IGNORE INTO user_economy(user_id, name, economy_income) VALUES (?, ?, ?)",
-			(user_id, econ_name, income_dict['economy_income'])
+			(user_id, econ_name, econ.economy_income)
 		)
-		LogUtil.print_log(f"Copied {econ_name} to user <{user_id}>")
-		await db.commit()
-	else:
-		raise ValueError("Economy not copied! The user may already have this economy.")
+		if c.rowcount == 0:
+			raise ValueError("Economy not copied! The user may already have this economy.")
+		return econ
+
+	econ = await run_unit(db, work)
+	profiles_for(db).set_economy(user_id, econ.name, econ.economy_income)
+	LogUtil.print_log(f"Copied {econ.name} with magnitude {econ.economy_income} to user <{user_id}>")
 
 # [tech_to_inv]
 # ==> Copies a tech from tech_market to a user tech inventory.
 async def tech_to_inv(*, db:aiosqlite.Connection, tech_name:str, user_id:int):
 	LogUtil.print_log("Called tech_to_inv")
-	db.row_factory = aiosqlite.Row # ==> To let our rows behave like dicts
 
-	# ==> Check if User is registered:
-	LogUtil.print_debug("Checking if user registered")
-	user_check = await db.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
-	if not await user_check.fetchone():
-		raise ValueError(f"User ID {user_id} does not exist in users table.")
-	
-	# ==> Check if econ exists by trying to select economy_income
-	LogUtil.print_debug(f"SELECT * FROM tech_market WHERE name = {tech_name}")
-	tech_income = await db.execute("SELECT * FROM tech_market WHERE name = ?", (tech_name,))
-	income_row = await tech_income.fetchone()
-	try:
-		income_dict = dict(income_row)
-		LogUtil.print_debug(f"Fetched {income_dict}")
-	except:
-		pass
-
-	LogUtil.print_debug(f"SELECT * FROM user_tech WHERE user_id = {user_id} AND name = {tech_name}")
-	tech_inv_check = await db.execute("SELECT * FROM user_tech WHERE user_id = ? AND name = ?", (user_id, tech_name))
-	inv_row = await tech_inv_check.fetchone()
-	try:
-		inv_dict = dict(inv_row)
-		LogUtil.print_debug(f"Fetched {inv_dict}")
-	except:
-		pass
-
-	if not income_row:
-		raise ValueError(f"Technology '{tech_name}' does not exist in economy_market.")
-
-	LogUtil.print_log(f"We want to move {income_dict['name']} with magnitude {income_dict['tech_income']} to {user_id}'s economies.")
-	
-	if not inv_row:
-		LogUtil.print_debug("User did not have tech before. Inserting...")
-		await db.execute(
+	def work(conn:sqlite3.Connection) -> Tech:
+		# ==> Check if User is registered:
+		if not conn.execute(USER_EXISTS_SQL, (user_id,)).fetchone():
+			raise ValueError(f"User ID {user_id} does not exist in users table.")
+		# ==> Check if tech exists by trying to select it
+		tech_row = conn.execute(table_row_sql("tech_market", "name"), (tech_name,)).fetchone()
+		if not tech_row:
+			raise ValueError(f"Technology '{tech_name}' does not exist in tech_market.")
+		tech = Tech._make(tech_row)
+
+		# ==> INSERT OR IGNORE doubles as our "does the user already have it?" check.
+		c = conn.execute(
 			"INSERT OR IGNORE INTO user_tech(user_id, name, tech_income) VALUES (?, ?, ?)",
-			(user_id, tech_name, income_dict['tech_income'])
+			(user_id, tech_name, tech.tech_income)
 		)
-		LogUtil.print_log(f"Copied {tech_name} to user <{user_id}>")
-		await db.commit()
-	else:
-		raise ValueError("Technology not copied! The user may already have this tech.")
+		if c.rowcount == 0:
+			raise ValueError("Technology not copied! The user may already have this tech.")
+		return tech
+
+	tech = await run_unit(db, work)
+	profiles_for(db).set_tech(user_id, tech.name, tech.tech_income)
+	LogUtil.print_log(f"Copied {tech.name} with magnitude {tech.tech_income} to user <{user_id}>")
 
 """ ~~ [OBJECT FAMILY] ~~
 	This is where our abstract object-level functions are written (meaning they are more versatile)
@@ -485,9 +1181,28 @@ async def tech_to_inv(*, db:aiosqlite.Connection, tech_name:str, user_id:int):
 # ==> Removes an object from a table.
 async def remove_object(db:aiosqlite.Connection, table_name:str, pk_col:str, pk_val:typing.Any) -> bool:
 	LogUtil.print_log(f"In {db}, {table_name}: Removing {pk_val} in {pk_col}...")
-	query = f"DELETE FROM {table_name} WHERE {pk_col} = ?"
-	c = await db.execute(query, (pk_val,)) # Again, using ? to avoid sql injection...
+	query = remove_object_sql(table_name, pk_col)
+	def work(conn:sqlite3.Connection) -> tuple[bool, int]:
+		refunded = 0
+		if table_name == "item_market" and pk_col == "name":
+			# ==> The item's open orders and auctions are about to cascade away. Hand back the coins they held.
+			refunded = conn.execute(REFUND_BUY_ORDERS_SQL, (pk_val,)).rowcount
+			refunded += conn.execute(REFUND_AUCTION_BIDS_SQL, (pk_val,)).rowcount
+			# ==> A recipe that lost an input would quietly get cheaper. Drop the recipes that use the item instead.
+			conn.execute(DROP_RECIPES_USING_SQL, (pk_val,))
+		if table_name in ("tech_market", "item_market") and pk_col == "name":
+			# ==> Modifiers name their source loosely (no foreign key), so they go by hand.
+			source_kind = "tech" if table_name == "tech_market" else "item"
+			if conn.execute(REMOVE_SOURCE_MODIFIERS_SQL, (source_kind, pk_val)).rowcount:
+				_refresh_multipliers(conn)
+		removed = conn.execute(query, (pk_val,)).rowcount > 0 # Again, using ? to avoid sql injection...
 		# ==> NOTE: ? only replaces values, not identifies like table/col names
-	await db.commit()
-	return c.rowcount > 0
-
+		return removed, refunded
+	removed, refunded = await run_unit(db, work)
+	if table_name in PROFILE_TABLES or refunded:
+		profiles_for(db).clear() # ==> Deletes here can cascade into any number of players' profiles.
+	if table_name == "item_market":
+		exchange_for(db).forget(pk_val if pk_col == "name" else None)
+	if table_name in ("item_market", "recipes"):
+		recipes_for(db).invalidate()
+	return removed
@@ -0,0 +1,115 @@
+"""
+INFORMATION
+
+	This is our expiry-clock check. A consumable keeps its clock when it changes hands (see the [ITEMS] block in ledger.py),
+	or passing it back and forth between two accounts would keep it alive forever.
+	It builds a throwaway in-memory database, gives a player consumables with a minute left, sends them on round trips
+	through /player give, the order book and an auction, and fails if any trip hands them back with more time than they had.
+	Run it from src/ after touching the ledger, the inventory triggers, or anything else that moves items:
+		python -m database.expiry_check
+
+"""
+
+""" [IMPORTS] """
+import asyncio, sqlite3, sys, typing
+from datetime import datetime, timedelta, timezone
+from .auctions import auctions_for
+from .backends import MemoryBackend
+from .data_handler import close, connect_database, transfer_items
+from .migrations import migrate
+from .order_book import exchange_for
+from .unit_of_work import run_read, run_unit
+
+""" [SETUP] """
+ITEM = "Potion"
+LIFETIME_MINUTES = 60
+SELLER, BUYER = 1, 2
+
+def _utc(dt:datetime) -> str:
+	return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+# ==> Two rich players, a consumable, and 3 of it held by SELLER with one minute left on its clock.
+def _setup_work(conn:sqlite3.Connection, expires_at:str) -> None:
+	conn.executemany("INSERT INTO users(user_id, username, balance) VALUES (?, ?, 1000000)", [(SELLER, "seller"), (BUYER, "buyer")])
+	conn.execute("INSERT INTO item_market(name, description, cost, lifetime_minutes) VALUES (?, 'check', 1, ?)", (ITEM, LIFETIME_MINUTES))
+	conn.execute("INSERT INTO user_inventories(user_id, name, quantity, expires_at) VALUES (?, ?, 3, ?)", (SELLER, ITEM, expires_at))
+
+def _clock_work(conn:sqlite3.Connection, user_id:int) -> str|None:
+	row = conn.execute("SELECT expires_at FROM user_inventories WHERE user_id = ? AND name = ? AND quantity > 0", (user_id, ITEM)).fetchone()
+	return row[0] if row else None
+
+""" [ROUND TRIPS] """
+# ==> Each moves all 3 units from SELLER to BUYER and back again.
+async def _give(db) -> None:
+	await transfer_items(db, SELLER, BUYER, {ITEM: 3})
+	await transfer_items(db, BUYER, SELLER, {ITEM: 3})
+
+async def _order_fills(db) -> None:
+	exchange = exchange_for(db)
+	await exchange.place(SELLER, ITEM, "sell", 10, 3)	# ==> Rests, holding the units...
+	await exchange.place(BUYER, ITEM, "buy", 10, 3)		# ==> ...until this takes them.
+	await exchange.place(SELLER, ITEM, "buy", 10, 3)	# ==> Now the other way round.
+	await exchange.place(BUYER, ITEM, "sell", 10, 3)
+
+async def _order_cancel(db) -> None:
+	exchange = exchange_for(db)
+	result = await exchange.place(SELLER, ITEM, "sell", 10, 3)
+	await exchange.cancel(SELLER, result.order_id)
+
+async def _auctions(db) -> None:
+	house = auctions_for(db)
+	later = datetime.now(timezone.utc) + timedelta(minutes=2)
+	auction_id, _ = await house.create(SELLER, ITEM, 3, 1, timedelta(minutes=1))
+	await house.bid(auction_id, BUYER, 5)
+	await house.settle_due(later)
+	auction_id, _ = await house.create(BUYER, ITEM, 3, 1, timedelta(minutes=1))
+	await house.bid(auction_id, SELLER, 5)
+	await house.settle_due(later)
+
+async def _unsold_auction(db) -> None:
+	house = auctions_for(db)
+	await house.create(SELLER, ITEM, 3, 1, timedelta(minutes=1))
+	await house.settle_due(datetime.now(timezone.utc) + timedelta(minutes=2))
+
+ROUND_TRIPS:list[tuple[str, typing.Callable]] = [
+	("/player give there and back", _give),
+	("order book fills there and back", _order_fills),
+	("order book sell, then cancel", _order_cancel),
+	("auctions there and back", _auctions),
+	("unsold auction", _unsold_auction),
+]
+
+""" [CHECKS] """
+# [find_violations]
+# ==> Returns one message per round trip that gave the units more time. An empty list means every clock held.
+async def find_violations() -> list[str]:
+	db = await connect_database(MemoryBackend(None))
+	try:
+		await migrate(db)
+		start = _utc(datetime.now(timezone.utc) + timedelta(minutes=1))
+		await run_unit(db, _setup_work, start)
+		violations = []
+		for label, trip in ROUND_TRIPS:
+			await trip(db)
+			clock = await run_read(db, _clock_work, SELLER)
+			if clock is None or clock > start:
+				violations.append(f"{label}: expires_at went from {start} to {clock}")
+		return violations
+	finally:
+		await close(db)
+
+def main() -> int:
+	violations = asyncio.run(find_violations())
+	for label, _ in ROUND_TRIPS:
+		print(f"[{'FAIL' if any(v.startswith(f'{label}:') for v in violations) else ' OK '}] {label}")
+
+	if violations:
+		print(f"\n{len(violations)} expiry clock regression(s):")
+		for v in violations:
+			print(f"	{v}")
+		return 1
+	print(f"\nAll {len(ROUND_TRIPS)} round trips kept their expiry clock.")
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
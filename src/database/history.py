@@ -0,0 +1,155 @@
+"""
+INFORMATION
+
+	This is our balance history. After every payout, and after every HISTORY_TRADE_EVERY balance/research changes
+	for a player, we record where that player's balance and research stand.
+	Points are stored compactly in balance_history:
+		==> Every HISTORY_SNAPSHOT_EVERY-th point per player is a full snapshot (absolute balance & research).
+		==> Every other point only stores the change since the previous point. Those are small integers, which SQLite
+			stores in 1-3 bytes instead of up to 8.
+		==> The table is WITHOUT ROWID and clustered on (user_id, seq), so one player's trajectory is one contiguous range.
+	history_heads keeps each player's latest absolute values, so recording a point never has to replay the deltas.
+	A player whose numbers haven't moved since their last point gets no new point.
+	Each payout also records server-wide totals (money supply etc.) in economy_snapshots.
+	Reading replays from the nearest snapshot at or before the range, then downsamples to a fixed number of points.
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, os, sqlite3, typing, weakref
+
+""" [SETUP] """
+HISTORY_SNAPSHOT_EVERY:int = int(os.getenv("HISTORY_SNAPSHOT_EVERY") or 32)
+HISTORY_TRADE_EVERY:int = int(os.getenv("HISTORY_TRADE_EVERY") or 10)
+HISTORY_MAX_POINTS:int = 20 # ==> Default points per /player history answer
+
+class EconomySnapshot(typing.NamedTuple):
+	snapshot_id:int
+	recorded_at:str
+	players:int
+	money_supply:int
+	research_supply:int
+
+class HistoryPoint(typing.NamedTuple):
+	seq:int
+	recorded_at:str	# ==> UTC, datetime('now') format
+	reason:str		# ==> 'payout' or 'trade'
+	balance:int
+	research:int
+
+""" [RECORDING SQL] """
+# ==> Both statements take :now, :reason and :every (plus :user_id for the single-user pair), and must run in this order
+#	inside one transaction: the INSERT reads the old heads, then the upsert advances them.
+# ==> "Changed" means: no head yet, or the balance or research moved since the head.
+_CHANGED = "(h.user_id IS NULL OR u.balance != h.balance OR u.research != h.research)"
+_SNAPSHOT_DUE = "(h.user_id IS NULL OR h.since_snapshot + 1 >= :every)"
+
+def _record_sql(user_filter:str) -> tuple[str, str]:
+	insert = f"""
+		INSERT INTO balance_history(user_id, seq, recorded_at, reason, balance, research, is_snapshot)
+		SELECT u.user_id, COALESCE(h.seq, 0) + 1, :now, :reason,
+			CASE WHEN {_SNAPSHOT_DUE} THEN u.balance ELSE u.balance - h.balance END,
+			CASE WHEN {_SNAPSHOT_DUE} THEN u.research ELSE u.research - h.research END,
+			{_SNAPSHOT_DUE}
+		FROM users AS u LEFT JOIN history_heads AS h ON h.user_id = u.user_id
+		WHERE {user_filter} {_CHANGED}
+	"""
+	advance = f"""
+		INSERT INTO history_heads(user_id, seq, balance, research, since_snapshot)
+		SELECT u.user_id, 1, u.balance, u.research, 0
+		FROM users AS u LEFT JOIN history_heads AS h ON h.user_id = u.user_id
+		WHERE {user_filter} {_CHANGED}
+		ON CONFLICT(user_id) DO UPDATE SET
+			seq = seq + 1,
+			balance = excluded.balance,
+			research = excluded.research,
+			since_snapshot = CASE WHEN since_snapshot + 1 >= :every THEN 0 ELSE since_snapshot + 1 END
+	"""
+	return insert, advance
+
+# ==> Every user. The scheduler runs these right after PAYOUT_SQL, inside the payout's transaction.
+RECORD_HISTORY_SQL, ADVANCE_HISTORY_HEADS_SQL = _record_sql("")
+# ==> One user (:user_id). Used for trades.
+RECORD_USER_HISTORY_SQL, ADVANCE_USER_HEAD_SQL = _record_sql("u.user_id = :user_id AND")
+
+# ==> Server-wide totals. Takes :now. Also run by the scheduler inside the payout's transaction.
+RECORD_ECONOMY_SQL = """
+	INSERT INTO economy_snapshots(recorded_at, players, money_supply, research_supply)
+	SELECT :now, COUNT(*), COALESCE(SUM(balance), 0), COALESCE(SUM(research), 0) FROM users
+"""
+
+# [record_user_point]
+# ==> Runs inside a unit of work (see unit_of_work.py).
+def record_user_point(conn:sqlite3.Connection, user_id:int, reason:str, now:str) -> None:
+	params = {"now": now, "reason": reason, "every": HISTORY_SNAPSHOT_EVERY, "user_id": user_id}
+	conn.execute(RECORD_USER_HISTORY_SQL, params)
+	conn.execute(ADVANCE_USER_HEAD_SQL, params)
+
+""" [READING] """
+# ==> The newest snapshot at or before a time, then every point from there. See read_history.
+SNAPSHOT_SEEK_SQL = """
+	SELECT seq FROM balance_history WHERE user_id = ? AND is_snapshot = 1 AND recorded_at <= ?
+	ORDER BY recorded_at DESC LIMIT 1
+"""
+HISTORY_RANGE_SQL = """
+	SELECT seq, recorded_at, reason, balance, research, is_snapshot FROM balance_history
+	WHERE user_id = ? AND seq >= ? AND recorded_at <= ? ORDER BY seq ASC
+"""
+
+# [read_history]
+# ==> Runs on the connection thread. Returns absolute points with since <= recorded_at <= until, oldest first.
+def read_history(conn:sqlite3.Connection, user_id:int, since:str|None, until:str|None) -> list[HistoryPoint]:
+	# ==> Start from the newest snapshot at or before `since`, so everything we replay is needed.
+	row = conn.execute(SNAPSHOT_SEEK_SQL, (user_id, since or "")).fetchone()
+	start = row[0] if row else 1
+	c = conn.execute(HISTORY_RANGE_SQL, (user_id, start, until or "9999"))
+	points = []
+	balance = research = 0
+	for seq, recorded_at, reason, b, r, is_snapshot in c:
+		balance, research = (b, r) if is_snapshot else (balance + b, research + r)
+		if since is None or recorded_at >= since:
+			points.append(HistoryPoint(seq, recorded_at, reason, balance, research))
+	return points
+
+# [downsample]
+# ==> At most `points` evenly spaced points. The first and latest points are always kept.
+def downsample(history:list[HistoryPoint], points:int = HISTORY_MAX_POINTS) -> list[HistoryPoint]:
+	if len(history) <= points:
+		return history
+	if points < 2:
+		return history[-1:]
+	step = (len(history) - 1) / (points - 1)
+	return [history[round(i * step)] for i in range(points)]
+
+""" [TRADE COUNTING] """
+# ==> Counts balance/research changes per player, so we record a point every HISTORY_TRADE_EVERY of them.
+#	Lives in memory: a restart only means a player's next trade point comes a little late.
+class TradeCounter:
+	def __init__(self, every:int = HISTORY_TRADE_EVERY) -> None:
+		self.every:int = every
+		self._counts:dict[int, int] = {}
+
+	# [due]
+	# ==> Whether the player's next change should record a history point. Doesn't count anything; tick() does,
+	#	once the change has committed.
+	def due(self, user_id:int) -> bool:
+		return self._counts.get(user_id, 0) + 1 >= self.every
+
+	# [tick]
+	# ==> Returns True when this change should also record a history point.
+	def tick(self, user_id:int) -> bool:
+		count = self._counts.get(user_id, 0) + 1
+		if count >= self.every:
+			self._counts.pop(user_id, None)
+			return True
+		self._counts[user_id] = count
+		return False
+
+""" [PER-CONNECTION REGISTRY] """
+_counters:"weakref.WeakKeyDictionary[aiosqlite.Connection, TradeCounter]" = weakref.WeakKeyDictionary()
+
+def trades_for(db:aiosqlite.Connection) -> TradeCounter:
+	counter = _counters.get(db)
+	if counter is None:
+		counter = _counters[db] = TradeCounter()
+	return counter
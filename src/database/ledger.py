@@ -0,0 +1,49 @@
+"""
+INFORMATION
+
+	These are the debit and credit statements every trading path shares: /player transact and give, add_bal and add_res,
+	the order book, auctions and crafting. They live here, below all of those modules, so each can import them without
+	importing data_handler, and query_plans.py checks the very statements they run.
+
+	Debits are conditional UPDATEs (... AND x >= ?), so the funds check and the write are one statement, and two
+	debits racing for the same coins or items can't both pass. Balance statements return (balance, research) for
+	the profile cache (see profile_cache.py).
+
+"""
+
+""" [STATS] """
+# [debit_stat_sql]
+# ==> column is balance or research. Params: (amount, user_id, amount). No row back if there isn't enough.
+def debit_stat_sql(column:str) -> str:
+	return f"UPDATE users SET {column} = {column} - ? WHERE user_id = ? AND {column} >= ? RETURNING balance, research"
+
+# [credit_stat_sql]
+# ==> column is balance or research. Params: (amount, user_id). No row back if the user doesn't exist.
+def credit_stat_sql(column:str) -> str:
+	return f"UPDATE users SET {column} = {column} + ? WHERE user_id = ? RETURNING balance, research"
+
+DEBIT_BALANCE_SQL = debit_stat_sql("balance")
+CREDIT_BALANCE_SQL = credit_stat_sql("balance")
+CREDIT_RESEARCH_SQL = credit_stat_sql("research")
+
+""" [ITEMS] """
+# ==> Consumables (see migration v11) keep their clock (expires_at) when they change hands. Units that move are taken
+#	with TAKE_ITEMS_SQL, which hands the clock back, and credited with it, so trading never extends a lifetime.
+#	Fresh units (buys, crafts) are credited with no clock, and the inventory triggers start one.
+
+# ==> Params: (quantity, user_id, name, quantity). rowcount is 0 if the stack is too small. For units that are used up.
+DEBIT_ITEMS_SQL = "UPDATE user_inventories SET quantity = quantity - ? WHERE user_id = ? AND name = ? AND quantity >= ?"
+
+# ==> Same params. Returns the stack's expires_at, or no row if the stack is too small. For units that move.
+TAKE_ITEMS_SQL = f"{DEBIT_ITEMS_SQL} RETURNING expires_at"
+
+# ==> How a stack's clock combines with incoming units' clock. An empty stack takes theirs. A live one keeps the earlier
+#	of the two, or keeps no clock if it had none. Reads the stack's old row. Auctions deliver with it too.
+JOIN_CLOCK = "CASE WHEN quantity = 0 THEN excluded.expires_at ELSE MIN(expires_at, COALESCE(excluded.expires_at, expires_at)) END"
+
+# ==> Params: (user_id, name, quantity, expires_at). Adds to the player's stack, or starts one.
+#	expires_at is the clock the units carry (from TAKE_ITEMS_SQL), or None for fresh units.
+CREDIT_ITEMS_SQL = f"""
+	INSERT INTO user_inventories(user_id, name, quantity, expires_at) VALUES (?, ?, ?, ?)
+	ON CONFLICT(user_id, name) DO UPDATE SET quantity = quantity + excluded.quantity, expires_at = {JOIN_CLOCK}
+"""
@@ -0,0 +1,500 @@
+"""
+INFORMATION
+
+	This is our schema migration runner. Every schema change lives here as a numbered migration.
+	The version our database is at is stored in PRAGMA user_version, so a current database costs one pragma read on startup.
+	To change the schema: append a new Migration with the next version number. Never edit one that has already shipped!
+	
+"""
+
+""" [IMPORTS] """
+import aiosqlite, typing
+from utility_libs.utilities import LoggingUtilities
+
+""" [SETUP] """
+LogUtil = LoggingUtilities(True,True)
+
+class Migration(typing.NamedTuple):
+	version:int
+	description:str
+	statements:tuple[str, ...]
+
+""" [MIGRATIONS] """
+# ==> Version 1 uses IF NOT EXISTS so databases made before migrations existed (user_version = 0) adopt it safely.
+MIGRATIONS:list[Migration] = [
+	Migration(1, "Base tables", (
+		# users Table
+		"""
+			CREATE TABLE IF NOT EXISTS users(
+				user_id INTEGER PRIMARY KEY,
+				username TEXT,
+				balance INTEGER DEFAULT 0,
+				research INTEGER DEFAULT 0
+			)
+		""",
+		# user economy table. Contains the economies that our user has unlocked.
+		"""
+			CREATE TABLE IF NOT EXISTS user_economy(
+				user_id INTEGER NOT NULL,
+				name TEXT NOT NULL,
+				economy_income INTEGER,
+				PRIMARY KEY (user_id, name),
+				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+				FOREIGN KEY (name) REFERENCES economy_market(name) ON DELETE CASCADE
+			)
+		""",
+		# user inventories table. Independent from users since inventories can get large!
+		"""
+			CREATE TABLE IF NOT EXISTS user_inventories(
+				user_id INTEGER NOT NULL,
+				name TEXT NOT NULL,
+				quantity INTEGER DEFAULT 0 CHECK(quantity >= 0),
+				PRIMARY KEY (user_id, name),
+				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+				FOREIGN KEY (name) REFERENCES item_market(name) ON DELETE CASCADE
+			)
+		""",
+		# user tech table. Contains the tech that the user has unlocked.
+		# Tech may have an income assigned to it. This contributes to a player's research during payouts.
+		"""
+			CREATE TABLE IF NOT EXISTS user_tech(
+				user_id INTEGER NOT NULL,
+				name TEXT NOT NULL,
+				tech_income INTEGER,
+				PRIMARY KEY (user_id, name),
+				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+				FOREIGN KEY (name) REFERENCES tech_market(name) ON DELETE CASCADE
+			)
+		""",
+		# economy_market Table. We store the levels of economy here. These are to be assigned by mods.
+		"""
+			CREATE TABLE IF NOT EXISTS economy_market(
+				name TEXT PRIMARY KEY NOT NULL,
+				economy_income INTEGER
+			)
+		""",
+		# item_market Table. where items for sale exist.
+		# Many items will require unlockable "Tech" roles to buy. 
+		# ==> Uses currency. NOT same as research
+		# --> No duplicate names allowed!
+		# ==> Cost CAN be negative. This adds credit to a player.
+		"""
+			CREATE TABLE IF NOT EXISTS item_market(
+				name TEXT PRIMARY KEY NOT NULL,
+				description TEXT,
+				cost INTEGER,
+				req_tech TEXT
+			)
+		""",
+		# tech_market Table. where techs for unlocking exist.
+		# Similar to item market, but no supply attributes. Retains required roles for "tech tree" style gameplay.
+		# ==> tech cost is like "research pts"
+		"""
+			CREATE TABLE IF NOT EXISTS tech_market(
+				name TEXT PRIMARY KEY NOT NULL,
+				description TEXT,
+				tech_income INTEGER,
+				cost INTEGER,
+				req_tech TEXT
+			)
+		""",
+		# schedule Table. Where scheduler data lives. Follows YYYY-MM-DD UTC format
+		"""
+			CREATE TABLE IF NOT EXISTS schedule(
+				run_date TEXT PRIMARY KEY,
+				status TEXT NOT NULL CHECK(status IN ('started','complete','failed')),
+				started_at TEXT NOT NULL, -- datetime('now')
+				finished_at TEXT, -- set when completed OR failed
+				error_msg TEXT -- Optional failure note				
+			)
+		""",
+	)),
+	# Foreign Key indexes for frequent per-user fetching
+	# ==> Item possession i.e. "who owns this item?" is already covered by the (user_id, name) PKs.
+	Migration(2, "Per-user foreign key indexes", (
+		"CREATE INDEX IF NOT EXISTS idx_econ_user ON user_economy(user_id)", # user in econ
+		"CREATE INDEX IF NOT EXISTS idx_inv_user ON user_inventories(user_id)", # user in inventory
+		"CREATE INDEX IF NOT EXISTS idx_tech_user ON user_tech(user_id)", # user in tech
+	)),
+	# Composite & covering indexes for how we actually read. See query_plans.py for the queries they serve.
+	# ==> (user_id, <sort col>, name) covers every column of the user tables, so per-user listings and the payout sums
+	#	never touch the table itself or sort in a temp B-tree. They also make the plain idx_*_user indexes redundant.
+	# ==> (name) on the user tables keeps ON DELETE CASCADE from the markets (and bulk updates by name) off a full scan.
+	Migration(3, "Composite covering indexes for listings, payouts and cascades", (
+		"CREATE INDEX IF NOT EXISTS idx_inv_user_qty ON user_inventories(user_id, quantity, name)",
+		"CREATE INDEX IF NOT EXISTS idx_econ_user_income ON user_economy(user_id, economy_income, name)",
+		"CREATE INDEX IF NOT EXISTS idx_tech_user_income ON user_tech(user_id, tech_income, name)",
+		"DROP INDEX IF EXISTS idx_inv_user",
+		"DROP INDEX IF EXISTS idx_econ_user",
+		"DROP INDEX IF EXISTS idx_tech_user",
+		"CREATE INDEX IF NOT EXISTS idx_inv_name ON user_inventories(name)",
+		"CREATE INDEX IF NOT EXISTS idx_econ_name ON user_economy(name)",
+		"CREATE INDEX IF NOT EXISTS idx_tech_name ON user_tech(name)",
+		"CREATE INDEX IF NOT EXISTS idx_item_market_cost ON item_market(cost)",
+		"CREATE INDEX IF NOT EXISTS idx_tech_market_cost ON tech_market(cost)",
+		"CREATE INDEX IF NOT EXISTS idx_economy_market_income ON economy_market(economy_income)",
+	)),
+	# Homes for the write-behind queue's low-priority writes (see write_behind.py).
+	Migration(4, "last_seen, audit_log and command_stats", (
+		"ALTER TABLE users ADD COLUMN last_seen TEXT", # ==> UTC, datetime('now') format
+		"""
+			CREATE TABLE IF NOT EXISTS audit_log(
+				entry_id INTEGER PRIMARY KEY,
+				created_at TEXT NOT NULL, -- datetime('now')
+				user_id INTEGER, -- who did it
+				action TEXT NOT NULL, -- e.g. the command's qualified name
+				detail TEXT
+			)
+		""",
+		"""
+			CREATE TABLE IF NOT EXISTS command_stats(
+				name TEXT PRIMARY KEY,
+				uses INTEGER NOT NULL DEFAULT 0,
+				last_used TEXT
+			)
+		""",
+	)),
+	# Unsent announcements (see utility_libs/outbox.py). A row is deleted once Discord has accepted it.
+	Migration(5, "announcement_outbox", (
+		"""
+			CREATE TABLE IF NOT EXISTS announcement_outbox(
+				message_id INTEGER PRIMARY KEY,
+				channel_id INTEGER NOT NULL,
+				created_at TEXT NOT NULL, -- UTC, datetime('now') format
+				content TEXT NOT NULL
+			)
+		""",
+		"CREATE INDEX IF NOT EXISTS idx_outbox_channel ON announcement_outbox(channel_id, message_id)",
+	)),
+	# Balance history (see history.py). Snapshot rows hold absolute values; the rest hold the change since the previous row.
+	Migration(6, "balance_history and history_heads", (
+		"""
+			CREATE TABLE IF NOT EXISTS balance_history(
+				user_id INTEGER NOT NULL,
+				seq INTEGER NOT NULL, -- per user, from 1
+				recorded_at TEXT NOT NULL, -- UTC, datetime('now') format
+				reason TEXT NOT NULL, -- 'payout' or 'trade'
+				balance INTEGER NOT NULL,
+				research INTEGER NOT NULL,
+				is_snapshot INTEGER NOT NULL,
+				PRIMARY KEY (user_id, seq),
+				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+			) WITHOUT ROWID
+		""",
+		# ==> Finds where to start replaying a range without walking the player's whole history.
+		"CREATE INDEX IF NOT EXISTS idx_history_snapshots ON balance_history(user_id, recorded_at) WHERE is_snapshot = 1",
+		"""
+			CREATE TABLE IF NOT EXISTS history_heads(
+				user_id INTEGER PRIMARY KEY,
+				seq INTEGER NOT NULL,
+				balance INTEGER NOT NULL,
+				research INTEGER NOT NULL,
+				since_snapshot INTEGER NOT NULL, -- points recorded since the last snapshot
+				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+			)
+		""",
+	)),
+	# Server-wide totals after each payout. One small row per payout, so the money-supply curve is one range read.
+	Migration(7, "economy_snapshots", (
+		"""
+			CREATE TABLE IF NOT EXISTS economy_snapshots(
+				snapshot_id INTEGER PRIMARY KEY,
+				recorded_at TEXT NOT NULL, -- UTC, datetime('now') format
+				players INTEGER NOT NULL,
+				money_supply INTEGER NOT NULL, -- SUM(users.balance)
+				research_supply INTEGER NOT NULL -- SUM(users.research)
+			)
+		""",
+		"CREATE INDEX IF NOT EXISTS idx_economy_snapshots_at ON economy_snapshots(recorded_at)",
+	)),
+	# Player order book (see order_book.py). Only open orders live in open_orders; market_fills is the trade ledger.
+	Migration(8, "open_orders and market_fills", (
+		"""
+			CREATE TABLE IF NOT EXISTS open_orders(
+				order_id INTEGER PRIMARY KEY AUTOINCREMENT, -- never reused, so it doubles as time priority
+				item TEXT NOT NULL,
+				user_id INTEGER NOT NULL,
+				side TEXT NOT NULL CHECK(side IN ('buy','sell')),
+				price INTEGER NOT NULL CHECK(price > 0),
+				remaining INTEGER NOT NULL CHECK(remaining > 0),
+				created_at TEXT NOT NULL, -- UTC, datetime('now') format
+				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
+				FOREIGN KEY (item) REFERENCES item_market(name) ON DELETE CASCADE
+			)
+		""",
+		# ==> Covers rebuilding one item's book (and the cascade from item_market).
+		"CREATE INDEX IF NOT EXISTS idx_open_orders_book ON open_orders(item, side, price, order_id, user_id, remaining)",
+		# ==> A player's own orders (and the cascade from users).
+		"CREATE INDEX IF NOT EXISTS idx_open_orders_user ON open_orders(user_id, order_id)",
+		# ==> No foreign keys: the ledger outlives the orders, players and items it mentions.
+		"""
+			CREATE TABLE IF NOT EXISTS market_fills(
+				fill_id INTEGER PRIMARY KEY,
+				item TEXT NOT NULL,
+				price INTEGER NOT NULL,
+				quantity INTEGER NOT NULL,
+				buyer_id INTEGER NOT NULL,
+				seller_id INTEGER NOT NULL,
+				taker_side TEXT NOT NULL, -- the incoming order's side
+				filled_at TEXT NOT NULL -- UTC, datetime('now') format
+			)
+		""",
+		"CREATE INDEX IF NOT EXISTS idx_market_fills_item ON market_fills(item, fill_id)",
+	)),
+	# Timed auctions (see auctions.py). Rows stay after closing, as a record of who won what.
+	Migration(9, "auctions", (
+		"""
+			CREATE TABLE IF NOT EXISTS auctions(
+				auction_id INTEGER PRIMARY KEY,
+				item TEXT NOT NULL,
+				quantity INTEGER NOT NULL CHECK(quantity > 0),
+				seller_id INTEGER NOT NULL, -- no foreign key: a seller who left just isn't paid
+				min_bid INTEGER NOT NULL CHECK(min_bid > 0),
+				top_bid INTEGER, -- held from the top bidder's balance until they're outbid or the auction closes
+				top_bidder_id INTEGER,
+				status TEXT NOT NULL DEFAULT 'open' CHECK(status IN ('open','sold','unsold')),
+				created_at TEXT NOT NULL, -- UTC, datetime('now') format
+				closes_at TEXT NOT NULL, -- UTC, datetime('now') format
+				FOREIGN KEY (top_bidder_id) REFERENCES users(user_id) ON DELETE SET NULL,
+				FOREIGN KEY (item) REFERENCES item_market(name) ON DELETE CASCADE
+			)
+		""",
+		# ==> Settlement ("everything due by now") and rescheduling after a restart. Closed auctions drop out of it.
+		"CREATE INDEX IF NOT EXISTS idx_auctions_open ON auctions(closes_at) WHERE status = 'open'",
+		# ==> One seller's due auctions, so paying many sellers in one batch stays a lookup per seller.
+		"CREATE INDEX IF NOT EXISTS idx_auctions_seller ON auctions(seller_id, closes_at) WHERE status = 'open'",
+		# ==> The cascades from users and item_market.
+		"CREATE INDEX IF NOT EXISTS idx_auctions_bidder ON auctions(top_bidder_id)",
+		"CREATE INDEX IF NOT EXISTS idx_auctions_item ON auctions(item, status)",
+	)),
+	# Crafting recipes (see recipes.py). A recipe is named after the item it makes, so there's at most one per item.
+	Migration(10, "recipes and recipe_inputs", (
+		"""
+			CREATE TABLE IF NOT EXISTS recipes(
+				name TEXT PRIMARY KEY NOT NULL, -- the output item
+				output_quantity INTEGER NOT NULL DEFAULT 1 CHECK(output_quantity > 0),
+				req_tech TEXT,
+				FOREIGN KEY (name) REFERENCES item_market(name) ON DELETE CASCADE
+			)
+		""",
+		"""
+			CREATE TABLE IF NOT EXISTS recipe_inputs(
+				recipe TEXT NOT NULL,
+				input TEXT NOT NULL,
+				quantity INTEGER NOT NULL CHECK(quantity > 0),
+				PRIMARY KEY (recipe, input),
+				FOREIGN KEY (recipe) REFERENCES recipes(name) ON DELETE CASCADE,
+				FOREIGN KEY (input) REFERENCES item_market(name) ON DELETE CASCADE
+			) WITHOUT ROWID
+		""",
+		# ==> The cascade from item_market, and "what uses this item?".
+		"CREATE INDEX IF NOT EXISTS idx_recipe_inputs_input ON recipe_inputs(input)",
+	)),
+	# Consumables (see the expiry family in data_handler.py). An item with a lifetime is used up one unit at a time:
+	#	each unit lasts lifetime_minutes, and expires_at is when a stack's current unit runs out.
+	Migration(11, "Item lifetimes and inventory expiry", (
+		"ALTER TABLE item_market ADD COLUMN lifetime_minutes INTEGER CHECK(lifetime_minutes > 0)", # ==> NULL never expires
+		"ALTER TABLE user_inventories ADD COLUMN expires_at TEXT", # ==> UTC, datetime('now') format
+		# ==> The sweep's range ("everything due by now"). Permanent stacks never enter it.
+		"CREATE INDEX IF NOT EXISTS idx_inv_expiry ON user_inventories(expires_at) WHERE expires_at IS NOT NULL",
+		# ==> Keeps per-user inventory listings covering now that they read expires_at too.
+		"DROP INDEX IF EXISTS idx_inv_user_qty",
+		"CREATE INDEX IF NOT EXISTS idx_inv_user_qty ON user_inventories(user_id, quantity, name, expires_at)",
+		# ==> Items reach inventories from buys, trades, fills, auctions and crafts. Stamping the clock here covers them all.
+		# ==> A new stack starts its first unit's clock...
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_inv_expiry_insert AFTER INSERT ON user_inventories
+			WHEN NEW.expires_at IS NULL AND NEW.quantity > 0
+				AND (SELECT lifetime_minutes FROM item_market WHERE name = NEW.name) IS NOT NULL
+			BEGIN
+				UPDATE user_inventories
+				SET expires_at = datetime('now', '+' || (SELECT lifetime_minutes FROM item_market WHERE name = NEW.name) || ' minutes')
+				WHERE user_id = NEW.user_id AND name = NEW.name;
+			END
+		""",
+		# ==> ...and so does an empty stack that's refilled. Adding to a live stack leaves its clock alone.
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_inv_expiry_refill AFTER UPDATE OF quantity ON user_inventories
+			WHEN OLD.quantity = 0 AND NEW.quantity > 0
+				AND (SELECT lifetime_minutes FROM item_market WHERE name = NEW.name) IS NOT NULL
+			BEGIN
+				UPDATE user_inventories
+				SET expires_at = datetime('now', '+' || (SELECT lifetime_minutes FROM item_market WHERE name = NEW.name) || ' minutes')
+				WHERE user_id = NEW.user_id AND name = NEW.name;
+			END
+		""",
+	)),
+	# Income modifiers (see the modifier family in data_handler.py for how they stack).
+	# ==> Tech modifiers apply to the tech's owners, item modifiers to anyone holding at least one, global ones to everyone.
+	Migration(12, "income_modifiers and user_multipliers", (
+		"""
+			CREATE TABLE IF NOT EXISTS income_modifiers(
+				modifier_id INTEGER PRIMARY KEY,
+				source_kind TEXT NOT NULL CHECK(source_kind IN ('tech','item','global')),
+				source TEXT, -- the tech or item's name. NULL for global modifiers
+				target TEXT NOT NULL CHECK(target IN ('economy','research')),
+				kind TEXT NOT NULL CHECK(kind IN ('percent','multiplier')),
+				value REAL NOT NULL, -- +10% is 10. A multiplier is at least 1 (use a negative percent to reduce income)
+				ends_at TEXT, -- UTC, datetime('now') format. NULL never ends
+				CHECK((source_kind = 'global') = (source IS NULL)),
+				CHECK(kind = 'percent' OR value >= 1)
+			)
+		""",
+		# ==> Applying modifiers starts from the modifiers and looks up their owners, one source at a time.
+		"CREATE INDEX IF NOT EXISTS idx_modifiers_source ON income_modifiers(source_kind, source)",
+		# ==> Each player's tech and item modifiers, combined. Rebuilt whenever modifiers change, and kept up to date
+		#	per player as they gain or lose a source (see v14). Players with none have no row.
+		"""
+			CREATE TABLE IF NOT EXISTS user_multipliers(
+				user_id INTEGER PRIMARY KEY,
+				economy_bonus REAL NOT NULL, -- percent bonuses, summed
+				economy_factor REAL NOT NULL, -- the strongest multiplier, or 1
+				research_bonus REAL NOT NULL,
+				research_factor REAL NOT NULL,
+				FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+			)
+		""",
+	)),
+	# Consumables keep their clock when they change hands (see the [ITEMS] block in ledger.py). Escrowed units carry it
+	#	while they wait: a sell order's in open_orders, an auction's in auctions. NULL for units without one.
+	Migration(13, "Expiry clocks follow traded items", (
+		"ALTER TABLE open_orders ADD COLUMN expires_at TEXT",
+		"ALTER TABLE auctions ADD COLUMN expires_at TEXT",
+		# ==> An emptied stack drops its clock (RETURNING still sees the old one, so TAKE_ITEMS_SQL hands it on)...
+		"UPDATE user_inventories SET expires_at = NULL WHERE quantity = 0 AND expires_at IS NOT NULL",
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_inv_expiry_empty AFTER UPDATE OF quantity ON user_inventories
+			WHEN NEW.quantity = 0 AND NEW.expires_at IS NOT NULL
+			BEGIN
+				UPDATE user_inventories SET expires_at = NULL WHERE user_id = NEW.user_id AND name = NEW.name;
+			END
+		""",
+		# ==> ...so a refilled stack only starts a new clock if the units didn't bring one.
+		"DROP TRIGGER IF EXISTS trg_inv_expiry_refill",
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_inv_expiry_refill AFTER UPDATE OF quantity ON user_inventories
+			WHEN OLD.quantity = 0 AND NEW.quantity > 0 AND NEW.expires_at IS NULL
+				AND (SELECT lifetime_minutes FROM item_market WHERE name = NEW.name) IS NOT NULL
+			BEGIN
+				UPDATE user_inventories
+				SET expires_at = datetime('now', '+' || (SELECT lifetime_minutes FROM item_market WHERE name = NEW.name) || ' minutes')
+				WHERE user_id = NEW.user_id AND name = NEW.name;
+			END
+		""",
+	)),
+	# Keeps user_multipliers up to date as players gain or lose a modifier source, so the payout can read it as it is.
+	# ==> A modifier counts until it's pruned (see the modifier family in data_handler.py), so none of this reads the clock.
+	Migration(14, "Per-player multiplier upkeep", (
+		# ==> INSERT INTO refresh_user_multipliers(user_id) VALUES (?) recomputes one player's row. The ownership triggers
+		#	below all go through it. Writing the row only if the player still exists lets their deletion cascade through.
+		"CREATE VIEW IF NOT EXISTS refresh_user_multipliers AS SELECT NULL AS user_id",
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_refresh_user_multipliers INSTEAD OF INSERT ON refresh_user_multipliers
+			BEGIN
+				DELETE FROM user_multipliers WHERE user_id = NEW.user_id;
+				INSERT INTO user_multipliers(user_id, economy_bonus, economy_factor, research_bonus, research_factor)
+				SELECT user_id,
+					CASE WHEN target = 'economy' AND kind = 'percent' THEN value ELSE 0 END,
+					CASE WHEN target = 'economy' AND kind = 'multiplier' THEN value ELSE 1 END,
+					CASE WHEN target = 'research' AND kind = 'percent' THEN value ELSE 0 END,
+					CASE WHEN target = 'research' AND kind = 'multiplier' THEN value ELSE 1 END
+				FROM (
+					SELECT t.user_id, m.target, m.kind, m.value FROM user_tech AS t
+					JOIN income_modifiers AS m ON m.source_kind = 'tech' AND m.source = t.name
+					WHERE t.user_id = NEW.user_id
+					UNION ALL
+					SELECT i.user_id, m.target, m.kind, m.value FROM user_inventories AS i
+					JOIN income_modifiers AS m ON m.source_kind = 'item' AND m.source = i.name
+					WHERE i.user_id = NEW.user_id AND i.quantity > 0
+				)
+				WHERE EXISTS (SELECT 1 FROM users WHERE user_id = NEW.user_id)
+				ON CONFLICT(user_id) DO UPDATE SET
+					economy_bonus = economy_bonus + excluded.economy_bonus,
+					economy_factor = MAX(economy_factor, excluded.economy_factor),
+					research_bonus = research_bonus + excluded.research_bonus,
+					research_factor = MAX(research_factor, excluded.research_factor);
+			END
+		""",
+		# ==> Owning a tech...
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_tech_multipliers_insert AFTER INSERT ON user_tech
+			WHEN EXISTS (SELECT 1 FROM income_modifiers WHERE source_kind = 'tech' AND source = NEW.name)
+			BEGIN
+				INSERT INTO refresh_user_multipliers(user_id) VALUES (NEW.user_id);
+			END
+		""",
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_tech_multipliers_delete AFTER DELETE ON user_tech
+			WHEN EXISTS (SELECT 1 FROM income_modifiers WHERE source_kind = 'tech' AND source = OLD.name)
+			BEGIN
+				INSERT INTO refresh_user_multipliers(user_id) VALUES (OLD.user_id);
+			END
+		""",
+		# ==> ...and holding at least one of an item. Trades, fills, crafts and expiry only matter when a stack
+		#	starts or stops being empty.
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_inv_multipliers_insert AFTER INSERT ON user_inventories
+			WHEN NEW.quantity > 0
+				AND EXISTS (SELECT 1 FROM income_modifiers WHERE source_kind = 'item' AND source = NEW.name)
+			BEGIN
+				INSERT INTO refresh_user_multipliers(user_id) VALUES (NEW.user_id);
+			END
+		""",
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_inv_multipliers_update AFTER UPDATE OF quantity ON user_inventories
+			WHEN (OLD.quantity > 0) <> (NEW.quantity > 0)
+				AND EXISTS (SELECT 1 FROM income_modifiers WHERE source_kind = 'item' AND source = NEW.name)
+			BEGIN
+				INSERT INTO refresh_user_multipliers(user_id) VALUES (NEW.user_id);
+			END
+		""",
+		"""
+			CREATE TRIGGER IF NOT EXISTS trg_inv_multipliers_delete AFTER DELETE ON user_inventories
+			WHEN OLD.quantity > 0
+				AND EXISTS (SELECT 1 FROM income_modifiers WHERE source_kind = 'item' AND source = OLD.name)
+			BEGIN
+				INSERT INTO refresh_user_multipliers(user_id) VALUES (OLD.user_id);
+			END
+		""",
+		# ==> Until now the cache skipped modifiers past their end time. Start from the new rule: every unpruned modifier.
+		"INSERT INTO refresh_user_multipliers(user_id) SELECT user_id FROM users",
+	)),
+]
+
+LATEST_VERSION:int = MIGRATIONS[-1].version
+
+""" [RUNNER] """
+# [get_schema_version]
+# ==> Reads the version stamped into the database file. Fresh (or pre-migration) databases read 0.
+async def get_schema_version(db:aiosqlite.Connection) -> int:
+	async with db.execute("PRAGMA user_version") as c:
+		row = await c.fetchone()
+	return row[0] if row else 0
+
+# [migrate]
+# ==> Applies every pending migration in one transaction, then stamps the new version. Returns the version we end at.
+# ==> If any statement fails, we roll back everything, including the version stamp.
+async def migrate(db:aiosqlite.Connection) -> int:
+	current = await get_schema_version(db)
+	if current >= LATEST_VERSION:
+		LogUtil.print_debug(f"Schema is current <v{current}>")
+		return current
+
+	await db.execute("BEGIN IMMEDIATE") # ==> Take the write lock first, then re-read in case someone else migrated.
+	try:
+		current = await get_schema_version(db)
+		pending = [m for m in MIGRATIONS if m.version > current]
+		for migration in pending:
+			LogUtil.print_log(f"Applying migration v{migration.version}: {migration.description}")
+			for statement in migration.statements:
+				await db.execute(statement)
+		if pending:
+			# ==> PRAGMA doesn't accept ? params. The version is always our own int, never user input.
+			await db.execute(f"PRAGMA user_version = {int(pending[-1].version)}")
+		await db.commit()
+	except Exception:
+		await db.rollback()
+		raise
+
+	LogUtil.print_log(f"Schema migrated <v{current}> -> <v{LATEST_VERSION}>")
+	return LATEST_VERSION
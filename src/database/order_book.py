@@ -0,0 +1,329 @@
+"""
+INFORMATION
+
+	This is our player order book: limit orders to buy and sell item_market items at a player-chosen price.
+	Each item has its own book, kept in memory as two heaps with price-time priority:
+		==> Asks (sells): cheapest first, then oldest first.
+		==> Bids (buys): highest first, then oldest first.
+	Order ids only ever grow, so they double as the "time" in price-time priority.
+
+	Placing an order matches it against the book in memory first, then writes everything in ONE unit of work:
+	the escrow, every fill, every counterparty's coins and items, and the order itself if part of it rests.
+	The heaps only change once that unit has committed, so a failed order leaves the book exactly as it was.
+	Orders on the same item are matched one at a time (a lock per item); different items never wait on each other.
+
+	Resting orders hold escrow, so nothing can be sold or spent twice:
+		==> A buy order holds price * remaining coins, taken from the buyer's balance when it's placed.
+		==> A sell order holds its remaining items, taken from the seller's inventory when it's placed.
+	Fills trade at the resting order's price. A buyer who matched below their limit gets the difference back.
+	Escrowed items keep their expiry clock (see ledger.py): a sell order stores it, and hands it on to whoever gets them.
+
+	Only open orders are stored (open_orders). A filled or cancelled order is deleted; market_fills is the ledger.
+	After a restart, each item's book is rebuilt on first use from one indexed range read, then heapified.
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, asyncio, heapq, sqlite3, typing, weakref
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from .history import record_user_point, trades_for
+from .ledger import CREDIT_BALANCE_SQL, CREDIT_ITEMS_SQL, DEBIT_BALANCE_SQL, TAKE_ITEMS_SQL
+from .profile_cache import profiles_for
+from .unit_of_work import run_read, run_unit
+
+""" [SETUP] """
+SIDES = ("buy", "sell")
+
+@dataclass(slots=True)
+class Order:
+	order_id:int
+	user_id:int
+	side:str
+	price:int
+	remaining:int
+
+class OrderResult(typing.NamedTuple):
+	order_id:int|None		# ==> None if the order filled completely and never rested
+	filled:int				# ==> Quantity matched right away
+	remaining:int			# ==> Quantity left resting on the book
+	value:int				# ==> Coins that changed hands for the filled quantity
+
+class BookLevel(typing.NamedTuple):
+	price:int
+	quantity:int
+	orders:int
+
+# ==> A resting order we matched against is gone or smaller in the database than in memory (e.g. its owner left
+#	and ON DELETE CASCADE removed it). The book is reloaded and the order retried once, then the player is told to try again.
+class StaleBook(Exception):
+	pass
+
+""" [BOOK] """
+# ==> Heap entries are (sort key, order_id). A cancelled or filled order is dropped from `orders` right away,
+#	and its heap entry is discarded lazily, the next time it reaches the top.
+class OrderBook:
+	def __init__(self, item:str, orders:typing.Iterable[Order] = ()) -> None:
+		self.item:str = item
+		self.orders:dict[int, Order] = {}
+		self.bids:list[tuple[int, int]] = []	# ==> (-price, order_id)
+		self.asks:list[tuple[int, int]] = []	# ==> (price, order_id)
+		for order in orders:
+			self.orders[order.order_id] = order
+			(self.bids if order.side == "buy" else self.asks).append(self._entry(order))
+		heapq.heapify(self.bids)
+		heapq.heapify(self.asks)
+
+	@staticmethod
+	def _entry(order:Order) -> tuple[int, int]:
+		return (-order.price if order.side == "buy" else order.price, order.order_id)
+
+	def add(self, order:Order) -> None:
+		self.orders[order.order_id] = order
+		heapq.heappush(self.bids if order.side == "buy" else self.asks, self._entry(order))
+
+	# [take]
+	# ==> Pops every resting order an incoming order would trade with, best first, until `quantity` is covered.
+	# ==> Returns (fills, popped): fills are (order, quantity) pairs, and popped is every live entry we took off the heaps
+	#	(including the player's own orders, which we skip rather than trade with). Call settle() or restore() afterwards!
+	def take(self, side:str, price:int, quantity:int, user_id:int) -> tuple[list[tuple[Order, int]], list[tuple[int, int]]]:
+		heap = self.asks if side == "buy" else self.bids
+		fills, popped = [], []
+		while quantity > 0 and heap:
+			order = self.orders.get(heap[0][1])
+			if order is None:
+				heapq.heappop(heap) # ==> Filled or cancelled earlier.
+				continue
+			if (order.price > price) if side == "buy" else (order.price < price):
+				break
+			popped.append(heapq.heappop(heap))
+			if order.user_id == user_id:
+				continue
+			take = min(quantity, order.remaining)
+			fills.append((order, take))
+			quantity -= take
+		return fills, popped
+
+	# [settle]
+	# ==> Applies committed fills, and puts back every popped order that still has something left.
+	def settle(self, fills:list[tuple[Order, int]], popped:list[tuple[int, int]]) -> None:
+		for order, quantity in fills:
+			order.remaining -= quantity
+			if order.remaining == 0:
+				del self.orders[order.order_id]
+		self.restore(popped)
+
+	# [restore]
+	# ==> Puts popped entries back unchanged, e.g. after the unit of work failed.
+	def restore(self, popped:list[tuple[int, int]]) -> None:
+		for entry in popped:
+			if entry[1] in self.orders:
+				heapq.heappush(self.bids if entry[0] < 0 else self.asks, entry)
+
+	def discard(self, order_id:int) -> None:
+		self.orders.pop(order_id, None)
+
+	# [depth]
+	# ==> The best `levels` prices on one side, with the quantity and number of orders resting at each.
+	def depth(self, side:str, levels:int) -> list[BookLevel]:
+		heap = self.bids if side == "buy" else self.asks
+		totals:dict[int, list[int]] = {}
+		for _, order_id in sorted(heap):
+			order = self.orders.get(order_id)
+			if order is None:
+				continue
+			if order.price not in totals:
+				if len(totals) == levels:
+					break
+				totals[order.price] = [0, 0]
+			totals[order.price][0] += order.remaining
+			totals[order.price][1] += 1
+		return [BookLevel(price, quantity, count) for price, (quantity, count) in totals.items()]
+
+""" [MATCHING SQL] """
+LOAD_BOOK_SQL = "SELECT order_id, user_id, side, price, remaining FROM open_orders WHERE item = ?"
+# ==> remaining = ? makes sure the database agrees with the book we matched against. Both return the escrow's clock.
+FILL_ORDER_SQL = "DELETE FROM open_orders WHERE order_id = ? AND remaining = ? RETURNING expires_at"
+PARTIAL_FILL_SQL = "UPDATE open_orders SET remaining = remaining - ? WHERE order_id = ? AND remaining = ? RETURNING expires_at"
+RECORD_FILL_SQL = "INSERT INTO market_fills(item, price, quantity, buyer_id, seller_id, taker_side, filled_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+REST_ORDER_SQL = "INSERT INTO open_orders(item, user_id, side, price, remaining, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+CANCEL_ORDER_SQL = "DELETE FROM open_orders WHERE order_id = ? AND user_id = ? RETURNING item, side, price, remaining, expires_at"
+ORDER_LOOKUP_SQL = "SELECT item FROM open_orders WHERE order_id = ? AND user_id = ?"
+
+# ==> Runs inside a unit of work. Returns {user_id: (balance, research)} for everyone whose balance changed, and the new order's id.
+def _place_work(
+		conn:sqlite3.Connection,
+		item:str,
+		user_id:int,
+		side:str,
+		price:int,
+		quantity:int,
+		fills:list[tuple[Order, int]],
+		record_points:set[int],
+		now:str
+	) -> tuple[dict[int, tuple[int, int]], int|None]:
+	stats:dict[int, tuple[int, int]] = {}
+	clock = None # ==> The escrowed items' expiry clock, if we're selling.
+
+	# ==> Escrow first. Like /player transact, the check and the debit are one conditional UPDATE.
+	if side == "buy":
+		row = conn.execute(DEBIT_BALANCE_SQL, (price * quantity, user_id, price * quantity)).fetchone()
+		if not row:
+			raise ValueError(f"Not enough balance! This order holds {price * quantity:,} :coin: until it fills.")
+		stats[user_id] = row
+	else:
+		row = conn.execute(TAKE_ITEMS_SQL, (quantity, user_id, item, quantity)).fetchone()
+		if not row:
+			raise ValueError(f"Not enough {item}! Do you have {quantity}?")
+		clock = row[0]
+
+	coins:defaultdict[int, int] = defaultdict(int)		# ==> user_id -> coins credited
+	credits = []										# ==> (user_id, item, quantity, clock) for CREDIT_ITEMS_SQL
+	ledger = []
+	for order, take in fills:
+		if order.remaining == take:
+			row = conn.execute(FILL_ORDER_SQL, (order.order_id, take)).fetchone()
+		else:
+			row = conn.execute(PARTIAL_FILL_SQL, (take, order.order_id, order.remaining)).fetchone()
+		if not row:
+			raise StaleBook(item)
+		value = order.price * take
+		if side == "buy":
+			buyer, seller = user_id, order.user_id
+			coins[user_id] += (price - order.price) * take # ==> Refund the part of our escrow we didn't need.
+			credits.append((buyer, item, take, row[0])) # ==> The resting sell order's clock.
+		else:
+			buyer, seller = order.user_id, user_id
+			credits.append((buyer, item, take, clock))
+		coins[seller] += value
+		ledger.append((item, order.price, take, buyer, seller, side, now))
+
+	for uid, amount in coins.items():
+		if amount:
+			row = conn.execute(CREDIT_BALANCE_SQL, (amount, uid)).fetchone()
+			if row:
+				stats[uid] = row
+	conn.executemany(CREDIT_ITEMS_SQL, credits)
+	conn.executemany(RECORD_FILL_SQL, ledger)
+
+	order_id = None
+	left = quantity - sum(take for _, take in fills)
+	if left:
+		order_id = conn.execute(REST_ORDER_SQL, (item, user_id, side, price, left, now, clock)).lastrowid
+	for uid in record_points & stats.keys():
+		record_user_point(conn, uid, "trade", now)
+	return stats, order_id
+
+# ==> Runs inside a unit of work. Deletes the order and hands its escrow back. Returns the refunded owner's stats, if any.
+def _cancel_work(conn:sqlite3.Connection, user_id:int, order_id:int) -> tuple[str, tuple[int, int]|None]:
+	row = conn.execute(CANCEL_ORDER_SQL, (order_id, user_id)).fetchone()
+	if not row:
+		raise ValueError(f"You have no open order #{order_id}.")
+	item, side, price, remaining, clock = row
+	if side == "buy":
+		return item, conn.execute(CREDIT_BALANCE_SQL, (price * remaining, user_id)).fetchone()
+	conn.execute(CREDIT_ITEMS_SQL, (user_id, item, remaining, clock))
+	return item, None
+
+def _load_work(conn:sqlite3.Connection, item:str) -> list[Order]:
+	c = conn.execute(LOAD_BOOK_SQL, (item,))
+	return [Order(*row) for row in c]
+
+""" [EXCHANGE] """
+# ==> Every item's book for one connection. Books load lazily, so a restart costs nothing until an item is traded.
+class Exchange:
+	def __init__(self, db:aiosqlite.Connection) -> None:
+		self.db:aiosqlite.Connection = db
+		self._books:dict[str, OrderBook] = {}
+		self._locks:defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+	async def _book(self, item:str) -> OrderBook:
+		book = self._books.get(item)
+		if book is None:
+			book = self._books[item] = OrderBook(item, await run_read(self.db, _load_work, item))
+		return book
+
+	# [forget]
+	# ==> Drops an item's book from memory, so it's reloaded on next use. For when the database changed behind our back.
+	def forget(self, item:str|None = None) -> None:
+		if item is None:
+			self._books.clear()
+		else:
+			self._books.pop(item, None)
+
+	# [place]
+	# ==> Places a limit order. Whatever crosses the book trades immediately; the rest rests on the book.
+	async def place(self, user_id:int, item:str, side:str, price:int, quantity:int) -> OrderResult:
+		if side not in SIDES:
+			raise ValueError(f"Unknown side {side!r}.")
+		if price <= 0 or quantity <= 0:
+			raise ValueError("Price and quantity must be positive.")
+
+		async with self._locks[item]:
+			for attempt in range(2):
+				book = await self._book(item)
+				fills, popped = book.take(side, price, quantity, user_id)
+				touched = {user_id, *(order.user_id for order, _ in fills)}
+				record_points = {uid for uid in touched if trades_for(self.db).tick(uid)}
+				now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+				try:
+					stats, order_id = await run_unit(self.db, _place_work, item, user_id, side, price, quantity, fills, record_points, now)
+				except StaleBook as e:
+					self.forget(item)
+					# ==> Twice in a row means the book is moving under us. Tell the player rather than fail raw.
+					if attempt:
+						raise ValueError("The order book changed, try again") from e
+					continue
+				except BaseException:
+					book.restore(popped)
+					raise
+				break
+
+			book.settle(fills, popped)
+			filled = sum(take for _, take in fills)
+			if order_id is not None:
+				book.add(Order(order_id, user_id, side, price, quantity - filled))
+
+		cache = profiles_for(self.db)
+		for uid, (balance, research) in stats.items():
+			cache.set_stats(uid, balance, research)
+		return OrderResult(order_id, filled, quantity - filled, sum(order.price * take for order, take in fills))
+
+	# [cancel]
+	# ==> Cancels one of the player's open orders and refunds its escrow. Returns the item it was for.
+	async def cancel(self, user_id:int, order_id:int) -> str:
+		def find(conn:sqlite3.Connection) -> tuple[str]|None:
+			return conn.execute(ORDER_LOOKUP_SQL, (order_id, user_id)).fetchone()
+		row = await run_read(self.db, find)
+		if not row:
+			raise ValueError(f"You have no open order #{order_id}.")
+		async with self._locks[row[0]]:
+			item, stats = await run_unit(self.db, _cancel_work, user_id, order_id)
+			book = self._books.get(item)
+			if book is not None:
+				book.discard(order_id)
+		if stats:
+			profiles_for(self.db).set_stats(user_id, *stats)
+		return item
+
+	# [depth]
+	# ==> (bids, asks), best prices first.
+	# ==> A book nobody has ordered on isn't kept (nor is a lock made for it), so looking up any string can't grow memory.
+	async def depth(self, item:str, levels:int = 5) -> tuple[list[BookLevel], list[BookLevel]]:
+		if item not in self._books and item not in self._locks:
+			orders = await run_read(self.db, _load_work, item)
+			if not orders:
+				return [], []
+		async with self._locks[item]:
+			book = await self._book(item)
+			return book.depth("buy", levels), book.depth("sell", levels)
+
+""" [PER-CONNECTION REGISTRY] """
+_exchanges:"weakref.WeakKeyDictionary[aiosqlite.Connection, Exchange]" = weakref.WeakKeyDictionary()
+
+def exchange_for(db:aiosqlite.Connection) -> Exchange:
+	exchange = _exchanges.get(db)
+	if exchange is None:
+		exchange = _exchanges[db] = Exchange(db)
+	return exchange
@@ -0,0 +1,122 @@
+"""
+INFORMATION
+
+	This is our player profile cache. A profile is everything our commands keep re-reading about one player:
+	their balance, research, owned tech and owned economies.
+	Profiles are read through (filled on first access by data_handler.get_profile), kept in a bounded LRU,
+	and updated in place by every data_handler mutation and by the scheduler's payout, so they never go stale.
+	Size it with PROFILE_CACHE_SIZE in .env (default 1024 players).
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, os, weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+""" [SETUP] """
+PROFILE_CACHE_SIZE:int = int(os.getenv("PROFILE_CACHE_SIZE") or 1024)
+
+@dataclass(slots=True)
+class PlayerProfile:
+	user_id:int
+	balance:int
+	research:int
+	tech:dict[str, int|None] = field(default_factory=dict)		# ==> tech name -> tech_income
+	economies:dict[str, int|None] = field(default_factory=dict)	# ==> economy name -> economy_income
+
+	def has_tech(self, name:str) -> bool:
+		return name in self.tech
+
+class ProfileCache:
+	def __init__(self, max_size:int = PROFILE_CACHE_SIZE) -> None:
+		self.max_size:int = max_size
+		# ==> Bumped by every mutation. A fill that started before a mutation won't be stored (it may be stale).
+		self.epoch:int = 0
+		self._profiles:OrderedDict[int, PlayerProfile] = OrderedDict()
+
+	def __len__(self) -> int:
+		return len(self._profiles)
+
+	""" [LOOKUP BLOCK] """
+	def get(self, user_id:int) -> PlayerProfile|None:
+		profile = self._profiles.get(user_id)
+		if profile is not None:
+			self._profiles.move_to_end(user_id) # ==> Most recently used lives at the end.
+		return profile
+
+	# [put]
+	# ==> Stores a freshly read profile, unless something was written since the read began (epoch changed).
+	def put(self, profile:PlayerProfile, read_epoch:int) -> None:
+		if read_epoch != self.epoch:
+			return
+		self._profiles[profile.user_id] = profile
+		self._profiles.move_to_end(profile.user_id)
+		while len(self._profiles) > self.max_size:
+			self._profiles.popitem(last=False) # ==> Evict the least recently used.
+
+	def cached_ids(self) -> list[int]:
+		return list(self._profiles)
+
+	""" [MUTATION BLOCK] """
+	# ==> All of these take exact values (never deltas), so applying one twice is harmless.
+	def set_stats(self, user_id:int, balance:int, research:int) -> None:
+		self.epoch += 1
+		profile = self._profiles.get(user_id)
+		if profile is not None:
+			profile.balance = balance
+			profile.research = research
+
+	def set_tech(self, user_id:int, name:str, tech_income:int|None) -> None:
+		self.epoch += 1
+		profile = self._profiles.get(user_id)
+		if profile is not None:
+			profile.tech[name] = tech_income
+
+	def remove_tech(self, user_id:int, name:str) -> None:
+		self.epoch += 1
+		profile = self._profiles.get(user_id)
+		if profile is not None:
+			profile.tech.pop(name, None)
+
+	def set_economy(self, user_id:int, name:str, economy_income:int|None) -> None:
+		self.epoch += 1
+		profile = self._profiles.get(user_id)
+		if profile is not None:
+			profile.economies[name] = economy_income
+
+	def remove_economy(self, user_id:int, name:str) -> None:
+		self.epoch += 1
+		profile = self._profiles.get(user_id)
+		if profile is not None:
+			profile.economies.pop(name, None)
+
+	# ==> A market edit changed every owner's copy at once.
+	def reprice_tech(self, name:str, tech_income:int|None) -> None:
+		self.epoch += 1
+		for profile in self._profiles.values():
+			if name in profile.tech:
+				profile.tech[name] = tech_income
+
+	def reprice_economy(self, name:str, economy_income:int|None) -> None:
+		self.epoch += 1
+		for profile in self._profiles.values():
+			if name in profile.economies:
+				profile.economies[name] = economy_income
+
+	def evict(self, user_id:int) -> None:
+		self.epoch += 1
+		self._profiles.pop(user_id, None)
+
+	def clear(self) -> None:
+		self.epoch += 1
+		self._profiles.clear()
+
+""" [PER-CONNECTION REGISTRY] """
+_caches:"weakref.WeakKeyDictionary[aiosqlite.Connection, ProfileCache]" = weakref.WeakKeyDictionary()
+
+def profiles_for(db:aiosqlite.Connection) -> ProfileCache:
+	cache = _caches.get(db)
+	if cache is None:
+		cache = _caches[db] = ProfileCache()
+	return cache
@@ -0,0 +1,202 @@
+"""
+INFORMATION
+
+	This is our query-plan regression check. It builds the current schema in memory (from migrations.py),
+	runs EXPLAIN QUERY PLAN on every query our cogs and scheduler issue, and fails if SQLite would
+	scan a whole table, sort in a temp B-tree, or build an automatic index to answer it.
+	Run it from src/ after touching a query or a migration:
+		python -m database.query_plans
+	If you add a query, give it a module-level constant (or SQL builder) where it's used, and list that in PLANNED_QUERIES!
+
+"""
+
+""" [IMPORTS] """
+import re, sqlite3, sys, typing
+from . import data_handler as dh
+from .auctions import BID_CHECK_SQL, CLOSE_AUCTIONS_SQL, CREATE_AUCTION_SQL, DEADLINES_SQL, DELIVER_ITEMS_SQL, PAY_SELLERS_SQL, TOP_BID_SQL
+from .history import ADVANCE_HISTORY_HEADS_SQL, ADVANCE_USER_HEAD_SQL, HISTORY_RANGE_SQL, RECORD_ECONOMY_SQL, RECORD_HISTORY_SQL, RECORD_USER_HISTORY_SQL, SNAPSHOT_SEEK_SQL
+from .ledger import CREDIT_BALANCE_SQL, CREDIT_ITEMS_SQL, CREDIT_RESEARCH_SQL, DEBIT_BALANCE_SQL, DEBIT_ITEMS_SQL, TAKE_ITEMS_SQL
+from .migrations import MIGRATIONS
+from .order_book import CANCEL_ORDER_SQL, FILL_ORDER_SQL, LOAD_BOOK_SQL, ORDER_LOOKUP_SQL, PARTIAL_FILL_SQL, RECORD_FILL_SQL, REST_ORDER_SQL
+from .recipes import ADD_RECIPE_INPUT_SQL, RECIPE_GRAPH_INPUTS_SQL, RECIPE_GRAPH_SQL, RESET_RECIPE_INPUTS_SQL, UPSERT_RECIPE_SQL, craft_check_sql, items_exist_sql
+
+class PlannedQuery(typing.NamedTuple):
+	label:str
+	sql:str
+	params:tuple|dict = ()
+	full_scan_ok:bool = False # ==> Only for queries that must visit every row by design, e.g. the payout.
+
+""" [QUERIES] """
+# ==> Listings that read a whole table are fine as long as they walk an index in order (SCAN ... USING INDEX).
+# ==> Every query here is the statement (or SQL builder) the code itself runs, imported from where it lives.
+#	The only literals are the "cascade" lookups, which stand in for the ones SQLite runs itself for ON DELETE CASCADE.
+PLANNED_QUERIES:list[PlannedQuery] = [
+	# get_table_asc, as called by /market
+	PlannedQuery("economy_market listing", dh.table_asc_sql("economy_market", "economy_income")),
+	PlannedQuery("item_market listing", dh.table_asc_sql("item_market", "cost")),
+	PlannedQuery("tech_market listing", dh.table_asc_sql("tech_market", "cost")),
+	# get_user_table_asc, as called by /player and the buy/research checks
+	PlannedQuery("user_economy listing", dh.user_table_asc_sql("user_economy", "economy_income"), (1,)),
+	PlannedQuery("user_inventories listing", dh.user_table_asc_sql("user_inventories", "quantity"), (1,)),
+	PlannedQuery("user_tech listing", dh.user_table_asc_sql("user_tech", "tech_income"), (1,)),
+	# get_table_row / get_inventory_item
+	PlannedQuery("users row", dh.table_row_sql("users", "user_id"), (1,)),
+	PlannedQuery("item_market row", dh.table_row_sql("item_market", "name"), ("x",)),
+	PlannedQuery("tech_market row", dh.table_row_sql("tech_market", "name"), ("x",)),
+	PlannedQuery("inventory row", dh.INVENTORY_ROW_SQL, (1, "x")),
+	# get_profile / refresh_profiles
+	PlannedQuery("profile stats", dh.PROFILE_STATS_SQL, (1,)),
+	PlannedQuery("profile tech", dh.PROFILE_TECH_SQL, (1,)),
+	PlannedQuery("profile economies", dh.PROFILE_ECONOMIES_SQL, (1,)),
+	PlannedQuery("profile refresh", dh.profile_refresh_sql(2), (1, 2)),
+	# get_history / trade history points
+	PlannedQuery("history snapshot seek", SNAPSHOT_SEEK_SQL, (1, "x")),
+	PlannedQuery("history range", HISTORY_RANGE_SQL, (1, 1, "x")),
+	PlannedQuery("trade history point", RECORD_USER_HISTORY_SQL, {"now": "x", "reason": "trade", "every": 32, "user_id": 1}),
+	PlannedQuery("trade history head", ADVANCE_USER_HEAD_SQL, {"now": "x", "reason": "trade", "every": 32, "user_id": 1}),
+	# get_economy_history / get_income_distribution, as called by /admin economy_chart
+	PlannedQuery("economy history range", dh.ECONOMY_HISTORY_SQL, ("x",)),
+	PlannedQuery("income distribution", dh.INCOME_DISTRIBUTION_SQL, full_scan_ok=True),
+	# /admin economy_report
+	PlannedQuery("economy report users stream", dh.USER_STATS_STREAM_SQL, full_scan_ok=True),
+	PlannedQuery("economy totals", dh.ECONOMY_TOTALS_SQL, full_scan_ok=True),
+	# /admin simulate_payouts and python -m utility_libs.forecast
+	PlannedQuery("forecast inputs", dh.forecast_inputs_sql(0, 0), (1.0, 1.0), full_scan_ok=True),
+	PlannedQuery("forecast inputs with overrides", dh.forecast_inputs_sql(1, 1), ("x", 1, 1.0, "y", 1, 1.0), full_scan_ok=True),
+	# OBJ-TO family checks & writes
+	PlannedQuery("user exists", dh.USER_EXISTS_SQL, (1,)),
+	PlannedQuery("item exists", dh.name_exists_sql("item_market"), ("x",)),
+	PlannedQuery("economy_market row", dh.table_row_sql("economy_market", "name"), ("x",)),
+	PlannedQuery("inventory stack update", dh.ADD_TO_STACK_SQL, (1, 1, "x")),
+	# edit family
+	PlannedQuery("economy catalog edit", dh.edit_catalog_sql("economy_market", ["economy_income"]), (1, "x")),
+	PlannedQuery("economy owners edit", dh.propagate_income_sql("user_economy", "economy_income"), (1, "x", 1)),
+	PlannedQuery("economy owners edit chunk", dh.propagate_income_chunk_sql("user_economy", "economy_income"), (1, "x", 1, 500)),
+	PlannedQuery("tech owners edit", dh.propagate_income_sql("user_tech", "tech_income"), (1, "x", 1)),
+	PlannedQuery("tech owners edit chunk", dh.propagate_income_chunk_sql("user_tech", "tech_income"), (1, "x", 1, 500)),
+	# user family
+	PlannedQuery("balance update", CREDIT_BALANCE_SQL, (1, 1)),
+	PlannedQuery("research update", CREDIT_RESEARCH_SQL, (1, 1)),
+	PlannedQuery("remove user", dh.REMOVE_USER_SQL, (1,)),
+	PlannedQuery("remove user object", dh.remove_user_object_sql("user_inventories", "name"), ("x", 1)),
+	PlannedQuery("remove market object", dh.remove_object_sql("item_market", "name"), ("x",)),
+	# transfer family (ledger.py)
+	PlannedQuery("balance transfer debit", DEBIT_BALANCE_SQL, (1, 1, 1)),
+	PlannedQuery("crafting item debit", DEBIT_ITEMS_SQL, (1, 1, "x", 1)),
+	PlannedQuery("item transfer take", TAKE_ITEMS_SQL, (1, 1, "x", 1)),
+	PlannedQuery("item transfer credit", CREDIT_ITEMS_SQL, (1, "x", 1, None)),
+	# order book (order_book.py & the order book family)
+	PlannedQuery("order book rebuild", LOAD_BOOK_SQL, ("x",)),
+	PlannedQuery("order fill", FILL_ORDER_SQL, (1, 1)),
+	PlannedQuery("order partial fill", PARTIAL_FILL_SQL, (1, 1, 2)),
+	PlannedQuery("order fill ledger", RECORD_FILL_SQL, ("x", 1, 1, 1, 2, "buy", "x")),
+	PlannedQuery("order rest", REST_ORDER_SQL, ("x", 1, "buy", 1, 1, "x", None)),
+	PlannedQuery("order cancel", CANCEL_ORDER_SQL, (1, 1)),
+	PlannedQuery("order lookup", ORDER_LOOKUP_SQL, (1, 1)),
+	PlannedQuery("player open orders", dh.PLAYER_OPEN_ORDERS_SQL, (1,)),
+	PlannedQuery("recent fills", dh.RECENT_FILLS_SQL, ("x", 10)),
+	PlannedQuery("refund buy orders", dh.REFUND_BUY_ORDERS_SQL, ("x",)),
+	PlannedQuery("remove user cascade to orders", "DELETE FROM open_orders WHERE user_id = ?", (1,)),
+	PlannedQuery("remove item cascade to orders", "DELETE FROM open_orders WHERE item = ?", ("x",)),
+	# auctions (auctions.py & the auction family)
+	PlannedQuery("auction create", CREATE_AUCTION_SQL, ("x", 1, 1, 1, "x", "y", None)),
+	PlannedQuery("auction bid check", BID_CHECK_SQL, (1, "x")),
+	PlannedQuery("auction top bid", TOP_BID_SQL, (1, 1, 1)),
+	PlannedQuery("auction settle: pay sellers", PAY_SELLERS_SQL, {"now": "x"}),
+	PlannedQuery("auction settle: deliver items", DELIVER_ITEMS_SQL, {"now": "x"}),
+	PlannedQuery("auction settle: close", CLOSE_AUCTIONS_SQL, {"now": "x"}),
+	PlannedQuery("auction deadlines", DEADLINES_SQL),
+	PlannedQuery("open auctions", dh.OPEN_AUCTIONS_SQL, (100,)),
+	PlannedQuery("refund auction bids", dh.REFUND_AUCTION_BIDS_SQL, ("x",)),
+	PlannedQuery("remove user cascade to auctions", "UPDATE auctions SET top_bidder_id = NULL WHERE top_bidder_id = ?", (1,)),
+	PlannedQuery("remove item cascade to auctions", "DELETE FROM auctions WHERE item = ?", ("x",)),
+	# recipes (recipes.py)
+	PlannedQuery("recipe graph", RECIPE_GRAPH_SQL, full_scan_ok=True),
+	PlannedQuery("recipe graph inputs", RECIPE_GRAPH_INPUTS_SQL, full_scan_ok=True),
+	PlannedQuery("craft inventory check", craft_check_sql(2), (1, "x", "y")),
+	PlannedQuery("recipe items exist", items_exist_sql(2), ("x", "y")),
+	PlannedQuery("recipe upsert", UPSERT_RECIPE_SQL, ("x", 1, None)),
+	PlannedQuery("recipe inputs reset", RESET_RECIPE_INPUTS_SQL, ("x",)),
+	PlannedQuery("recipe input add", ADD_RECIPE_INPUT_SQL, ("x", "y", 1)),
+	PlannedQuery("drop recipes using item", dh.DROP_RECIPES_USING_SQL, ("x",)),
+	PlannedQuery("remove item cascade to recipe inputs", "DELETE FROM recipe_inputs WHERE input = ?", ("x",)),
+	# expiry family
+	PlannedQuery("expire stacks", dh.EXPIRE_STACKS_SQL, ("x", 500)),
+	PlannedQuery("due decays", dh.DUE_DECAYS_SQL, ("x", 500)),
+	PlannedQuery("decay stacks", dh.decay_stacks_sql(2), ("x", 1, 2)),
+	PlannedQuery("start expiry", dh.START_EXPIRY_SQL, ("x", 60)),
+	# modifier family
+	PlannedQuery("modifier prune", dh.PRUNE_MODIFIERS_SQL, ("x",), full_scan_ok=True),
+	PlannedQuery("modifier remove", dh.REMOVE_MODIFIER_SQL, (1,)),
+	PlannedQuery("modifiers by source remove", dh.REMOVE_SOURCE_MODIFIERS_SQL, ("tech", "x")),
+	PlannedQuery("modifiers listing", dh.LIVE_MODIFIERS_SQL),
+	PlannedQuery("remove user cascade to multipliers", "DELETE FROM user_multipliers WHERE user_id = ?", (1,)),
+	# write-behind family
+	PlannedQuery("username refresh", dh.REFRESH_USERNAME_SQL, ("x", 1)),
+	PlannedQuery("last seen", dh.LAST_SEEN_SQL, ("x", 1)),
+	# announcement family
+	PlannedQuery("outbox pending", dh.PENDING_ANNOUNCEMENTS_SQL, (1, 100)),
+	PlannedQuery("outbox delete", dh.DELETE_ANNOUNCEMENT_SQL, (1,)),
+	# scheduler
+	PlannedQuery("schedule claim", dh.CLAIM_RUN_SQL, ("2000-01-01",)),
+	PlannedQuery("schedule status", dh.RUN_STATUS_SQL, ("2000-01-01",)),
+	PlannedQuery("schedule complete", dh.COMPLETE_RUN_SQL, ("2000-01-01",)),
+	PlannedQuery("schedule failed", dh.FAIL_RUN_SQL, ("x", "2000-01-01")),
+	PlannedQuery("backfill start", dh.LAST_COMPLETE_RUN_SQL),
+	PlannedQuery("payout global modifiers", dh.GLOBAL_MODIFIERS_SQL),
+	PlannedQuery("payout multipliers clear", dh.CLEAR_MULTIPLIERS_SQL, full_scan_ok=True),
+	PlannedQuery("payout multipliers refresh", dh.REFRESH_MULTIPLIERS_SQL),
+	PlannedQuery("payout", dh.PAYOUT_SQL, full_scan_ok=True),
+	PlannedQuery("payout history points", RECORD_HISTORY_SQL, {"now": "x", "reason": "payout", "every": 32}, full_scan_ok=True),
+	PlannedQuery("payout history heads", ADVANCE_HISTORY_HEADS_SQL, {"now": "x", "reason": "payout", "every": 32}, full_scan_ok=True),
+	PlannedQuery("payout economy snapshot", RECORD_ECONOMY_SQL, {"now": "x"}, full_scan_ok=True),
+]
+
+""" [CHECKS] """
+BARE_SCAN = re.compile(r"^SCAN \w+$") # ==> "SCAN users" with no index behind it.
+
+# [build_schema]
+# ==> A fresh in-memory database at our latest schema version.
+def build_schema() -> sqlite3.Connection:
+	conn = sqlite3.connect(":memory:")
+	for migration in MIGRATIONS:
+		for statement in migration.statements:
+			conn.execute(statement)
+	return conn
+
+# [explain]
+# ==> Returns the plan's detail lines, e.g. ["SEARCH users USING INTEGER PRIMARY KEY (rowid=?)"].
+def explain(conn:sqlite3.Connection, query:PlannedQuery) -> list[str]:
+	return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query.sql}", query.params)]
+
+# [find_violations]
+# ==> Returns one message per bad plan line. An empty list means every query is indexed.
+def find_violations(conn:sqlite3.Connection, queries:list[PlannedQuery] = PLANNED_QUERIES) -> list[str]:
+	violations = []
+	for query in queries:
+		for detail in explain(conn, query):
+			if "USE TEMP B-TREE" in detail or "AUTOMATIC" in detail:
+				violations.append(f"{query.label}: {detail}")
+			elif BARE_SCAN.match(detail) and not query.full_scan_ok:
+				violations.append(f"{query.label}: {detail}")
+	return violations
+
+def main() -> int:
+	conn = build_schema()
+	violations = find_violations(conn)
+	for query in PLANNED_QUERIES:
+		print(f"[{'FAIL' if any(v.startswith(f'{query.label}:') for v in violations) else ' OK '}] {query.label}")
+		for detail in explain(conn, query):
+			print(f"		{detail}")
+	conn.close()
+
+	if violations:
+		print(f"\n{len(violations)} query plan regression(s):")
+		for v in violations:
+			print(f"	{v}")
+		return 1
+	print(f"\nAll {len(PLANNED_QUERIES)} query plans are indexed.")
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+INFORMATION
+
+	This is our crafting system. A recipe turns input items into `output_quantity` of its output item (see recipes and
+	recipe_inputs in migrations.py). An input can itself have a recipe, so recipes form a graph.
+
+	We never search that graph while crafting. Whenever recipes change, the whole graph is compiled once, in topological
+	order, into flat data per recipe:
+		==> direct		The recipe's own inputs. Used when the player already holds the intermediates.
+		==> chain		Every intermediate below the recipe, consumers first, with its own inputs.
+		==> from_scratch	Only base items (items no recipe makes), with every intermediate crafted on the way, for one craft.
+							Intermediates are crafted in whole batches, so any extra they make comes back as `extras`.
+	Crafting from scratch is one pass down the chain for the whole request, so each intermediate's batches are rounded up
+	once per call, not once per craft. Then it's one inventory read compared against the result, one batched debit and
+	one batched credit, in a single unit of work, however deep the recipe is.
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, sqlite3, typing, weakref
+from collections import defaultdict
+from .ledger import CREDIT_ITEMS_SQL, DEBIT_ITEMS_SQL
+from .unit_of_work import run_read, run_unit
+
+""" [SETUP] """
+class RecipeSpec(typing.NamedTuple):
+	name:str					# ==> The output item
+	output_quantity:int
+	req_tech:str|None
+	inputs:dict[str, int]
+
+# ==> One intermediate on a recipe's chain: crafted in batches of output_quantity, each taking `inputs`.
+class ChainStep(typing.NamedTuple):
+	item:str
+	output_quantity:int
+	inputs:dict[str, int]
+
+class CompiledRecipe(typing.NamedTuple):
+	name:str
+	output_quantity:int
+	direct:dict[str, int]			# ==> Consumed per craft, using held intermediates
+	chain:tuple[ChainStep, ...]		# ==> Intermediates a from-scratch craft makes on the way, consumers first
+	from_scratch:dict[str, int]		# ==> Base items one craft consumes, crafting every intermediate
+	extras:dict[str, int]			# ==> Leftover intermediates one from-scratch craft also produces
+	direct_techs:frozenset[str]		# ==> Tech needed for a direct craft
+	techs:frozenset[str]			# ==> Tech needed for a from-scratch craft (every recipe on the way)
+	steps:int						# ==> Recipes crafted on the way, including this one
+
+class CraftResult(typing.NamedTuple):
+	consumed:dict[str, int]
+	produced:dict[str, int]
+
+""" [COMPILER] """
+# [topological_order]
+# ==> Every recipe after all the recipes that use its output (consumers first). Raises on a cycle.
+def topological_order(recipes:dict[str, RecipeSpec]) -> list[str]:
+	users = {name: 0 for name in recipes} # ==> How many recipes use each recipe's output
+	for recipe in recipes.values():
+		for item in recipe.inputs:
+			if item in users:
+				users[item] += 1
+	ready = [name for name, count in users.items() if count == 0]
+	order = []
+	while ready:
+		name = ready.pop()
+		order.append(name)
+		for item in recipes[name].inputs:
+			if item in users:
+				users[item] -= 1
+				if users[item] == 0:
+					ready.append(item)
+	if len(order) != len(recipes):
+		stuck = sorted(name for name, count in users.items() if count > 0)
+		raise ValueError(f"Recipes can't depend on themselves: {', '.join(stuck)}")
+	return order
+
+# [expand]
+# ==> Runs `times` crafts of a recipe down its chain. Returns (base items consumed, extras produced, recipes crafted).
+# ==> The chain is consumers first, so an intermediate's total need (from every branch and every craft) is known
+#	before we decide how many batches of it to make.
+def expand(direct:dict[str, int], chain:typing.Iterable[ChainStep], times:int) -> tuple[dict[str, int], dict[str, int], int]:
+	need:defaultdict[str, int] = defaultdict(int, {item: quantity * times for item, quantity in direct.items()})
+	extras:dict[str, int] = {}
+	steps = times
+	for step in chain:
+		batches = -(-need[step.item] // step.output_quantity) # ==> Ceiling division
+		if batches * step.output_quantity > need[step.item]:
+			extras[step.item] = batches * step.output_quantity - need[step.item]
+		del need[step.item]
+		steps += batches
+		for input_item, quantity in step.inputs.items():
+			need[input_item] += quantity * batches
+	return dict(need), extras, steps
+
+# [compile_recipes]
+# ==> One flat CompiledRecipe per recipe, with its chain in consumers-first order (see expand).
+def compile_recipes(recipes:dict[str, RecipeSpec]) -> dict[str, CompiledRecipe]:
+	order = topological_order(recipes)
+	position = {name: i for i, name in enumerate(order)}
+	compiled = {}
+	for name, recipe in recipes.items():
+		# ==> Every intermediate below this recipe.
+		below:set[str] = set()
+		pending = [item for item in recipe.inputs if item in recipes]
+		while pending:
+			item = pending.pop()
+			if item not in below:
+				below.add(item)
+				pending += [input_item for input_item in recipes[item].inputs if input_item in recipes]
+		chain = tuple(
+			ChainStep(item, recipes[item].output_quantity, dict(recipes[item].inputs))
+			for item in sorted(below, key=position.__getitem__)
+		)
+		from_scratch, extras, steps = expand(recipe.inputs, chain, 1)
+		compiled[name] = CompiledRecipe(
+			name=name,
+			output_quantity=recipe.output_quantity,
+			direct=dict(recipe.inputs),
+			chain=chain,
+			from_scratch=from_scratch,
+			extras=extras,
+			direct_techs=frozenset({recipe.req_tech} if recipe.req_tech else ()),
+			techs=frozenset(recipes[item].req_tech for item in {name, *below} if recipes[item].req_tech),
+			steps=steps
+		)
+	return compiled
+
+""" [RECIPE SQL] """
+RECIPE_GRAPH_SQL = "SELECT name, output_quantity, req_tech FROM recipes"
+RECIPE_GRAPH_INPUTS_SQL = "SELECT recipe, input, quantity FROM recipe_inputs"
+UPSERT_RECIPE_SQL = """
+	INSERT INTO recipes(name, output_quantity, req_tech) VALUES (?, ?, ?)
+	ON CONFLICT(name) DO UPDATE SET output_quantity = excluded.output_quantity, req_tech = excluded.req_tech
+"""
+RESET_RECIPE_INPUTS_SQL = "DELETE FROM recipe_inputs WHERE recipe = ?"
+ADD_RECIPE_INPUT_SQL = "INSERT INTO recipe_inputs(recipe, input, quantity) VALUES (?, ?, ?)"
+
+# [craft_check_sql]
+# ==> A player's stacks of `items` item names. Params: (user_id, *names).
+def craft_check_sql(items:int) -> str:
+	return f"SELECT name, quantity FROM user_inventories WHERE user_id = ? AND name IN ({', '.join('?' * items)})"
+
+# [items_exist_sql]
+# ==> Which of `items` item names are in the item market.
+def items_exist_sql(items:int) -> str:
+	return f"SELECT name FROM item_market WHERE name IN ({', '.join('?' * items)})"
+
+""" [UNITS OF WORK] """
+def _load_work(conn:sqlite3.Connection) -> dict[str, RecipeSpec]:
+	inputs:defaultdict[str, dict[str, int]] = defaultdict(dict)
+	for recipe, item, quantity in conn.execute(RECIPE_GRAPH_INPUTS_SQL):
+		inputs[recipe][item] = quantity
+	return {
+		name: RecipeSpec(name, output_quantity, req_tech, inputs[name])
+		for name, output_quantity, req_tech in conn.execute(RECIPE_GRAPH_SQL)
+	}
+
+def _craft_work(conn:sqlite3.Connection, user_id:int, consumed:dict[str, int], produced:dict[str, int]) -> None:
+	# ==> One read of everything we need, compared in one pass.
+	names = list(consumed)
+	held = dict(conn.execute(craft_check_sql(len(names)), (user_id, *names)).fetchall())
+	missing = [f"{quantity - held.get(name, 0):,} {name}" for name, quantity in consumed.items() if held.get(name, 0) < quantity]
+	if missing:
+		raise ValueError(f"Missing {', '.join(missing)}!")
+	# ==> The quantity >= ? guard stays, so even a stale read can't take a stack below zero.
+	c = conn.executemany(DEBIT_ITEMS_SQL, [(quantity, user_id, name, quantity) for name, quantity in consumed.items()])
+	if c.rowcount != len(consumed):
+		raise ValueError("Inventory changed while crafting. Try again!")
+	conn.executemany(CREDIT_ITEMS_SQL, [(user_id, name, quantity, None) for name, quantity in produced.items()]) # ==> Fresh, so new clocks.
+
+# ==> Loads, compiles and writes in one transaction, so a recipe added meanwhile can't sneak a cycle past us.
+def _set_work(conn:sqlite3.Connection, recipe:RecipeSpec) -> dict[str, CompiledRecipe]:
+	names = [recipe.name, *recipe.inputs]
+	known = {row[0] for row in conn.execute(items_exist_sql(len(names)), names)}
+	unknown = [name for name in names if name not in known]
+	if unknown:
+		raise ValueError(f"Not in the item market: {', '.join(unknown)}")
+	recipes = _load_work(conn)
+	recipes[recipe.name] = recipe
+	compiled = compile_recipes(recipes) # ==> Raises on a cycle, before anything is written.
+	conn.execute(UPSERT_RECIPE_SQL, (recipe.name, recipe.output_quantity, recipe.req_tech))
+	conn.execute(RESET_RECIPE_INPUTS_SQL, (recipe.name,))
+	conn.executemany(ADD_RECIPE_INPUT_SQL, [(recipe.name, item, quantity) for item, quantity in recipe.inputs.items()])
+	return compiled
+
+""" [RECIPE BOOK] """
+# ==> The compiled recipes for one connection. Compiled on first use, and again after any change.
+class RecipeBook:
+	def __init__(self, db:aiosqlite.Connection) -> None:
+		self.db:aiosqlite.Connection = db
+		self._compiled:dict[str, CompiledRecipe]|None = None
+
+	def invalidate(self) -> None:
+		self._compiled = None
+
+	async def compiled(self) -> dict[str, CompiledRecipe]:
+		if self._compiled is None:
+			self._compiled = compile_recipes(await run_read(self.db, _load_work))
+		return self._compiled
+
+	async def get(self, name:str) -> CompiledRecipe|None:
+		return (await self.compiled()).get(name)
+
+	# [set_recipe]
+	# ==> Adds or replaces a recipe. The new graph is compiled before anything is written, so a cycle is refused up front.
+	# ==> The compile happens inside the write's unit of work (see _set_work), and we keep the graph it compiled.
+	async def set_recipe(self, name:str, inputs:dict[str, int], *, output_quantity:int = 1, req_tech:str|None = None) -> CompiledRecipe:
+		if not inputs:
+			raise ValueError("A recipe needs at least one input.")
+		if output_quantity <= 0 or any(quantity <= 0 for quantity in inputs.values()):
+			raise ValueError("Quantities must be positive.")
+		if name in inputs:
+			raise ValueError("A recipe can't use its own output.")
+		recipe = RecipeSpec(name, output_quantity, req_tech, dict(inputs))
+		compiled = await run_unit(self.db, _set_work, recipe)
+		self._compiled = compiled
+		return compiled[name]
+
+	# [craft]
+	# ==> Crafts `times` batches of a recipe for a player, all or nothing.
+	async def craft(self, user_id:int, name:str, *, times:int = 1, from_scratch:bool = True) -> CraftResult:
+		if times <= 0:
+			raise ValueError("You can't craft nothing!")
+		recipe = await self.get(name)
+		if recipe is None:
+			raise ValueError(f"No recipe makes {name}.")
+		if from_scratch:
+			consumed, produced, _ = expand(recipe.direct, recipe.chain, times) # ==> Batches rounded up once, for all `times`.
+		else:
+			consumed, produced = {item: quantity * times for item, quantity in recipe.direct.items()}, {}
+		produced[name] = produced.get(name, 0) + recipe.output_quantity * times
+		await run_unit(self.db, _craft_work, user_id, consumed, produced)
+		return CraftResult(consumed, produced)
+
+""" [PER-CONNECTION REGISTRY] """
+_books:"weakref.WeakKeyDictionary[aiosqlite.Connection, RecipeBook]" = weakref.WeakKeyDictionary()
+
+def recipes_for(db:aiosqlite.Connection) -> RecipeBook:
+	book = _books.get(db)
+	if book is None:
+		book = _books[db] = RecipeBook(db)
+	return book
@@ -0,0 +1,197 @@
+"""
+INFORMATION
+
+	These are our typed row objects. Each whitelisted table gets one NamedTuple whose fields match its columns, in order.
+	NamedTuples are plain tuples underneath, so a row costs far less memory than a dict and is built in one call.
+	Read fields by attribute, e.g. row.balance, not row['balance'].
+	If a migration adds a column, add the field here too (in the same position as the column list we SELECT)!
+
+"""
+
+""" [IMPORTS] """
+import typing
+from array import array
+
+""" [ROW TYPES] """
+# users
+class User(typing.NamedTuple):
+	user_id:int
+	username:str|None
+	balance:int
+	research:int
+	last_seen:str|None
+
+# item_market
+class Item(typing.NamedTuple):
+	name:str
+	description:str|None
+	cost:int
+	req_tech:str|None
+	lifetime_minutes:int|None	# ==> How long each unit lasts. None never expires
+
+# tech_market
+class Tech(typing.NamedTuple):
+	name:str
+	description:str|None
+	tech_income:int|None
+	cost:int
+	req_tech:str|None
+
+# economy_market
+class Economy(typing.NamedTuple):
+	name:str
+	economy_income:int|None
+
+# user_inventories
+class InventoryEntry(typing.NamedTuple):
+	user_id:int
+	name:str
+	quantity:int
+	expires_at:str|None		# ==> When the stack's current unit runs out (UTC)
+
+# user_economy
+class OwnedEconomy(typing.NamedTuple):
+	user_id:int
+	name:str
+	economy_income:int|None
+
+# user_tech
+class OwnedTech(typing.NamedTuple):
+	user_id:int
+	name:str
+	tech_income:int|None
+
+# schedule
+class ScheduleRun(typing.NamedTuple):
+	run_date:str
+	status:str
+	started_at:str
+	finished_at:str|None
+	error_msg:str|None
+
+# announcement_outbox
+class OutboxMessage(typing.NamedTuple):
+	message_id:int
+	channel_id:int
+	created_at:str
+	content:str
+
+# open_orders
+class OpenOrder(typing.NamedTuple):
+	order_id:int
+	item:str
+	user_id:int
+	side:str
+	price:int
+	remaining:int
+	created_at:str
+
+# market_fills
+class MarketFill(typing.NamedTuple):
+	fill_id:int
+	item:str
+	price:int
+	quantity:int
+	buyer_id:int
+	seller_id:int
+	taker_side:str
+	filled_at:str
+
+# auctions
+class Auction(typing.NamedTuple):
+	auction_id:int
+	item:str
+	quantity:int
+	seller_id:int
+	min_bid:int
+	top_bid:int|None
+	top_bidder_id:int|None
+	status:str
+	created_at:str
+	closes_at:str
+
+# recipes
+class Recipe(typing.NamedTuple):
+	name:str
+	output_quantity:int
+	req_tech:str|None
+
+# recipe_inputs
+class RecipeInput(typing.NamedTuple):
+	recipe:str
+	input:str
+	quantity:int
+
+# income_modifiers
+class IncomeModifier(typing.NamedTuple):
+	modifier_id:int
+	source_kind:str			# ==> 'tech', 'item' or 'global'
+	source:str|None
+	target:str				# ==> 'economy' or 'research'
+	kind:str				# ==> 'percent' or 'multiplier'
+	value:float
+	ends_at:str|None
+
+# user_multipliers
+class UserMultiplier(typing.NamedTuple):
+	user_id:int
+	economy_bonus:float
+	economy_factor:float
+	research_bonus:float
+	research_factor:float
+
+# ==> Not a table: one row of server-wide sums (see data_handler.get_economy_totals).
+class EconomyTotals(typing.NamedTuple):
+	income_per_payout:int
+	research_per_payout:int
+	inventory_value:int
+	items_held:int
+
+# ==> Not a table: column arrays, one slot per user, in the same order (see data_handler.get_forecast_inputs).
+class ForecastInputs(typing.NamedTuple):
+	balances:array
+	research:array
+	economy_income:array	# ==> Balance paid per payout
+	tech_income:array		# ==> Research paid per payout
+
+# ==> Any one of the above tables' rows. Used for annotations on our generic get family.
+Row = typing.Union[User, Item, Tech, Economy, InventoryEntry, OwnedEconomy, OwnedTech, ScheduleRun, OutboxMessage, OpenOrder, MarketFill, Auction, Recipe, RecipeInput, IncomeModifier, UserMultiplier]
+
+""" [ROW FACTORY] """
+# ==> Table name -> row type. Also serves as our whitelist of readable tables.
+ROW_TYPES:dict[str, type[Row]] = {
+	"users":			User,
+	"item_market":		Item,
+	"tech_market":		Tech,
+	"economy_market":	Economy,
+	"user_inventories":	InventoryEntry,
+	"user_economy":		OwnedEconomy,
+	"user_tech":		OwnedTech,
+	"schedule":			ScheduleRun,
+	"announcement_outbox":	OutboxMessage,
+	"open_orders":		OpenOrder,
+	"market_fills":		MarketFill,
+	"auctions":			Auction,
+	"recipes":			Recipe,
+	"recipe_inputs":	RecipeInput,
+	"income_modifiers":	IncomeModifier,
+	"user_multipliers":	UserMultiplier,
+}
+
+# ==> Precomputed "col, col, col" lists so we SELECT columns in exactly the order our fields expect.
+SELECT_COLUMNS:dict[str, str] = {table: ", ".join(row_type._fields) for table, row_type in ROW_TYPES.items()}
+
+# [row_type]
+# ==> Returns the row type for a table, or raises if the table isn't whitelisted.
+def row_type(table:str) -> type[Row]:
+	try:
+		return ROW_TYPES[table]
+	except KeyError:
+		raise ValueError("Disallowed table...") from None
+
+# [check_column]
+# ==> Column names can't be ? params, so we only allow the ones our row type knows about.
+def check_column(table:str, col:str) -> str:
+	if col not in row_type(table)._fields:
+		raise ValueError(f"Disallowed column {col!r} for {table}...")
+	return col
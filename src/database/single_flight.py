@@ -0,0 +1,79 @@
+"""
+INFORMATION
+
+	This is our single-flight layer for the get family. When many players run the same read at the same moment
+	(e.g. /market item_market right as an event goes live), only the first caller actually queries the database.
+	Everyone else asking for the same (query, params) awaits that one in-flight read and shares its result.
+
+	Results are never older than the last write: every unit of work bumps the connection's generation, and
+	callers that arrive after a write start a fresh read instead of joining one that began before it.
+	Optionally, results can be kept for a short TTL (READ_COALESCE_TTL seconds in .env, default 0 = off).
+	Shared results are shared objects. Treat them as read-only!
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, asyncio, os, time, typing, weakref
+
+T = typing.TypeVar("T")
+
+""" [SETUP] """
+READ_COALESCE_TTL:float = float(os.getenv("READ_COALESCE_TTL") or 0)
+
+class SingleFlight:
+	def __init__(self, ttl:float = READ_COALESCE_TTL) -> None:
+		self.ttl:float = ttl
+		self.generation:int = 0
+		self._inflight:dict[typing.Hashable, asyncio.Task] = {}
+		self._cache:dict[typing.Hashable, tuple[float, typing.Any]] = {} # ==> key -> (expires_at, result)
+
+	# [do]
+	# ==> Returns fetch()'s result, sharing one call among everyone asking for key at the same time (and generation).
+	async def do(self, key:typing.Hashable, fetch:typing.Callable[[], typing.Awaitable[T]]) -> T:
+		key = (self.generation, key)
+
+		if self.ttl > 0:
+			cached = self._cache.get(key)
+			if cached and cached[0] > time.monotonic():
+				return cached[1]
+
+		task = self._inflight.get(key)
+		if task is None:
+			task = asyncio.ensure_future(fetch())
+			self._inflight[key] = task
+			task.add_done_callback(lambda t, key=key: self._settle(key, t))
+		# ==> shield() so one caller being cancelled (e.g. an interaction timing out) doesn't cancel everyone's read.
+		return await asyncio.shield(task)
+
+	# [invalidate]
+	# ==> Called after every write. Later callers won't join reads or reuse results from before it.
+	def invalidate(self) -> None:
+		self.generation += 1
+		self._cache.clear()
+
+	def _settle(self, key:typing.Hashable, task:asyncio.Task) -> None:
+		self._inflight.pop(key, None)
+		if self.ttl > 0 and key[0] == self.generation and not task.cancelled() and task.exception() is None:
+			self._cache[key] = (time.monotonic() + self.ttl, task.result())
+
+""" [PER-CONNECTION REGISTRY] """
+# ==> One SingleFlight per open connection. Weak so a closed, dropped connection takes its flights with it.
+_flights:"weakref.WeakKeyDictionary[aiosqlite.Connection, SingleFlight]" = weakref.WeakKeyDictionary()
+
+def flight_for(db:aiosqlite.Connection) -> SingleFlight:
+	flight = _flights.get(db)
+	if flight is None:
+		flight = _flights[db] = SingleFlight()
+	return flight
+
+# [coalesce]
+# ==> The get family wraps its read in this. key must identify the query and its params.
+async def coalesce(db:aiosqlite.Connection, key:typing.Hashable, fetch:typing.Callable[[], typing.Awaitable[T]]) -> T:
+	return await flight_for(db).do(key, fetch)
+
+# [invalidate_reads]
+# ==> Call after any write that doesn't go through run_unit (e.g. the scheduler's payout).
+def invalidate_reads(db:aiosqlite.Connection) -> None:
+	flight = _flights.get(db)
+	if flight is not None:
+		flight.invalidate()
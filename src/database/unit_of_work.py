@@ -0,0 +1,65 @@
+"""
+INFORMATION
+
+	This is our unit-of-work runner. Every "await db.execute(...)" is its own trip to aiosqlite's worker thread.
+	Instead, we hand the worker thread one plain (synchronous) function that runs a whole sequence of statements
+	on the underlying sqlite3 connection, and await its result once.
+
+	Work functions receive the sqlite3.Connection as their first argument. They must not await or touch the event loop!
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, sqlite3, typing
+from .single_flight import invalidate_reads
+
+T = typing.TypeVar("T")
+Work = typing.Callable[..., T]
+
+""" [RUNNERS] """
+# [run_unit]
+# ==> Runs work(conn, *args, **kwargs) on the connection thread as one transaction. Commits on success, rolls back on error.
+# ==> Coalesced reads from before this write are dropped (see single_flight.py).
+async def run_unit(db:aiosqlite.Connection, work:Work[T], *args, **kwargs) -> T:
+	try:
+		return await on_connection_thread(db, _in_transaction, work, args, kwargs)
+	finally:
+		invalidate_reads(db)
+
+# [run_read]
+# ==> Runs a read-only work(conn, *args, **kwargs) on the connection thread. No transaction handling.
+async def run_read(db:aiosqlite.Connection, work:Work[T], *args, **kwargs) -> T:
+	return await on_connection_thread(db, work, *args, **kwargs)
+
+""" [TRANSACTION HANDLING] """
+def _in_transaction(conn:sqlite3.Connection, work:Work[T], args:tuple, kwargs:dict) -> T:
+	# ==> Every write is a whole unit, so nobody should be holding a transaction open across awaits.
+	#	If someone is, committing here would commit their half-finished work for them. Refuse instead.
+	if conn.in_transaction:
+		raise RuntimeError("A transaction is already open on this connection. Run the whole write as one unit of work.")
+	try:
+		result = work(conn, *args, **kwargs)
+		conn.commit()
+	except BaseException:
+		conn.rollback()
+		raise
+	return result
+
+""" [AIOSQLITE INTERNALS] """
+# ==> aiosqlite has no public way to run our own function on its connection thread, so we use its private
+#	Connection._execute (queue a call on the thread) and Connection._conn (the sqlite3.Connection).
+#	This is the only place allowed to touch them. Checked once at import, so an aiosqlite upgrade that renames them
+#	fails loudly at startup instead of on the first write.
+if not (callable(getattr(aiosqlite.Connection, "_execute", None)) and isinstance(getattr(aiosqlite.Connection, "_conn", None), property)):
+	raise ImportError(f"aiosqlite {getattr(aiosqlite, '__version__', '?')} no longer has Connection._execute/_conn. See database/unit_of_work.py.")
+
+# [on_connection_thread]
+# ==> Runs fn(conn, *args, **kwargs) on the connection thread and returns its result.
+async def on_connection_thread(db:aiosqlite.Connection, fn:Work[T], *args, **kwargs) -> T:
+	return await db._execute(fn, db._conn, *args, **kwargs)
+
+# [wrap_connection_thread]
+# ==> Replaces how this connection queues calls onto its thread. wrap(queue) gets the original queue function
+#	(queue(fn, *args, **kwargs)) and returns the new one. Used by utility_libs/load_test.py to time queue waits.
+def wrap_connection_thread(db:aiosqlite.Connection, wrap:typing.Callable[[typing.Callable[..., typing.Awaitable]], typing.Callable[..., typing.Awaitable]]) -> None:
+	db._execute = wrap(db._execute)
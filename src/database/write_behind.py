@@ -0,0 +1,130 @@
+"""
+INFORMATION
+
+	This is our write-behind queue. Some writes don't need to hold up an interaction's response:
+	username refreshes, audit entries, last-seen timestamps and command statistics.
+	Those get queued here instead, and are flushed in one batched transaction every WRITE_BEHIND_INTERVAL seconds,
+	or sooner once WRITE_BEHIND_MAX_PENDING writes are waiting. The bot flushes whatever is left when it closes.
+
+	Three kinds of write:
+		set()		==> Latest wins. A newer set() with the same key replaces the pending one (e.g. last_seen).
+		increment()	==> Amounts with the same key are summed into one write (e.g. command counters).
+		append()	==> Never coalesced (e.g. audit entries).
+
+	Anything a player would notice missing (balances, items...) must NOT go through here.
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, asyncio, contextlib, itertools, os, sqlite3, typing, weakref
+from utility_libs.utilities import LoggingUtilities
+from .unit_of_work import run_unit
+
+""" [SETUP] """
+LogUtil = LoggingUtilities(True,True)
+WRITE_BEHIND_INTERVAL:float = float(os.getenv("WRITE_BEHIND_INTERVAL") or 5)
+WRITE_BEHIND_MAX_PENDING:int = int(os.getenv("WRITE_BEHIND_MAX_PENDING") or 500)
+
+class PendingWrite(typing.NamedTuple):
+	sql:str
+	params:tuple
+
+class WriteBehindQueue:
+	def __init__(
+			self,
+			db:aiosqlite.Connection,
+			*,
+			flush_interval:float = WRITE_BEHIND_INTERVAL,
+			max_pending:int = WRITE_BEHIND_MAX_PENDING
+		) -> None:
+		self.db:aiosqlite.Connection = db
+		self.flush_interval:float = flush_interval
+		self.max_pending:int = max_pending
+		self._pending:dict[typing.Hashable, PendingWrite] = {}
+		self._counters:dict[typing.Hashable, tuple[str, tuple, int]] = {} # ==> key -> (sql, params, summed amount)
+		self._appends:list[PendingWrite] = []
+		self._wake = asyncio.Event()
+		self._task:typing.Optional[asyncio.Task] = None
+		self._flush_lock = asyncio.Lock()
+
+	def __len__(self) -> int:
+		return len(self._pending) + len(self._counters) + len(self._appends)
+
+	""" [QUEUEING BLOCK] """
+	def set(self, key:typing.Hashable, sql:str, params:tuple) -> None:
+		self._pending.pop(key, None) # ==> Re-insert so the newest write for a key also flushes last.
+		self._pending[key] = PendingWrite(sql, params)
+		self._check_full()
+
+	# ==> sql receives (*params, amount).
+	def increment(self, key:typing.Hashable, sql:str, params:tuple, amount:int = 1) -> None:
+		if key in self._counters:
+			amount += self._counters[key][2]
+		self._counters[key] = (sql, params, amount)
+		self._check_full()
+
+	def append(self, sql:str, params:tuple) -> None:
+		self._appends.append(PendingWrite(sql, params))
+		self._check_full()
+
+	def _check_full(self) -> None:
+		if len(self) >= self.max_pending:
+			self._wake.set()
+
+	""" [FLUSH BLOCK] """
+	# [flush]
+	# ==> Writes everything pending in one transaction (one thread hop). Returns how many writes went out.
+	# ==> These writes are best-effort: if the batch fails, we log it and drop it rather than block future batches.
+	async def flush(self) -> int:
+		async with self._flush_lock:
+			batch = list(self._pending.values())
+			batch += [PendingWrite(sql, (*params, amount)) for sql, params, amount in self._counters.values()]
+			batch += self._appends
+			self._pending, self._counters, self._appends = {}, {}, []
+			if not batch:
+				return 0
+
+			def work(conn:sqlite3.Connection) -> None:
+				# ==> Consecutive writes with the same SQL go out as one executemany.
+				for sql, group in itertools.groupby(batch, key=lambda w: w.sql):
+					conn.executemany(sql, [w.params for w in group])
+
+			try:
+				await run_unit(self.db, work)
+			except Exception as e:
+				LogUtil.print_log(f"[ERR]: Write-behind flush of {len(batch)} writes failed: {type(e).__name__}: {e}")
+				return 0
+			LogUtil.print_debug(f"Write-behind flushed {len(batch)} writes")
+			return len(batch)
+
+	""" [TASK LIFECYCLE BLOCK] """
+	def start(self) -> None:
+		if self._task is None:
+			self._task = asyncio.create_task(self._flush_forever())
+
+	# [stop]
+	# ==> Stops the timer and flushes whatever is still queued. Call before closing the connection!
+	async def stop(self) -> None:
+		if self._task:
+			self._task.cancel()
+			with contextlib.suppress(asyncio.CancelledError):
+				await self._task
+			self._task = None
+		await self.flush()
+
+	async def _flush_forever(self) -> None:
+		while True:
+			with contextlib.suppress(asyncio.TimeoutError):
+				# ==> Wake on the timer, or early if the queue filled up.
+				await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+			self._wake.clear()
+			await self.flush()
+
+""" [PER-CONNECTION REGISTRY] """
+_queues:"weakref.WeakKeyDictionary[aiosqlite.Connection, WriteBehindQueue]" = weakref.WeakKeyDictionary()
+
+def write_behind_for(db:aiosqlite.Connection) -> WriteBehindQueue:
+	queue = _queues.get(db)
+	if queue is None:
+		queue = _queues[db] = WriteBehindQueue(db)
+	return queue
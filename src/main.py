@@ -13,6 +13,7 @@ setup_util = utilities.SetupUtilities()
 setup_status = setup_util.HandleSetup()
 logger = logging.FileHandler(filename="Countermeasure_Main.log", encoding='utf-8', mode='w')
 CMD_PREFIX = "<<"  # PREFIX DEPRECATED... Has no use.
+FORCE_SYNC = "--force-sync" in sys.argv # ==> Sync the command tree even if it hasn't changed since the last boot.
 
 if setup_status:
 	ADMIN_ROLE = int(os.getenv("ADMIN_ROLE_ID"))
@@ -33,7 +34,8 @@ client = CountermeasureClient(
 	admin_role=ADMIN_ROLE,
 	command_prefix=CMD_PREFIX,
 	intents=intents,
-	debug_guild=DEBUG_GUILD
+	debug_guild=DEBUG_GUILD,
+	force_sync=FORCE_SYNC
 )
 
 client.run(TOKEN, log_handler=logger, log_level = logging.DEBUG)
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+INFORMATION
+
+	This is our economy analytics, used by /admin economy_report.
+	Totals that SQLite can add up itself (income per payout, inventory value at item_market.cost) are one set-based query.
+	Distributions (percentiles, Gini) need every player's value, so we stream users in chunks of REPORT_CHUNK_SIZE rows
+	into compact int64 arrays (8 bytes per value, no per-row Python objects), then sort and reduce them in a worker
+	thread with C-level builtins (sorted, sum, itertools.accumulate). The event loop only ever handles one chunk at a time,
+	and other commands' queries interleave with ours between chunks.
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, asyncio, database, itertools, typing
+from array import array
+
+""" [SETUP] """
+REPORT_CHUNK_SIZE:int = 10_000
+PERCENTILES:tuple[int, ...] = (10, 50, 90, 99)
+
+class Distribution(typing.NamedTuple):
+	total:int
+	mean:float
+	gini:float					# ==> 0 = everyone equal, 1 = one player holds everything
+	percentiles:dict[int, int]	# ==> e.g. {50: median}
+	top_share:float				# ==> Share of the total held by the top 1% of players
+
+class EconomyReport(typing.NamedTuple):
+	players:int
+	balance:Distribution
+	research:Distribution
+	income:Distribution			# ==> Per-player economy income per payout
+	income_per_payout:int
+	research_per_payout:int
+	inventory_value:int			# ==> Every held item, valued at its current item_market cost
+	items_held:int
+
+""" [REPORT] """
+# [build_report]
+async def build_report(db:aiosqlite.Connection, *, chunk_size:int = REPORT_CHUNK_SIZE) -> EconomyReport:
+	balances, research = array("q"), array("q")
+	async for chunk in database.stream_user_stats(db, chunk_size=chunk_size):
+		chunk_balances, chunk_research = zip(*chunk) # ==> Rows -> columns, in C.
+		balances.extend(chunk_balances)
+		research.extend(chunk_research)
+	incomes = array("q", await database.get_income_distribution(db))
+	totals = await database.get_economy_totals(db)
+
+	balance_dist, research_dist, income_dist = await asyncio.gather(
+		asyncio.to_thread(distribution, balances),
+		asyncio.to_thread(distribution, research),
+		asyncio.to_thread(distribution, incomes)
+	)
+	return EconomyReport(
+		players=len(balances),
+		balance=balance_dist,
+		research=research_dist,
+		income=income_dist,
+		income_per_payout=totals.income_per_payout,
+		research_per_payout=totals.research_per_payout,
+		inventory_value=totals.inventory_value,
+		items_held=totals.items_held
+	)
+
+""" [MATH] """
+# [distribution]
+# ==> Runs in a worker thread. values may be in any order.
+def distribution(values:typing.Sequence[int]) -> Distribution:
+	n = len(values)
+	if not n:
+		return Distribution(0, 0.0, 0.0, {p: 0 for p in PERCENTILES}, 0.0)
+	ordered = sorted(values)
+	total = sum(ordered)
+	return Distribution(
+		total=total,
+		mean=total / n,
+		gini=gini(ordered, total),
+		percentiles={p: ordered[min(n-1, p * n // 100)] for p in PERCENTILES},
+		top_share=(sum(ordered[n - max(1, n // 100):]) / total) if total > 0 else 0.0
+	)
+
+# [gini]
+# ==> ordered must be ascending. Uses G = (n + 1 - 2 * sum(cumulative) / total) / n, so it's one pass of accumulate.
+# ==> Negative balances make the coefficient meaningless, so those are treated as 0.
+def gini(ordered:typing.Sequence[int], total:int) -> float:
+	n = len(ordered)
+	if ordered and ordered[0] < 0:
+		ordered = [max(0, v) for v in ordered]
+		total = sum(ordered)
+	if n == 0 or total <= 0:
+		return 0.0
+	return (n + 1 - 2 * sum(itertools.accumulate(ordered)) / total) / n
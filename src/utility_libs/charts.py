@@ -0,0 +1,115 @@
+"""
+INFORMATION
+
+	This is our chart renderer, used by /player chart and /admin economy_chart.
+	Rasterizing a PNG takes long enough to stall the event loop (and with it, discord.py's gateway heartbeat), so
+	rendering happens in a small pool of worker processes (CHART_WORKERS in .env, default 2).
+	The loop only ships plain lists of numbers to a worker and gets PNG bytes back.
+	Finished charts are cached by what they were drawn from (e.g. the newest history point), so asking again before
+	the data changes costs nothing, and identical requests that arrive together share one render.
+
+	Charts need matplotlib (pip install matplotlib). Without it, is_available() is False and the commands say so.
+	Workers are forked once, at startup, before the database and watchdog threads exist. Call start_pool() first thing!
+
+"""
+
+""" [IMPORTS] """
+import asyncio, importlib.util, io, os, typing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from database.single_flight import SingleFlight
+
+""" [SETUP] """
+CHART_WORKERS:int = int(os.getenv("CHART_WORKERS") or 2)
+CHART_CACHE_SIZE:int = 64
+
+_pool:ProcessPoolExecutor|None = None
+_charts:OrderedDict[typing.Hashable, bytes] = OrderedDict() # ==> data version -> PNG, least recently used first
+_renders = SingleFlight(ttl=0)
+
+def is_available() -> bool:
+	return importlib.util.find_spec("matplotlib") is not None
+
+""" [POOL LIFECYCLE BLOCK] """
+# [start_pool]
+# ==> Forks every worker now (the fork start method spawns the whole pool on first submit) and warms up matplotlib.
+def start_pool() -> None:
+	global _pool
+	if _pool is None and is_available():
+		_pool = ProcessPoolExecutor(max_workers=CHART_WORKERS)
+		_pool.submit(_warm_up)
+
+def stop_pool() -> None:
+	global _pool
+	if _pool is not None:
+		_pool.shutdown(wait=False, cancel_futures=True)
+		_pool = None
+
+""" [RENDERING BLOCK] """
+# [render]
+# ==> Returns PNG bytes for render_fn(*args), from the cache if version was rendered before.
+# ==> version must change whenever args would: include the data's newest point, the range, etc.
+async def render(version:typing.Hashable, render_fn:typing.Callable[..., bytes], *args) -> bytes:
+	if _pool is None:
+		raise RuntimeError("Charts are unavailable. Install matplotlib and restart the bot.")
+	png = _charts.get(version)
+	if png is not None:
+		_charts.move_to_end(version)
+		return png
+
+	async def fetch() -> bytes:
+		return await asyncio.get_running_loop().run_in_executor(_pool, render_fn, *args)
+
+	png = await _renders.do(version, fetch)
+	_charts[version] = png
+	_charts.move_to_end(version)
+	while len(_charts) > CHART_CACHE_SIZE:
+		_charts.popitem(last=False)
+	return png
+
+""" [WORKER PROCESS] """
+# ==> Everything below runs in a worker process. Arguments and results must be picklable, so plain lists only.
+def _warm_up() -> None:
+	_pyplot()
+
+def _pyplot():
+	import matplotlib
+	matplotlib.use("Agg") # ==> No display in a worker.
+	import matplotlib.pyplot as plt
+	return plt
+
+def _to_png(fig) -> bytes:
+	plt = _pyplot()
+	buffer = io.BytesIO()
+	fig.tight_layout()
+	fig.savefig(buffer, format="png", dpi=110)
+	plt.close(fig)
+	return buffer.getvalue()
+
+# [render_series]
+# ==> Line chart: one or more named series over the same UTC timestamps ("YYYY-MM-DD HH:MM:SS").
+def render_series(title:str, timestamps:list[str], series:dict[str, list[int]]) -> bytes:
+	from datetime import datetime
+	plt = _pyplot()
+	xs = [datetime.strptime(t, "%Y-%m-%d %H:%M:%S") for t in timestamps]
+	fig, ax = plt.subplots(figsize=(8, 4))
+	for label, ys in series.items():
+		ax.plot(xs, ys, label=label, linewidth=1.6, marker="o" if len(xs) <= 30 else None, markersize=3)
+	ax.set_title(title)
+	ax.grid(alpha=0.3)
+	if len(series) > 1:
+		ax.legend()
+	fig.autofmt_xdate()
+	return _to_png(fig)
+
+# [render_distribution]
+# ==> Histogram of per-player values.
+def render_distribution(title:str, values:list[int], xlabel:str) -> bytes:
+	plt = _pyplot()
+	fig, ax = plt.subplots(figsize=(8, 4))
+	ax.hist(values, bins=min(30, max(1, len(set(values)))), color="#c9a227", edgecolor="#333333")
+	ax.set_title(title)
+	ax.set_xlabel(xlabel)
+	ax.set_ylabel("Players")
+	ax.grid(alpha=0.3, axis="y")
+	return _to_png(fig)
@@ -0,0 +1,142 @@
+"""
+INFORMATION
+
+	This is our payout forecaster. It answers "what does the economy look like after N more payouts?", optionally with
+	hypothetical market incomes, without writing anything to the database.
+	Used by /admin simulate_payouts, and offline (read-only) against a database file. Run from src/:
+		python -m utility_libs.forecast --steps 365 --economy "Small Economy=12" --tech-scale 1.5
+
+	A payout never changes anyone's income, so N payouts add exactly N times each player's per-payout income.
+	That makes the projection one multiply-add per player over int64 arrays: a year across the whole guild is a
+	single pass, not 365 simulated payouts.
+
+"""
+
+""" [IMPORTS] """
+import argparse, asyncio, operator, os, sys, time, typing
+from array import array
+from itertools import repeat
+
+""" [SETUP] """
+# ==> Like the load test, only fills in what the real .env hasn't already set, so this also runs without one.
+os.environ.setdefault("PAYOUT_STEP", "1")
+
+import aiosqlite, database
+from utility_libs.analytics import Distribution, distribution
+
+PAYOUT_STEP:int = int(os.getenv("PAYOUT_STEP"))
+MAX_FORECAST_STEPS:int = 3650
+
+class Forecast(typing.NamedTuple):
+	steps:int
+	days:int
+	players:int
+	balance_before:Distribution
+	balance_after:Distribution
+	research_before:Distribution
+	research_after:Distribution
+	seconds:float		# ==> Time spent projecting & summarizing, excluding the database read
+
+# [parse_changes]
+# ==> "Small Economy=12, Lab=3" -> {"Small Economy": 12, "Lab": 3}
+def parse_changes(text:str|None) -> dict[str, int]:
+	changes = {}
+	for part in (text or "").split(","):
+		if not part.strip():
+			continue
+		name, sep, income = part.rpartition("=")
+		if not sep or not name.strip():
+			raise ValueError(f"Expected name=income, got {part.strip()!r}")
+		changes[name.strip()] = int(income)
+	return changes
+
+""" [PROJECTION] """
+# [project]
+# ==> values + steps * per_step, elementwise, as a new int64 array.
+def project(values:array, per_step:array, steps:int) -> array:
+	return array("q", map(operator.add, values, map(operator.mul, per_step, repeat(steps))))
+
+# [simulate]
+# ==> Runs in a worker thread.
+def simulate(inputs:database.ForecastInputs, steps:int) -> Forecast:
+	started = time.perf_counter()
+	balances_after = project(inputs.balances, inputs.economy_income, steps)
+	research_after = project(inputs.research, inputs.tech_income, steps)
+	return Forecast(
+		steps=steps,
+		days=steps * PAYOUT_STEP,
+		players=len(inputs.balances),
+		balance_before=distribution(inputs.balances),
+		balance_after=distribution(balances_after),
+		research_before=distribution(inputs.research),
+		research_after=distribution(research_after),
+		seconds=time.perf_counter() - started
+	)
+
+# [forecast]
+async def forecast(
+		db:aiosqlite.Connection,
+		steps:int,
+		*,
+		economy_changes:dict[str, int]|None = None,
+		tech_changes:dict[str, int]|None = None,
+		economy_scale:float = 1.0,
+		tech_scale:float = 1.0
+	) -> Forecast:
+	steps = max(1, min(int(steps), MAX_FORECAST_STEPS))
+	inputs = await database.get_forecast_inputs(
+		db,
+		economy_changes=economy_changes,
+		tech_changes=tech_changes,
+		economy_scale=economy_scale,
+		tech_scale=tech_scale,
+		chunk_size=10_000
+	)
+	return await asyncio.to_thread(simulate, inputs, steps)
+
+""" [REPORT] """
+# [format_forecast]
+# ==> A code-block table that fits in a Discord message.
+def format_forecast(f:Forecast) -> str:
+	lines = [f"{f.players:,} players, {f.steps} payouts ({f.days} days)", ""]
+	lines.append(f"{'':<10}{'total':>16}{'median':>14}{'p90':>14}{'gini':>7}{'top 1%':>8}")
+	for label, d in (
+		("balance", f.balance_before), ("  after", f.balance_after),
+		("research", f.research_before), ("  after", f.research_after)
+	):
+		lines.append(f"{label:<10}{d.total:>16,}{d.percentiles[50]:>14,}{d.percentiles[90]:>14,}{d.gini:>7.3f}{d.top_share:>8.1%}")
+	lines.append("")
+	lines.append(f"Minted: {f.balance_after.total - f.balance_before.total:+,} balance, {f.research_after.total - f.research_before.total:+,} research")
+	return "```\n" + "\n".join(lines) + "\n```"
+
+""" [CLI] """
+async def run(args:argparse.Namespace) -> int:
+	# ==> mode=ro: the forecaster can never write to the database it reads.
+	db = await aiosqlite.connect(f"file:{args.db}?mode=ro", uri=True)
+	try:
+		result = await forecast(
+			db,
+			args.steps,
+			economy_changes=parse_changes(",".join(args.economy)),
+			tech_changes=parse_changes(",".join(args.tech)),
+			economy_scale=args.economy_scale,
+			tech_scale=args.tech_scale
+		)
+	finally:
+		await db.close()
+	print(format_forecast(result).strip("`\n"))
+	print(f"\nProjected in {result.seconds*1000:.0f} ms")
+	return 0
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description="Forecast Countermeasure's economy N payouts ahead. Never writes to the database.")
+	parser.add_argument("--db", default=database.data_handler.DB_PATH, help="Database file to read")
+	parser.add_argument("--steps", type=int, default=365 // PAYOUT_STEP, help=f"Payouts to project (each is PAYOUT_STEP={PAYOUT_STEP} days)")
+	parser.add_argument("--economy", action="append", default=[], metavar="NAME=INCOME", help="Hypothetical economy_market income (repeatable)")
+	parser.add_argument("--tech", action="append", default=[], metavar="NAME=INCOME", help="Hypothetical tech_market income (repeatable)")
+	parser.add_argument("--economy-scale", type=float, default=1.0, help="Multiply every economy income")
+	parser.add_argument("--tech-scale", type=float, default=1.0, help="Multiply every tech income")
+	return asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+INFORMATION
+
+	This is our load generator. It drives the real slash-command callbacks in cogs/market.py and cogs/player.py
+	with many concurrent virtual players, against a throwaway database, and fires the scheduler's payout mid-run.
+	Use it to prove a concurrency or database change actually helps before we deploy it.
+	Run from src/ (no .env or Discord connection needed):
+		python -m utility_libs.load_test --players 200 --rate 400 --duration 20
+
+	It reports throughput, p50/p99 latency per command, time spent queued for the database connection ("lock waits"),
+	and consistency violations: negative balances/research/quantities, and cached profiles that disagree with the database.
+
+"""
+
+""" [IMPORTS] """
+import argparse, asyncio, contextlib, os, random, shutil, sys, tempfile, time
+from collections import defaultdict
+from datetime import date
+
+# ==> The cogs and scheduler read these at import time. Only fills in what the real .env hasn't already set.
+for key, value in {
+	"DEBUG_GUILD_ID": "1", "ADMIN_ROLE_ID": "1", "ANNOUNCE_CHANNEL_ID": "1",
+	"OBJECTS_PER_PAGE": "10", "PAYOUT_STEP": "1", "SCHEDULER_RUNS_UTC": "0",
+}.items():
+	os.environ.setdefault(key, value)
+
+import database
+from database import data_handler
+from discord import app_commands
+from utility_libs.scheduler import PayoutScheduler
+import cogs.market as market_cog, cogs.player as player_cog
+
+""" [FAKE DISCORD OBJECTS] """
+# ==> Just enough of discord.py's surface for our command callbacks to run unchanged.
+class FakeRole:
+	def __init__(self, role_id:int) -> None:
+		self.id = role_id
+
+class FakeUser:
+	def __init__(self, user_id:int) -> None:
+		self.id = user_id
+		self.name = f"player_{user_id}"
+		self.roles:list[FakeRole] = []
+		self.owned:set[str] = set() # ==> Items we believe we hold, so sells and gives are mostly valid.
+
+	def __eq__(self, other) -> bool:
+		return getattr(other, "id", None) == self.id
+
+	def __hash__(self) -> int:
+		return hash(self.id)
+
+class FakeClient:
+	def __init__(self, db) -> None:
+		self.db = db
+
+class FakeResponse:
+	async def defer(self, *args, **kwargs) -> None:
+		return
+
+	async def send_message(self, *args, **kwargs) -> None:
+		return
+
+class FakeFollowup:
+	def __init__(self) -> None:
+		self.messages:list[str] = []
+
+	async def send(self, content:str|None = None, **kwargs) -> None:
+		self.messages.append(content or "")
+
+class FakeChannel:
+	async def send(self, *args, **kwargs) -> None:
+		return
+
+class FakeInteraction:
+	def __init__(self, client:FakeClient, user:FakeUser) -> None:
+		self.client = client
+		self.user = user
+		self.response = FakeResponse()
+		self.followup = FakeFollowup()
+		self.channel = FakeChannel()
+
+""" [WORKLOAD] """
+class LoadStats:
+	def __init__(self) -> None:
+		self.latencies:dict[str, list[float]] = defaultdict(list)
+		self.errors:dict[str, int] = defaultdict(int)
+		self.queue_waits:list[float] = []	# ==> Seconds each DB call waited for the connection thread
+		self.lock_errors:int = 0			# ==> "database is locked" / busy errors
+
+def percentile(values:list[float], pct:float) -> float:
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	return ordered[min(len(ordered)-1, int(round(pct/100 * (len(ordered)-1))))]
+
+# [instrument_connection]
+# ==> Wraps the connection's thread queue so we can time how long each call waits before it runs.
+def instrument_connection(db, stats:LoadStats) -> None:
+	def wrap(original):
+		async def timed_execute(fn, *args, **kwargs):
+			queued_at = time.perf_counter()
+			def timed(*a, **kw):
+				stats.queue_waits.append(time.perf_counter() - queued_at)
+				return fn(*a, **kw)
+			return await original(timed, *args, **kwargs)
+		return timed_execute
+
+	database.wrap_connection_thread(db, wrap)
+
+async def seed(db, *, players:int, items:int, starting_balance:int) -> tuple[list[str], dict[int, str]]:
+	item_names = [f"item_{i}" for i in range(items)]
+	starting_items = {uid: random.choice(item_names) for uid in range(1, players+1)}
+	def work(conn):
+		conn.executemany(
+			"INSERT INTO item_market(name, description, cost, req_tech) VALUES (?, ?, ?, NULL)",
+			[(name, f"Load test item {i}", 1 + i % 50) for i, name in enumerate(item_names)]
+		)
+		conn.execute("INSERT INTO economy_market(name, economy_income) VALUES ('load_econ', 25)")
+		conn.execute("INSERT INTO tech_market(name, description, tech_income, cost, req_tech) VALUES ('load_tech', NULL, 5, 1, NULL)")
+		conn.executemany(
+			"INSERT INTO users(user_id, username, balance, research) VALUES (?, ?, ?, 0)",
+			[(uid, f"player_{uid}", starting_balance) for uid in range(1, players+1)]
+		)
+		conn.executemany(
+			"INSERT INTO user_inventories(user_id, name, quantity) VALUES (?, ?, 5)",
+			list(starting_items.items())
+		)
+		conn.executemany("INSERT INTO user_economy(user_id, name, economy_income) VALUES (?, 'load_econ', 25)", [(uid,) for uid in range(1, players+1)])
+		conn.executemany("INSERT INTO user_tech(user_id, name, tech_income) VALUES (?, 'load_tech', 5)", [(uid,) for uid in range(1, players+1)])
+	await database.run_unit(db, work)
+	return item_names, starting_items
+
+# ==> (label, weight, coroutine factory). Weights are rough guesses at a busy game night.
+def build_actions(item_names:list[str], players:int):
+	give = app_commands.Choice(name="Give", value="give")
+	pay = app_commands.Choice(name="Pay", value="pay")
+	sides = [app_commands.Choice(name="Buy", value="buy"), app_commands.Choice(name="Sell", value="sell")]
+	def other(user:FakeUser) -> FakeUser:
+		return FakeUser(random.choice([uid for uid in (random.randint(1, players), random.randint(1, players)) if uid != user.id] or [1]))
+	def owned(user:FakeUser) -> str:
+		return random.choice(sorted(user.owned)) if user.owned else random.choice(item_names)
+	return [
+		("buy_item",		30, lambda itx: market_cog.buy_item.callback(itx, random.choice(item_names), random.randint(1, 3))),
+		("sell_item",		20, lambda itx: market_cog.sell_item.callback(itx, owned(itx.user), 1)),
+		("pay",				10, lambda itx: player_cog.transact.callback(itx, pay, other(itx.user), None, random.randint(1, 20))),
+		("transact",		10, lambda itx: player_cog.transact.callback(itx, give, other(itx.user), owned(itx.user), 1)),
+		("place_order",		10, lambda itx: market_cog.place_order.callback(itx, random.choice(sides), owned(itx.user), random.randint(1, 50), random.randint(1, 3))),
+		("view_items",		15, lambda itx: player_cog.inventory.callback(itx, itx.user)),
+		("view_statistics",	15, lambda itx: player_cog.statistics.callback(itx, itx.user)),
+		("item_market",		10, lambda itx: market_cog.items.callback(itx)),
+	]
+
+async def virtual_player(user_id:int, starting_item:str, client:FakeClient, actions, stats:LoadStats, *, per_player_rate:float, deadline:float) -> None:
+	user = FakeUser(user_id)
+	user.owned.add(starting_item)
+	labels, weights = [a[0] for a in actions], [a[1] for a in actions]
+	factories = {a[0]: a[2] for a in actions}
+	await asyncio.sleep(random.random() / per_player_rate) # ==> Stagger starts so we don't all fire at t=0.
+	while time.perf_counter() < deadline:
+		label = random.choices(labels, weights)[0]
+		itx = FakeInteraction(client, user)
+		started = time.perf_counter()
+		try:
+			await factories[label](itx)
+		except Exception as e:
+			stats.errors[label] += 1
+			if "locked" in str(e) or "busy" in str(e):
+				stats.lock_errors += 1
+		else:
+			if any(m.startswith("[ERR]") for m in itx.followup.messages):
+				stats.errors[label] += 1
+				stats.lock_errors += sum("locked" in m or "busy" in m for m in itx.followup.messages)
+		stats.latencies[label].append(time.perf_counter() - started)
+		for m in itx.followup.messages:
+			if m.startswith("Bought"):
+				user.owned.add(m.split(" of ", 1)[1].rsplit(" for ", 1)[0])
+			elif m.startswith(("No item in inventory", "Not enough")) and label != "buy_item":
+				user.owned.clear() # ==> Our guess was stale. Start over from what we buy next.
+		# ==> Poisson arrivals at our target rate.
+		await asyncio.sleep(random.expovariate(per_player_rate))
+
+async def find_violations(db) -> list[str]:
+	def work(conn):
+		found = []
+		for user_id, balance, research in conn.execute("SELECT user_id, balance, research FROM users WHERE balance < 0 OR research < 0"):
+			found.append(f"user {user_id} has balance {balance}, research {research}")
+		for user_id, name, quantity in conn.execute("SELECT user_id, name, quantity FROM user_inventories WHERE quantity < 0"):
+			found.append(f"user {user_id} has {quantity} of {name}")
+		return found, dict((uid, (bal, res)) for uid, bal, res in conn.execute("SELECT user_id, balance, research FROM users"))
+	found, actual = await database.run_read(db, work)
+	cache = database.profiles_for(db)
+	for user_id in cache.cached_ids():
+		profile = cache.get(user_id)
+		if profile and actual.get(user_id) != (profile.balance, profile.research):
+			found.append(f"cached profile for {user_id} says {(profile.balance, profile.research)}, database says {actual.get(user_id)}")
+	return found
+
+""" [RUNNER] """
+async def run(args:argparse.Namespace) -> int:
+	random.seed(args.seed)
+	tmp_dir = tempfile.mkdtemp(prefix="countermeasure_load_")
+	data_handler.DB_PATH = os.path.join(tmp_dir, "load.db")
+	stats = LoadStats()
+
+	db = await database.connect_database(database.make_backend(args.backend, db_path=data_handler.DB_PATH))
+	try:
+		await database.initialize_database(db)
+		item_names, starting_items = await seed(db, players=args.players, items=args.items, starting_balance=args.balance)
+		instrument_connection(db, stats)
+		client = FakeClient(db)
+		actions = build_actions(item_names, args.players)
+
+		async def announce(msg:str) -> None:
+			return
+		scheduler = PayoutScheduler(db, announce)
+
+		started = time.perf_counter()
+		deadline = started + args.duration
+		per_player_rate = args.rate / args.players
+
+		async def payout_midway() -> float:
+			await asyncio.sleep(args.duration / 2)
+			t = time.perf_counter()
+			await scheduler.payout_for_day(date(2000, 1, 1))
+			return time.perf_counter() - t
+
+		# ==> Our code prints a lot. Keep it out of the report.
+		with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+			payout = asyncio.create_task(payout_midway())
+			await asyncio.gather(*(
+				virtual_player(uid, starting_items[uid], client, actions, stats, per_player_rate=per_player_rate, deadline=deadline)
+				for uid in range(1, args.players+1)
+			))
+			payout_seconds = await payout
+			await database.write_behind_for(db).stop()
+		elapsed = time.perf_counter() - started
+		violations = await find_violations(db)
+	finally:
+		await database.close(db)
+		shutil.rmtree(tmp_dir, ignore_errors=True)
+
+	""" [REPORT] """
+	total = sum(len(v) for v in stats.latencies.values())
+	all_latencies = [l for v in stats.latencies.values() for l in v]
+	print(f"{args.players} players, target {args.rate}/s, {elapsed:.1f}s, {args.backend} backend")
+	print(f"Throughput: {total/elapsed:,.1f} commands/s ({total:,} commands, {sum(stats.errors.values()):,} errors)")
+	print(f"{'command':<16}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}")
+	for label, values in sorted(stats.latencies.items()):
+		print(f"{label:<16}{len(values):>8}{stats.errors[label]:>8}{percentile(values, 50)*1000:>10.2f}{percentile(values, 99)*1000:>10.2f}")
+	print(f"{'ALL':<16}{total:>8}{sum(stats.errors.values()):>8}{percentile(all_latencies, 50)*1000:>10.2f}{percentile(all_latencies, 99)*1000:>10.2f}")
+	print(f"Lock waits: {len(stats.queue_waits):,} DB calls, p50 {percentile(stats.queue_waits, 50)*1000:.2f} ms, "
+		f"p99 {percentile(stats.queue_waits, 99)*1000:.2f} ms, max {max(stats.queue_waits, default=0)*1000:.2f} ms, "
+		f"{stats.lock_errors} locked/busy errors")
+	print(f"Mid-run payout took {payout_seconds*1000:.1f} ms")
+	if violations:
+		print(f"{len(violations)} consistency violation(s):")
+		for v in violations[:20]:
+			print(f"	{v}")
+		return 1
+	print("No consistency violations.")
+	return 0
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description="Concurrent load test for Countermeasure's commands.")
+	parser.add_argument("--players", type=int, default=100, help="Concurrent virtual players")
+	parser.add_argument("--rate", type=float, default=200, help="Target commands per second, across all players")
+	parser.add_argument("--duration", type=float, default=10, help="Seconds to run")
+	parser.add_argument("--items", type=int, default=200, help="Items to seed the item market with")
+	parser.add_argument("--balance", type=int, default=1_000, help="Starting balance per player")
+	parser.add_argument("--seed", type=int, default=0, help="Random seed, for repeatable runs")
+	parser.add_argument("--backend", choices=("sqlite", "memory"), default="sqlite", help="Storage backend (see database/backends.py)")
+	return asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+	sys.exit(main())
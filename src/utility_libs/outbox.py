@@ -0,0 +1,147 @@
+"""
+INFORMATION
+
+	This is our announcement outbox. The scheduler (and anything else that announces) hands messages to it instead of
+	sending them itself, so a slow or failing REST call never holds up a payout.
+	Messages are persisted first (announcement_outbox table), so anything unsent survives a restart.
+	A background task then sends them: messages queued within ANNOUNCE_DIGEST_WINDOW seconds of each other go out as
+	one digest, the channel object is cached after the first lookup, and we pace ourselves to the channel's
+	message bucket so we don't lean on Discord's 429s. (discord.py still honours any 429 it does get.)
+	Used by cogs/scheduler_cog.py
+
+"""
+
+""" [IMPORTS] """
+import aiosqlite, asyncio, contextlib, database, discord, os, typing
+from collections import deque
+from discord.ext import commands
+from utility_libs.utilities import LoggingUtilities
+
+""" [SETUP] """
+LogUtil = LoggingUtilities(True,True)
+ANNOUNCE_DIGEST_WINDOW:float = float(os.getenv("ANNOUNCE_DIGEST_WINDOW") or 2)
+DISCORD_MESSAGE_LIMIT:int = 2000
+MAX_BACKOFF:float = 300
+
+class AnnouncementOutbox:
+	def __init__(
+			self,
+			bot:commands.Bot,
+			db:aiosqlite.Connection,
+			channel_id:int,
+			*,
+			window:float = ANNOUNCE_DIGEST_WINDOW,
+			bucket_size:int = 5,		# ==> Discord allows roughly 5 messages
+			bucket_seconds:float = 5.0	#	per 5 seconds in one channel.
+		) -> None:
+		self.bot:commands.Bot = bot
+		self.db:aiosqlite.Connection = db
+		self.channel_id:int = channel_id
+		self.window:float = window
+		self.bucket_size:int = bucket_size
+		self.bucket_seconds:float = bucket_seconds
+		self._channel:typing.Optional[discord.abc.Messageable] = None
+		self._sent:deque[float] = deque(maxlen=bucket_size) # ==> loop.time() of our latest sends
+		self._wake = asyncio.Event()
+		self._task:typing.Optional[asyncio.Task] = None
+
+	""" [QUEUEING BLOCK] """
+	# [announce]
+	# ==> Persists the message and returns. Matches the announce callable PayoutScheduler expects.
+	async def announce(self, msg:str) -> None:
+		await database.queue_announcement(self.db, self.channel_id, msg)
+		self._wake.set()
+
+	# [announce_many]
+	# ==> Persists several messages in one transaction. For callers with a batch to report, like ExpiryScheduler.
+	async def announce_many(self, msgs:list[str]) -> None:
+		if msgs:
+			await database.queue_announcements(self.db, self.channel_id, msgs)
+			self._wake.set()
+
+	""" [TASK LIFECYCLE BLOCK] """
+	def start(self) -> None:
+		if self._task is None:
+			self._wake.set() # ==> Send whatever a previous run left behind.
+			self._task = asyncio.create_task(self._send_forever())
+
+	# [stop]
+	# ==> Unsent messages stay in the table for the next start().
+	async def stop(self) -> None:
+		if self._task:
+			self._task.cancel()
+			with contextlib.suppress(asyncio.CancelledError):
+				await self._task
+			self._task = None
+
+	async def _send_forever(self) -> None:
+		await self.bot.wait_until_ready() # ==> So get_channel can answer from the gateway cache.
+		backoff = 1.0
+		while True:
+			await self._wake.wait()
+			self._wake.clear()
+			await asyncio.sleep(self.window) # ==> Let anything queued right behind this message join its digest.
+			try:
+				await self.drain()
+				backoff = 1.0
+			except Exception as e:
+				# ==> Not just Discord errors: a failed database read mustn't end the task either.
+				#	CancelledError isn't an Exception, so stop() still cancels us.
+				if isinstance(e, (discord.Forbidden, discord.NotFound)):
+					self._channel = None # ==> The channel may have been deleted or hidden from us. Look it up again.
+				LogUtil.print_log(f"[ERR]: Announcement send failed, retrying in {backoff:.0f}s: {type(e).__name__}: {e}")
+				await asyncio.sleep(backoff)
+				backoff = min(backoff * 2, MAX_BACKOFF)
+				self._wake.set()
+
+	""" [SENDING BLOCK] """
+	# [drain]
+	# ==> Sends every pending message as digests. A message is only deleted after Discord accepts its digest.
+	async def drain(self) -> int:
+		sent = 0
+		while pending := await database.pending_announcements(self.db, self.channel_id):
+			channel = await self.get_channel()
+			for digest, message_ids in build_digests(pending):
+				await self._take_slot()
+				await channel.send(digest)
+				await database.delete_announcements(self.db, message_ids)
+				sent += len(message_ids)
+		if sent:
+			LogUtil.print_debug(f"Outbox sent {sent} announcement(s) to {self.channel_id}")
+		return sent
+
+	# [get_channel]
+	# ==> One REST lookup at most, then cached.
+	async def get_channel(self) -> discord.abc.Messageable:
+		if self._channel is None:
+			self._channel = self.bot.get_channel(self.channel_id) or await self.bot.fetch_channel(self.channel_id)
+		return self._channel
+
+	# [_take_slot]
+	# ==> Sliding window over our last bucket_size sends. Waits until the oldest one leaves the window.
+	async def _take_slot(self) -> None:
+		loop = asyncio.get_running_loop()
+		if len(self._sent) == self.bucket_size:
+			wait = self._sent[0] + self.bucket_seconds - loop.time()
+			if wait > 0:
+				await asyncio.sleep(wait)
+		self._sent.append(loop.time())
+
+# [build_digests]
+# ==> Packs messages, in order, into as few Discord messages as fit. Returns (content, message_ids) pairs.
+def build_digests(messages:typing.Iterable[database.OutboxMessage], *, limit:int = DISCORD_MESSAGE_LIMIT) -> list[tuple[str, list[int]]]:
+	digests:list[tuple[str, list[int]]] = []
+	parts:list[str] = []
+	ids:list[int] = []
+	size = 0
+	for message in messages:
+		content = message.content[:limit] # ==> A single oversized message is cut rather than stuck forever.
+		if parts and size + 1 + len(content) > limit:
+			digests.append(("\n".join(parts), ids))
+			parts, ids, size = [], [], 0
+		size += len(content) + (1 if parts else 0)
+		parts.append(content)
+		ids.append(message.message_id)
+	if parts:
+		digests.append(("\n".join(parts), ids))
+	return digests
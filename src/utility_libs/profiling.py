@@ -0,0 +1,81 @@
+"""
+INFORMATION
+
+	This is our live profiler. It profiles the running bot for a few seconds without a restart.
+	We use the stdlib's cProfile on the event loop's thread, which is where every cog, data_handler call and
+	the scheduler run. (Work inside aiosqlite's thread shows up as time spent awaiting it.)
+	Used by /admin profile.
+
+"""
+
+""" [IMPORTS] """
+import asyncio, cProfile, io, pstats, tempfile, typing
+from datetime import datetime, timezone
+from pathlib import Path
+
+""" [SETUP] """
+SRC_DIR = Path(__file__).resolve().parents[1]
+MAX_PROFILE_SECONDS:int = 120
+
+class ProfileEntry(typing.NamedTuple):
+	location:str		# ==> e.g. "cogs/market.py:312(buy_item)"
+	calls:int
+	total_time:float	# ==> Seconds inside the function itself
+	cumulative_time:float	# ==> Seconds inside the function and everything it called
+
+class ProfileReport(typing.NamedTuple):
+	seconds:float
+	entries:list[ProfileEntry]	# ==> Our own code only, by cumulative time
+	stats_path:Path			# ==> Raw pstats dump. Open with pstats or snakeviz.
+
+_capture_lock = asyncio.Lock() # ==> cProfile can't nest. One capture at a time.
+
+def is_capturing() -> bool:
+	return _capture_lock.locked()
+
+# [capture_profile]
+# ==> Profiles the event loop for `seconds`, then returns our top functions and the path of the raw stats file.
+async def capture_profile(seconds:float, *, top:int = 15) -> ProfileReport:
+	seconds = max(1.0, min(float(seconds), MAX_PROFILE_SECONDS))
+	async with _capture_lock:
+		profiler = cProfile.Profile()
+		profiler.enable()
+		try:
+			await asyncio.sleep(seconds) # ==> Everything else on the loop runs (and is profiled) while we wait.
+		finally:
+			profiler.disable()
+
+	stamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+	stats_path = Path(tempfile.gettempdir())/f"countermeasure_profile_{stamp}.pstats"
+	profiler.dump_stats(stats_path)
+	return ProfileReport(seconds, top_entries(pstats.Stats(profiler, stream=io.StringIO()), top=top), stats_path)
+
+# [top_entries]
+# ==> Our own functions (anything under src/), by cumulative time.
+def top_entries(stats:pstats.Stats, *, top:int) -> list[ProfileEntry]:
+	entries = []
+	for (filename, lineno, funcname), (_, calls, total_time, cumulative_time, _) in stats.stats.items():
+		path = Path(filename)
+		if not path.is_absolute() or SRC_DIR not in path.parents:
+			continue
+		entries.append(ProfileEntry(
+			f"{path.relative_to(SRC_DIR).as_posix()}:{lineno}({funcname})",
+			calls,
+			total_time,
+			cumulative_time
+		))
+	entries.sort(key=lambda e: e.cumulative_time, reverse=True)
+	return entries[:top]
+
+# [format_report]
+# ==> A code-block table that fits in a Discord message.
+def format_report(report:ProfileReport, *, limit:int = 1900) -> str:
+	lines = [f"{'cum s':>8} {'self s':>8} {'calls':>7}  function"]
+	for e in report.entries:
+		lines.append(f"{e.cumulative_time:>8.3f} {e.total_time:>8.3f} {e.calls:>7}  {e.location}")
+	if not report.entries:
+		lines.append("(none of our code ran during the capture)")
+	body = "\n".join(lines)
+	if len(body) > limit:
+		body = body[:limit].rsplit("\n", 1)[0]
+	return f"```\n{body}\n```"
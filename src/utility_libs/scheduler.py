@@ -3,10 +3,13 @@ INFORMATION
 
 	This is our scheduler library. All time-related behaviors happen here.
 	Our bot interacts with it through cogs/scheduler_cog.py
+		PayoutScheduler	==> Pays everyone every PAYOUT_STEP days at SCHEDULER_RUNS_UTC.
+		AuctionScheduler	==> Closes auctions at their deadlines.
+		ExpiryScheduler	==> Sweeps used-up consumables out of inventories.
 	
 """
 
-import aiosqlite, asyncio, contextlib, os
+import aiosqlite, asyncio, contextlib, database, heapq, os, sqlite3
 from datetime import datetime, date, time, timedelta, timezone 
 from dotenv import find_dotenv, load_dotenv
 from typing import Awaitable, Callable, Optional
@@ -21,9 +24,48 @@ load_dotenv(ENV)
 
 payout_step:int = int(os.getenv("PAYOUT_STEP"))
 RUN_AT_UTC:time = time(int(os.getenv("SCHEDULER_RUNS_UTC")))
+AUCTION_RETRY_SECONDS:int = 5
+EXPIRY_SWEEP_SECONDS:float = float(os.getenv("EXPIRY_SWEEP_SECONDS") or 60)
 
 LogUtil.print_log(f"Scheduler expected to run every {payout_step} days at UTC <{RUN_AT_UTC}>")
 
+""" [PAYOUT UNITS OF WORK] """
+# ==> These run on the connection thread (see database/unit_of_work.py), each as one transaction.
+# [_payout_work]
+# ==> Claims run_date, pays everybody, records history and marks the date complete. Returns False if it was already done.
+# ==> run_at is when the payout was due (never later than now). Modifiers are judged live or ended as of then.
+def _payout_work(conn:sqlite3.Connection, run_date:str, run_at:str, history_params:dict) -> bool:
+	# ==> Inside our schedule table, create a new run date.
+	c = conn.execute(database.CLAIM_RUN_SQL, (run_date,))
+	if c.rowcount <= 0:
+		# ==> Date already exists. Check its status instead.
+		status_row = conn.execute(database.RUN_STATUS_SQL, (run_date,)).fetchone()
+		if status_row and status_row[0] == 'complete':
+			return False
+		# If 'failed' or 'started', we should retry. The latter implies a hang...
+
+	# [PAY EVERYBODY ==> sourcing user_economy, user_tech tables]
+	# PAYOUT_SQL is one set-based UPDATE; see its notes in database/data_handler.py.
+	# ==> The cached multipliers already follow ownership. They only need a rebuild if a modifier ended by run_at.
+	if conn.execute(database.PRUNE_MODIFIERS_SQL, (run_at,)).rowcount:
+		conn.execute(database.CLEAR_MULTIPLIERS_SQL)
+		conn.execute(database.REFRESH_MULTIPLIERS_SQL)
+	conn.execute(database.PAYOUT_SQL)
+	# ==> Same transaction, so history never disagrees with a payout that rolled back. See database/history.py.
+	conn.execute(database.RECORD_HISTORY_SQL, history_params)
+	conn.execute(database.ADVANCE_HISTORY_HEADS_SQL, history_params)
+	conn.execute(database.RECORD_ECONOMY_SQL, {"now": history_params["now"]})
+
+	# If we've made it to here, we've definitely succeeded!
+	conn.execute(database.COMPLETE_RUN_SQL, (run_date,))
+	return True
+
+# [_mark_failed_work]
+# ==> Runs after _payout_work rolled back, so the claim is gone too. Re-claim the date as failed so backfill retries it.
+def _mark_failed_work(conn:sqlite3.Connection, run_date:str, error_msg:str) -> None:
+	conn.execute(database.CLAIM_RUN_SQL, (run_date,))
+	conn.execute(database.FAIL_RUN_SQL, (error_msg, run_date))
+
 class PayoutScheduler:
 	def __init__(self, db:aiosqlite.Connection, announce) -> None:
 		self.db:aiosqlite.Connection = db
@@ -54,20 +96,6 @@ class PayoutScheduler:
 				await self._task
 			self._task = None
 	
-	""" [BOOTSTRAP BLOCK] """
-	# ==> Ngl. Just took this from data_handler. No need to make a function for creating only the schedule table
-	async def _ensure_tables(self) -> None:
-		await self.db.execute("""
-			CREATE TABLE IF NOT EXISTS schedule(
-				run_date TEXT PRIMARY KEY,
-				status TEXT NOT NULL CHECK(status IN ('started','complete','failed')),
-				started_at TEXT NOT NULL, -- datetime('now')
-				finished_at TEXT, -- set when completed OR failed
-				error_msg TEXT -- Optional failure note				
-			)
-		""")
-		await self.db.commit()
-
 	""" [TIME SCHEDULING BLOCK] """
 	def today_utc(self) -> date:
 		print(f"[DEBUG]: Getting today_utc: {datetime.now(timezone.utc).date()}")
@@ -100,91 +128,38 @@ class PayoutScheduler:
 	async def payout_for_day(self, d:date) -> None:
 		run_date = d.isoformat()
 		LogUtil.print_debug(f"Fetched run_date: {run_date}... STARTING PAYOUT")
-		# Let's try to claim this date. BEGIN IMMEDIATE helps us avoid race conditions.
-		await self.db.execute("BEGIN IMMEDIATE")
+		# ==> A backfilled date is paid with the modifiers that were live when it was due, not today's.
+		run_at = min(datetime.combine(d, RUN_AT_UTC, tzinfo=timezone.utc), datetime.now(timezone.utc)).strftime("%Y-%m-%d %H:%M:%S")
+		# ==> Stamped with the real time, not run_date, so backfilled points stay in order with trade points.
+		history_params = {
+			"now": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+			"reason": "payout",
+			"every": database.HISTORY_SNAPSHOT_EVERY
+		}
 		try:
-			# ==> Inside our schedule table, create a new run date.
-			c = await self.db.execute(
-				"""INSERT OR IGNORE INTO schedule(run_date, status, started_at)
-				VALUES (?, 'started', datetime('now'))""", (run_date,)
-			)
-			inserted = c.rowcount and c.rowcount > 0
-			LogUtil.print_debug(f"Fetched amount inserted: {inserted}")
-			if not inserted:
-				# ==> Date already exists. Check its status instead.
-				async with self.db.execute(
-					"""SELECT status FROM schedule WHERE run_date = ?""", (run_date,)
-				) as c2:
-					status_row = await c2.fetchone()
-				status = status_row[0] if status_row else None
-				if status == 'complete':
-					LogUtil.print_debug(f"{run_date} Already done. Rolling back...")
-					await self.db.rollback(); return
-				# If 'failed' or 'started', we should retry. The latter implies a hang...
-
-			# [PAY EVERYBODY ==> sourcing user_economy, user_tech tables]
-			# Using a CTE instead of a view for durability. Schema changes won't update a VIEW IF NOT EXISTS.
-			# ==> UNION ALL stacks our two selects on top of each other. UNION removes duplicates, which is unnecessary work.
-			# ==> agg is our aggregation of incomes. This is used to credit players.
-			# ==> We finally execute update in the same block so the CTE can be accessed.
-			LogUtil.print_debug(f"Executing CTE and UPDATE...")
-			await self.db.execute(
-				""" WITH v AS (
-						SELECT user_id, SUM(COALESCE(economy_income, 0)) AS cr,	0 AS rp
-						FROM user_economy GROUP BY user_id
-						UNION ALL
-						SELECT user_id, 0 AS cr, SUM(COALESCE(tech_income, 0)) AS rp
-						FROM user_tech GROUP BY user_id
-					),
-					agg AS (
-						SELECT user_id, SUM(cr) AS cr, SUM(rp) AS rp
-						FROM v GROUP BY user_id
-					)
-
-					UPDATE users AS u
-					SET balance = balance
-						+ COALESCE((SELECT a.cr FROM agg a WHERE a.user_id = u.user_id), 0),
-						research = research
-						+ COALESCE((SELECT a.rp FROM agg a WHERE a.user_id = u.user_id), 0)
-					WHERE EXISTS (SELECT 1 FROM agg a WHERE a.user_id = u.user_id);
-				"""
-			)	# ==> Since we have a scalar subquery, if we're missing a row, we'll get NULL. We coalesce again to avoid NULLs.
-			# ==> WHERE EXISTS is a safeguard, so we're only affecting users involved in a payout aggregation.
-			
-			# If we've made it to here, we've definitely succeeded!
-			await self.db.execute(
-				"UPDATE schedule SET status='complete', finished_at=datetime('now') WHERE run_date=?",
-				(run_date,)
-			)
-			await self.db.commit()
-			await self.announce(f"```<{datetime.now(timezone.utc).date()}: {datetime.now(timezone.utc).time()}> PAYOUT ISSUED ```")
-			LogUtil.print_debug(f"PAYOUT FOR {run_date} COMMITTED")
-
+			# ==> The whole payout is one unit of work, so nothing else can interleave with it. See _payout_work.
+			paid = await database.run_unit(self.db, _payout_work, run_date, run_at, history_params)
 		# If the payout fails...
 		except Exception as e:
-			await self.db.rollback()
-			await self.db.execute("BEGIN IMMEDIATE")
-			await self.db.execute(
-				"""INSERT OR IGNORE INTO schedule(run_date, status, started_at)
-				VALUES (?, 'started', datetime('now'))""", (run_date,)
-			)
-			await self.db.execute(
-				"UPDATE schedule SET status='failed', finished_at=datetime('now'), error_msg=? WHERE run_date = ?",
-				(f"{type(e).__name__}: {e}", run_date)
-			)
-			await self.db.commit()
+			await database.run_unit(self.db, _mark_failed_work, run_date, f"{type(e).__name__}: {e}")
 			# Announce failure
 			await self.announce(f"[ERR]: Payout for {run_date} failed: {type(e).__name__}: {e}")
 			LogUtil.print_debug(f"[DEBUG]: Payout failed: {type(e).__name__}: {e}")
 			# ==> type(e) gets our error type (error types are objs)
+			return
+
+		if not paid:
+			LogUtil.print_debug(f"{run_date} Already done.")
+			return
+		await database.refresh_profiles(self.db) # ==> Everyone's balance just changed.
+		await self.announce(f"```<{datetime.now(timezone.utc).date()}: {datetime.now(timezone.utc).time()}> PAYOUT ISSUED ```")
+		LogUtil.print_debug(f"PAYOUT FOR {run_date} COMMITTED")
 
 	""" [BACKFILLING BLOCK] """
 	async def backfill_to_today(self) -> None:
 		LogUtil.print_debug("Called backfill_to_today")
 		today = self.today_utc()
-		async with self.db.execute(
-			"SELECT MAX(run_date) FROM schedule WHERE status='complete'"
-		) as cur: # ==> Selecting MAX(run_date) means selecting the most recent date.
+		async with self.db.execute(database.LAST_COMPLETE_RUN_SQL) as cur: # ==> Selecting MAX(run_date) means selecting the most recent date.
 			row = await cur.fetchone()
 		LogUtil.print_debug(f"Fetched backfill row: {row[0]}")
 
@@ -202,4 +177,129 @@ class PayoutScheduler:
 		while d < today:
 			LogUtil.print_debug(f"Backfilling for day {d}")
 			await self.payout_for_day(d)
-			d += timedelta(days=1) # ==> Advance to the next day for backfilling...
\ No newline at end of file
+			d += timedelta(days=1) # ==> Advance to the next day for backfilling...
+
+class AuctionScheduler:
+	# ==> Closes auctions at their deadlines (see database/auctions.py). No polling: one task sleeps until the
+	#	earliest deadline we know of, and a new auction that closes sooner wakes it early.
+	# ==> Deadlines are whole seconds, so every auction due in the same second is settled by one transaction.
+	def __init__(self, db:aiosqlite.Connection, announce) -> None:
+		self.db:aiosqlite.Connection = db
+		self.announce:Callable[[str], Awaitable[None]] = announce
+		self.house = database.auctions_for(db)
+		self._deadlines:list[tuple[datetime, int]] = [] # ==> Heap of (closes_at, auction_id)
+		self._wake = asyncio.Event()
+		self._task: Optional[asyncio.Task] = None
+
+	""" [TASK LIFECYCLE BLOCK] """
+	async def start(self):
+		self.house.on_open = self.schedule
+		# ==> Pick open auctions back up after a restart. Any that closed while we were down settle right away.
+		for auction_id, closes_at in await self.house.deadlines():
+			self.schedule(auction_id, closes_at)
+		self._task = asyncio.create_task(self._close_forever())
+
+	async def stop(self):
+		self.house.on_open = None
+		if self._task:
+			self._task.cancel()
+			with contextlib.suppress(asyncio.CancelledError):
+				await self._task
+			self._task = None
+
+	""" [TIME SCHEDULING BLOCK] """
+	def schedule(self, auction_id:int, closes_at:datetime) -> None:
+		earliest = self._deadlines[0][0] if self._deadlines else None
+		heapq.heappush(self._deadlines, (closes_at, auction_id))
+		if earliest is None or closes_at < earliest:
+			self._wake.set() # ==> Our sleeper is waiting for a later deadline. Re-aim it.
+
+	async def _close_forever(self):
+		while True:
+			self._wake.clear()
+			if not self._deadlines:
+				await self._wake.wait()
+				continue
+			delay = (self._deadlines[0][0] - datetime.now(timezone.utc)).total_seconds()
+			if delay > 0:
+				with contextlib.suppress(asyncio.TimeoutError):
+					await asyncio.wait_for(self._wake.wait(), delay)
+				continue
+			now = datetime.now(timezone.utc)
+			while self._deadlines and self._deadlines[0][0] <= now:
+				heapq.heappop(self._deadlines)
+			await self.settle(now)
+
+	""" [SETTLEMENT BLOCK] """
+	async def settle(self, now:datetime) -> None:
+		try:
+			closed = await self.house.settle_due(now)
+		except Exception as e:
+			LogUtil.print_log(f"[ERR]: Auction settlement failed: {type(e).__name__}: {e}")
+			self.schedule(0, now + timedelta(seconds=AUCTION_RETRY_SECONDS)) # ==> Nothing was settled. Try again shortly.
+			return
+		LogUtil.print_debug(f"Settled {len(closed)} auction(s) due by {now}")
+		for result in closed:
+			if result.winner_id is None:
+				message = f"Auction #{result.auction_id} for {result.quantity:,} {result.item} ended with no bids."
+			else:
+				message = (
+					f"Auction #{result.auction_id}: <@{result.winner_id}> won {result.quantity:,} {result.item} "
+					f"from <@{result.seller_id}> for {result.price:,} :coin:!"
+				)
+			# ==> These auctions are already settled. A failed announcement mustn't skip the rest or stop _close_forever.
+			try:
+				await self.announce(message)
+			except Exception as e:
+				LogUtil.print_log(f"[ERR]: Auction #{result.auction_id} announcement failed: {type(e).__name__}: {e}")
+
+class ExpiryScheduler:
+	# ==> Every EXPIRY_SWEEP_SECONDS, takes expired consumables out of inventories (see sweep_expired in
+	#	database/data_handler.py) and tells each affected player what they lost, as one line each.
+	# ==> Units expire on the minute scale, so a fixed interval is enough. With nothing due, a sweep is two index probes.
+	# ==> announce_many takes every message from one sweep at once, e.g. AnnouncementOutbox.announce_many.
+	def __init__(self, db:aiosqlite.Connection, announce_many, *, interval:float = EXPIRY_SWEEP_SECONDS) -> None:
+		self.db:aiosqlite.Connection = db
+		self.announce_many:Callable[[list[str]], Awaitable[None]] = announce_many
+		self.interval:float = interval
+		self._task: Optional[asyncio.Task] = None
+
+	""" [TASK LIFECYCLE BLOCK] """
+	async def start(self):
+		self._task = asyncio.create_task(self._sweep_forever())
+
+	async def stop(self):
+		if self._task:
+			self._task.cancel()
+			with contextlib.suppress(asyncio.CancelledError):
+				await self._task
+			self._task = None
+
+	async def _sweep_forever(self):
+		while True:
+			await self.sweep() # ==> Straight away first, to catch up on anything that expired while we were down.
+			await asyncio.sleep(self.interval)
+
+	""" [SWEEP BLOCK] """
+	async def sweep(self) -> None:
+		try:
+			expired = await database.sweep_expired(self.db)
+		except database.SweepInterrupted as e:
+			# ==> Batches that committed stay done, so their players still get told.
+			cause = e.__cause__
+			LogUtil.print_log(f"[ERR]: Expiry sweep failed: {type(cause).__name__}: {cause}")
+			expired = e.expired
+		except Exception as e:
+			LogUtil.print_log(f"[ERR]: Expiry sweep failed: {type(e).__name__}: {e}")
+			return
+		if not expired:
+			return
+		messages = []
+		for user_id, items in expired.items():
+			lost = ", ".join(f"{units:,} {name}" for name, units in items.items())
+			messages.append(f"<@{user_id}>: {lost} expired.")
+		# ==> The items are already gone. A failed announcement mustn't stop _sweep_forever.
+		try:
+			await self.announce_many(messages)
+		except Exception as e:
+			LogUtil.print_log(f"[ERR]: Expiry announcement failed for {len(messages)} player(s): {type(e).__name__}: {e}")
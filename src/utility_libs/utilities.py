@@ -102,6 +102,26 @@ class SchedulerUtilities:
 	# Parse a string date -> date
 	def parse_date(self,s:str) -> date:
 		return datetime.strptime(s, "%Y-%m-%d").date()
+
+class ParsingUtilities:
+	def __init__(self) -> None:
+		pass
+	# "Iron, Wood=3" -> {"Iron": quantity, "Wood": 3}. Bare names get the default quantity.
+	def parse_items(self, text:str, quantity:int = 1) -> dict[str, int]:
+		items = {}
+		for part in text.split(","):
+			name, sep, qty = part.rpartition("=")
+			if not sep:
+				name, qty = part, quantity
+			name = name.strip()
+			if not name:
+				continue
+			try:
+				qty = int(qty)
+			except ValueError:
+				raise ValueError(f"Can't read {part.strip()!r}: the quantity after '=' must be a whole number.") from None
+			items[name] = items.get(name, 0) + qty
+		return items
 	
 class RenderUtilities:
 	class Paginator(discord.ui.View):
@@ -0,0 +1,110 @@
+"""
+INFORMATION
+
+	This is our event-loop watchdog. Anything that blocks the event loop also blocks discord.py's gateway heartbeat.
+	A heartbeat task on the loop measures how late each wake-up is (the loop's scheduling lag).
+	A separate watcher thread notices when that heartbeat stops beating, and grabs the loop thread's stack
+	while it's still blocked. So we log the exact module, function and line that stalled us, not just that it happened.
+	Tune with LOOP_LAG_THRESHOLD_MS in .env (default 250). Admins can read the numbers with /admin loop_lag.
+
+"""
+
+""" [IMPORTS] """
+import asyncio, contextlib, os, sys, threading, time, traceback, typing
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from utility_libs.utilities import LoggingUtilities
+
+""" [SETUP] """
+SRC_DIR = Path(__file__).resolve().parents[1]
+LOOP_LAG_THRESHOLD_MS:float = float(os.getenv("LOOP_LAG_THRESHOLD_MS") or 250)
+LogUtil = LoggingUtilities(True,True)
+
+class Stall(typing.NamedTuple):
+	at:datetime
+	stalled_ms:float	# ==> How long we'd been blocked when we caught it (at least this long)
+	location:str		# ==> e.g. "utility_libs/scheduler.py:57 in today_utc"
+	stack:str			# ==> The loop thread's stack at the time, innermost last
+
+class LoopWatchdog:
+	def __init__(self, *, threshold_ms:float = LOOP_LAG_THRESHOLD_MS, interval:float = 0.05, history:int = 10_000) -> None:
+		self.threshold:float = threshold_ms / 1000
+		self.interval:float = interval
+		self.lags:deque[float] = deque(maxlen=history)	# ==> Seconds late, per heartbeat
+		self.stalls:deque[Stall] = deque(maxlen=50)
+		self._last_beat:float = time.monotonic()
+		self._loop_thread_id:int|None = None
+		self._task:typing.Optional[asyncio.Task] = None
+		self._thread:typing.Optional[threading.Thread] = None
+		self._stop = threading.Event()
+
+	""" [TASK LIFECYCLE BLOCK] """
+	def start(self) -> None:
+		if self._task:
+			return
+		self._loop_thread_id = threading.get_ident()
+		self._last_beat = time.monotonic()
+		self._stop.clear()
+		self._task = asyncio.create_task(self._beat_forever())
+		self._thread = threading.Thread(target=self._watch_forever, name="loop-watchdog", daemon=True)
+		self._thread.start()
+
+	async def stop(self) -> None:
+		self._stop.set()
+		if self._task:
+			self._task.cancel()
+			with contextlib.suppress(asyncio.CancelledError):
+				await self._task
+			self._task = None
+		self._thread = None # ==> Daemon thread; it exits on its next wake-up.
+
+	""" [HEARTBEAT BLOCK] """
+	async def _beat_forever(self) -> None:
+		while True:
+			started = time.monotonic()
+			await asyncio.sleep(self.interval)
+			now = time.monotonic()
+			self.lags.append(max(0.0, now - started - self.interval))
+			self._last_beat = now
+
+	""" [WATCHER BLOCK] """
+	# ==> Runs in its own thread, so it still runs while the loop is blocked.
+	def _watch_forever(self) -> None:
+		reported_beat = None
+		while not self._stop.wait(self.interval):
+			beat = self._last_beat
+			stalled = time.monotonic() - beat - self.interval
+			if stalled > self.threshold and reported_beat != beat:
+				reported_beat = beat # ==> One report per stall.
+				frame = sys._current_frames().get(self._loop_thread_id)
+				if frame is not None:
+					self._report(frame, stalled)
+
+	def _report(self, frame, stalled:float) -> None:
+		summary = traceback.extract_stack(frame)
+		# ==> Blame the innermost frame that's our code; fall back to the innermost frame overall.
+		culprit = next((f for f in reversed(summary) if _is_ours(f.filename)), summary[-1])
+		location = f"{_display_path(culprit.filename)}:{culprit.lineno} in {culprit.name}"
+		stall = Stall(datetime.now(timezone.utc), stalled * 1000, location, "".join(traceback.format_list(summary[-12:])))
+		self.stalls.append(stall)
+		LogUtil.print_log(f"[WATCHDOG]: Event loop blocked for {stall.stalled_ms:.0f}+ ms at {location}\n{stall.stack}")
+
+	""" [REPORTING BLOCK] """
+	# [percentiles]
+	# ==> Lag percentiles in milliseconds over the recent heartbeats.
+	def percentiles(self, pcts:typing.Iterable[float] = (50, 95, 99)) -> dict[str, float]:
+		ordered = sorted(self.lags)
+		if not ordered:
+			return {}
+		result = {f"p{p:g}": ordered[min(len(ordered)-1, int(round(p/100 * (len(ordered)-1))))] * 1000 for p in pcts}
+		result["max"] = ordered[-1] * 1000
+		return result
+
+def _is_ours(filename:str) -> bool:
+	path = Path(filename)
+	return path.is_absolute() and SRC_DIR in path.parents and path.name != "watchdog.py"
+
+def _display_path(filename:str) -> str:
+	path = Path(filename)
+	return path.relative_to(SRC_DIR).as_posix() if _is_ours(filename) else filename